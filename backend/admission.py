@@ -0,0 +1,292 @@
+"""
+Admission control and load shedding for forecast endpoints
+Each endpoint admits a bounded number of requests at once. A few more may
+wait, up to a deadline, for a slot; anything beyond that is shed immediately
+instead of queueing until every request times out. A shed request gets the
+last good response for the same query (served stale) when one is cached,
+otherwise a fast 503 with Retry-After.
+
+A request waiting in a queue still holds a request thread, so the limits only
+shed anything when they are below the threads of a worker (WEB_THREADS). All
+endpoints also share one thread budget (ADMISSION_THREAD_BUDGET, by default
+WEB_THREADS - 1): admitted and queued forecast requests together never take
+the last thread, which health and other cheap endpoints keep.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+
+from config import Config
+from executors import PoolSaturated
+from response_cache import ResponseCache
+
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted"""
+
+    def __init__(self, endpoint, reason):
+        super().__init__(f"{endpoint} overloaded ({reason})")
+        self.endpoint = endpoint
+        self.reason = reason
+
+
+class ThreadBudget:
+    """Request threads all admission-controlled endpoints may hold together"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._held = 0
+
+    def try_acquire(self):
+        with self._lock:
+            if self._held >= self.limit:
+                return False
+            self._held += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._held -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"limit": self.limit, "held": self._held}
+
+
+class AdmissionController:
+    """Bounded in-flight requests for one endpoint, with a queueing deadline"""
+
+    def __init__(self, endpoint, max_in_flight, max_queue, deadline, retry_after, stale_entries, budget=None):
+        """
+        Args:
+            endpoint: Endpoint name (for logs and metrics)
+            max_in_flight: Requests processed at once
+            max_queue: Requests allowed to wait for a slot
+            deadline: Seconds a request may wait before it is shed
+            retry_after: Retry-After seconds sent with 503s
+            stale_entries: Responses kept for stale fallback
+            budget: ThreadBudget shared with the other endpoints (None: unbounded)
+        """
+        self.endpoint = endpoint
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.retry_after = retry_after
+        self.budget = budget
+        # Last good (body, stored_at) per query
+        self.stale = ResponseCache(stale_entries)
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        self._peak_queued = 0
+        self.counters = {
+            "admitted": 0,
+            "rejected_queue_full": 0,
+            "rejected_thread_budget": 0,
+            "rejected_deadline": 0,
+            "rejected_pool_saturated": 0,
+            "served_stale": 0,
+        }
+
+    @contextmanager
+    def admit(self):
+        """
+        Hold an in-flight slot for the duration of the block
+
+        Raises:
+            Overloaded: The thread budget or queue is full, or the deadline
+                passed while waiting
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self):
+        """Take an in-flight slot (and a thread from the budget); see admit()"""
+        if self.budget is not None and not self.budget.try_acquire():
+            with self._cond:
+                self.counters["rejected_thread_budget"] += 1
+            raise Overloaded(self.endpoint, "thread_budget")
+        try:
+            self._acquire_slot()
+        except Overloaded:
+            if self.budget is not None:
+                self.budget.release()
+            raise
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+        if self.budget is not None:
+            self.budget.release()
+
+    def _acquire_slot(self):
+        with self._cond:
+            if self._in_flight >= self.max_in_flight:
+                if self._queued >= self.max_queue:
+                    self.counters["rejected_queue_full"] += 1
+                    raise Overloaded(self.endpoint, "queue_full")
+                self._queued += 1
+                self._peak_queued = max(self._peak_queued, self._queued)
+                give_up = time.monotonic() + self.deadline
+                try:
+                    while self._in_flight >= self.max_in_flight:
+                        remaining = give_up - time.monotonic()
+                        if remaining <= 0:
+                            self.counters["rejected_deadline"] += 1
+                            raise Overloaded(self.endpoint, "deadline")
+                        self._cond.wait(remaining)
+                finally:
+                    self._queued -= 1
+            self._in_flight += 1
+            self.counters["admitted"] += 1
+
+    def shed(self, key, error):
+        """Response for a request that was not served: stale copy or 503"""
+        with self._cond:
+            if isinstance(error, PoolSaturated):
+                self.counters["rejected_pool_saturated"] += 1
+            cached = self.stale.get(key) if key is not None else None
+            if cached is not None:
+                self.counters["served_stale"] += 1
+
+        if cached is not None:
+            body, stored_at, mimetype = cached
+            response = current_app.response_class(body, mimetype=mimetype)
+            response.headers["Age"] = str(int(time.time() - stored_at))
+            response.headers["Warning"] = '110 - "Response is Stale"'
+            return response
+
+        response = jsonify({"success": False, "error": "Server busy, please retry"})
+        response.headers["Retry-After"] = str(self.retry_after)
+        return response, 503
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self.counters,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queued,
+                "peak_queue_depth": self._peak_queued,
+                "stale_entries": len(self.stale),
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "deadline_s": self.deadline,
+                "thread_budget": self.budget.stats() if self.budget is not None else None,
+            }
+
+
+def _endpoint_limits(config):
+    return (("predict", config.PREDICT_MAX_IN_FLIGHT),
+            ("refresh", config.REFRESH_MAX_IN_FLIGHT),
+            ("stream", config.STREAM_MAX_IN_FLIGHT),
+            ("export", config.EXPORT_MAX_IN_FLIGHT))
+
+
+def check_admission_limits(config):
+    """
+    Warnings for admission limits that can never fill
+
+    Requests beyond the worker's request threads wait for a thread, not in an
+    admission queue, so limits above the thread budget shed nothing.
+    """
+    warnings = []
+    if config.ADMISSION_THREAD_BUDGET >= config.WEB_THREADS:
+        warnings.append(f"ADMISSION_THREAD_BUDGET={config.ADMISSION_THREAD_BUDGET} leaves none of the "
+                        f"{config.WEB_THREADS} request threads for health and other cheap endpoints")
+    for name, max_in_flight in _endpoint_limits(config):
+        if max_in_flight + config.ADMISSION_MAX_QUEUE > config.ADMISSION_THREAD_BUDGET:
+            warnings.append(f"{name.upper()}_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUE = "
+                            f"{max_in_flight + config.ADMISSION_MAX_QUEUE} exceeds the thread budget of "
+                            f"{config.ADMISSION_THREAD_BUDGET}; the admission queue never fills")
+    return warnings
+
+
+def create_admission_controllers(config):
+    """One controller per forecast endpoint, sized from Config, sharing one thread budget"""
+    budget = ThreadBudget(config.ADMISSION_THREAD_BUDGET)
+    return {
+        name: AdmissionController(
+            name,
+            max_in_flight=max_in_flight,
+            max_queue=config.ADMISSION_MAX_QUEUE,
+            deadline=config.ADMISSION_DEADLINE,
+            retry_after=config.ADMISSION_RETRY_AFTER,
+            stale_entries=config.ADMISSION_STALE_ENTRIES,
+            budget=budget,
+        )
+        for name, max_in_flight in _endpoint_limits(config)
+    }
+
+
+def forecast_query_key():
+    """Stale-cache key for a forecast request body"""
+    payload = request.get_json(force=True, silent=True) or {}
+    return (
+        payload.get("county"), payload.get("state"), payload.get("model", "balanced"),
+        str(payload.get("days", 1)), str(payload.get("history_days", 30)),
+        bool(payload.get("probabilistic")), str(payload.get("paths", Config.MONTE_CARLO_PATHS)),
+    )
+
+
+def forecast_args_key():
+    """Stale-cache key for a forecast request's query string (GET endpoints)"""
+    args = request.args
+    return (
+        args.get("county"), args.get("state"), args.get("model", "balanced"), args.get("days", "7"),
+    )
+
+
+def no_stale_key():
+    """Key for endpoints without a stale fallback (e.g. bulk exports): shed requests get a 503"""
+    return None
+
+
+def remember_stale(endpoint, key, body, mimetype="application/json"):
+    """Keep a complete body as the stale fallback of a query (e.g. a finished stream)"""
+    current_app.extensions["admission"][endpoint].stale.put(key, (body, time.time(), mimetype))
+
+
+def admission_controlled(endpoint, cache_key=forecast_query_key):
+    """
+    Admit the view through its endpoint's controller and shed it when overloaded
+
+    A streamed response is produced after the view returns, so its slot is held
+    until the body is closed. Streamed bodies are not stored for stale fallback
+    here; the view can store a finished one with remember_stale().
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            controller = current_app.extensions["admission"][endpoint]
+            key = cache_key()
+            try:
+                controller.acquire()
+            except Overloaded as e:
+                return controller.shed(key, e)
+            try:
+                response = make_response(view(*args, **kwargs))
+            except PoolSaturated as e:
+                controller.release()
+                return controller.shed(key, e)
+            except BaseException:
+                controller.release()
+                raise
+
+            if response.is_streamed:
+                response.call_on_close(controller.release)
+                return response
+            controller.release()
+            if response.status_code == 200:
+                controller.stale.put(key, (response.get_data(), time.time(), response.mimetype))
+            return response
+        return wrapped
+    return decorator
@@ -1,21 +1,34 @@
 # backend/app.py
 """
 Flask REST API for CLAP system (modularized)
-- Initializes logger, config, CSV data source, and ML models
+- Initializes logger, config and routes, then loads the CSV data source and
+  ML models in a warm-up phase (warmup.py)
 - Registers Blueprints from routes/
 """
-from flask import Flask, send_from_directory, abort
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, abort
 from flask_cors import CORS
 from datetime import datetime
+import itertools
 import logging
 import os
-import json
-from logging.handlers import RotatingFileHandler
 
 from config import Config
 from routes import register_blueprints
-from ml_model import AQIPredictor
-from data_source import get_data_source
+from routes.aqi_utils import load_scaler
+from inference_batcher import InferenceBatcher
+from executors import check_thread_budget, create_stage_pools
+from admission import check_admission_limits, create_admission_controllers
+from response_cache import ResponseCache
+from map_layer import MapLayerStore
+from http_cache import warm_versioned_bodies
+from compression import register_compression, send_static
+from metrics import register_metrics
+from structured_logging import build_logger, make_log_event, parse_sample_rates
+from profiler import register_profiling
+from warmup import WarmUp, register_readiness
 
 # MIME mapping override for Flask 
 import mimetypes
@@ -24,65 +37,45 @@ mimetypes.add_type("text/javascript", ".mjs")
 mimetypes.add_type("text/css", ".css")
 mimetypes.add_type("application/wasm", ".wasm")
 
-# Structured logging
-os.makedirs("logs", exist_ok=True)
-
-class JsonFormatter(logging.Formatter):
-    def format(self, record):
-        payload = {
-            "timestamp": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
-            "level": record.levelname,
-            "operation": getattr(record, "operation", "general"),
-            "message": record.getMessage(),
-        }
-        if record.exc_info:
-            payload["error"] = self.formatException(record.exc_info)
-        return json.dumps(payload, ensure_ascii=False)
-
-def build_logger():
-    logger = logging.getLogger("CLAP")
-    logger.setLevel(logging.INFO)
-
-    file_handler = RotatingFileHandler("logs/app.log", maxBytes=5_000_000, backupCount=3)
-    file_handler.setFormatter(JsonFormatter())
-
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-
-    logger.handlers = [file_handler, console_handler]
-    logger.propagate = False
-    return logger
-
-def log_event(logger, level, message, operation="general", **extra_kv):
-    logger.log(level, message, extra={"operation": operation, **extra_kv})
-
+# Module load time of this app (excluding the interpreter itself), reported as a gauge
+IMPORT_SECONDS = time.perf_counter() - _import_started
 
-# App factory
-def create_app():
-    app = Flask(__name__, static_folder="../frontend/dist", static_url_path="/")
-    app.config.from_object(Config)
-    CORS(app)
-
-    # Logger
-    logger = build_logger()
-    app.extensions = getattr(app, "extensions", {})
-    app.extensions["logger"] = logger
-    app.extensions["log_event"] = lambda level, msg, operation="general", **kv: log_event(
-        logger, level, msg, operation, **kv
-    )
-
-    # Load CSV Data Source
+# Warm-up steps (see warmup.py); heavy modules are imported here, not at module load
+def load_data(app):
+    from data_source import get_data_source
+    metrics = app.extensions["metrics"]
     try:
-        ds = get_data_source(data_path="../data/")
+        t0 = time.perf_counter()
+        ds = get_data_source(data_path=os.path.join("..", Config.DATA_PATH))
+        metrics.set_gauge("ingestion_seconds", time.perf_counter() - t0)
         app.extensions["data_source"] = ds
         app.extensions["log_event"](
             logging.INFO, f"CSV data source loaded: {len(ds.df)} records", operation="ingestion"
         )
     except Exception:
-        logger.exception("Failed to load CSV data source", extra={"operation": "ingestion"})
+        app.extensions["logger"].exception("Failed to load CSV data source", extra={"operation": "ingestion"})
         app.extensions["data_source"] = None
 
-    # Load ML models
+
+def load_feature_store(app):
+    from feature_store import FeatureStore
+    source = app.extensions["data_source"]
+    if source is None:
+        return
+    t0 = time.perf_counter()
+    store, loaded = FeatureStore.load_or_build(source, os.path.join("..", Config.FEATURE_STORE_PATH))
+    source.feature_store = store
+    app.extensions["metrics"].set_gauge("feature_store_seconds", time.perf_counter() - t0)
+    app.extensions["log_event"](
+        logging.INFO,
+        f"Feature store {'loaded' if loaded else 'built'} for {len(store.keys)} counties",
+        operation="startup",
+    )
+
+
+def load_models(app):
+    from ml_model import AQIPredictor
+    logger = app.extensions["logger"]
     predictors = {}
     model_paths = {
         "balanced":  "../models/balanced_lightgbm_model.pkl",
@@ -103,11 +96,147 @@ def create_app():
                 )
         except Exception:
             logger.exception(f"Failed to load {name} model", extra={"operation": "prediction"})
-
     app.extensions["predictors"] = predictors
+
+
+def load_scalers(app):
+    logger = app.extensions["logger"]
+    predictors = app.extensions["predictors"]
+
+    # Feature scalers for the loaded models, so requests never unpickle them
+    scalers = {}
+    for name in predictors:
+        try:
+            scalers[name] = load_scaler(name)
+        except Exception:
+            logger.exception(f"Failed to load {name} scaler", extra={"operation": "prediction"})
+
+    # One batcher per model: concurrent forecasts share predict calls
+    batchers = {}
+    if Config.INFERENCE_BATCHING:
+        for name, predictor in predictors.items():
+            batchers[name] = InferenceBatcher(
+                predictor.predict_values,
+                max_batch_size=Config.INFERENCE_BATCH_MAX_SIZE,
+                max_wait_ms=Config.INFERENCE_BATCH_MAX_WAIT_MS,
+            )
+
+    app.extensions["scalers"] = scalers
+    app.extensions["batchers"] = batchers
+
+
+def load_shadow(app):
+    """Candidate models for shadow evaluation, if SHADOW_MODELS names any"""
+    from shadow import ShadowEvaluator, load_candidate, parse_shadow_models
+    candidates = {}
+    for name, path in parse_shadow_models(Config.SHADOW_MODELS).items():
+        try:
+            candidates[name] = load_candidate(os.path.join("..", path))
+        except Exception:
+            app.extensions["logger"].exception(f"Failed to load shadow model {name}", extra={"operation": "prediction"})
+    if candidates:
+        app.extensions["shadow"] = ShadowEvaluator(
+            candidates, lambda: app.extensions.get("data_source"),
+            max_queue=Config.SHADOW_QUEUE_SIZE, max_pending=Config.SHADOW_MAX_PENDING,
+            logger=app.extensions["logger"],
+        )
+        app.extensions["log_event"](
+            logging.INFO, f"Shadow evaluation of {', '.join(candidates)}", operation="prediction"
+        )
+
+
+def warm_caches(app):
+    warm_versioned_bodies(app, [
+        ("counties.get_counties", None),
+        ("categories.get_aqi_categories", None),
+        *[("model_metrics.get_model_metrics", {"model": name}) for name in app.extensions["predictors"]],
+    ])
+
+
+def warm_map_layers(app):
+    """Precompute every model's all-county map layer; requests only read it"""
+    from routes.map_layer import refresh_map_layer
+    if app.extensions["data_source"] is None:
+        return
+    for name, predictor in app.extensions["predictors"].items():
+        refresh_map_layer(predictor, name)
+
+
+def warm_predictions(app):
+    """Forecast a few counties with every model; the results are discarded"""
+    from routes.aqi_utils import forecast_snapshot
+    source = app.extensions["data_source"]
+    if source is None:
+        return
+    snapshots = list(itertools.islice(source.iter_county_snapshots(), Config.WARMUP_FORECASTS))
+    for name, predictor in app.extensions["predictors"].items():
+        for snapshot in snapshots:
+            # Two days, so the iterative feature update runs too
+            forecast_snapshot(predictor, name, snapshot, 2)
+
+
+WARMUP_STEPS = [
+    ("data", load_data),
+    ("features", load_feature_store),
+    ("models", load_models),
+    ("scalers", load_scalers),
+    ("caches", warm_caches),
+    ("predict", warm_predictions),
+    ("maps", warm_map_layers),
+    ("shadow", load_shadow),  # after the warm-up forecasts, so they are not shadowed
+]
+
+
+# App factory
+def create_app(warmup_mode=None):
+    """
+    Build the app
+
+    Args:
+        warmup_mode: "background" (answer at once, load in a thread) or "sync"
+            (return once loaded); defaults to Config.WARMUP_MODE
+
+    The WarmUp is at app.extensions["warmup"]; call .wait() to block until ready.
+    """
+    t0 = time.perf_counter()
+    app = Flask(__name__, static_folder="../frontend/dist", static_url_path="/")
+    app.config.from_object(Config)
+    CORS(app)
+
+    # Logger
+    logger = build_logger(Config.LOG_FILE, queue_size=Config.LOG_QUEUE_SIZE)
+    app.extensions = getattr(app, "extensions", {})
+    app.extensions["logger"] = logger
+    app.extensions["log_event"] = make_log_event(logger, parse_sample_rates(Config.LOG_SAMPLE_RATES))
+
+    # Request timing; registered first so its after_request hook runs last
+    metrics = register_metrics(app, server_timing=Config.SERVER_TIMING)
+    metrics.set_gauge("startup_import_seconds", IMPORT_SECONDS)
+
+    # Filled in by warm-up
+    app.extensions["data_source"] = None
+    app.extensions["predictors"] = {}
+    app.extensions["scalers"] = {}
+    app.extensions["batchers"] = {}
+
+    warmup = WarmUp(app, WARMUP_STEPS)
+    app.extensions["warmup"] = warmup
+    register_readiness(app, warmup)
+
+    app.extensions["stage_pools"] = create_stage_pools(Config)
+    for warning in check_thread_budget(Config) + check_admission_limits(Config):
+        logger.warning(warning)
+    app.extensions["admission"] = create_admission_controllers(Config)
+    # Combined refresh responses, keyed by data version, model version and arguments
+    app.extensions["refresh_cache"] = ResponseCache(Config.REFRESH_CACHE_ENTRIES)
+    # All-county map layers, built by warm-up and rebuilt on the forecast pool
+    app.extensions["map_layers"] = MapLayerStore()
     app.extensions["default_predictor_key"] = "balanced"
 
     register_blueprints(app)
+    register_compression(app, Config.COMPRESS_MIN_SIZE)
+    if register_profiling(app, Config):
+        logger.info(f"Request profiling enabled (sample rate {Config.PROFILE_SAMPLE_RATE:g}, output {Config.PROFILE_DIR})")
 
     sep = "=" * 60
     logger.info(sep)
@@ -119,7 +248,10 @@ def create_app():
     # SPA static serving
     @app.route("/")
     def index():
-        return send_from_directory(app.static_folder, "index.html")
+        return send_static(app.static_folder, "index.html")
+
+    # Flask's own static route matches asset URLs first; serve precompressed copies there too
+    app.view_functions["static"] = lambda filename: send_static(app.static_folder, filename)
 
     @app.route("/<path:path>")
     def static_proxy(path):
@@ -127,12 +259,17 @@ def create_app():
             abort(404)
         full = os.path.join(app.static_folder, path)
         if os.path.exists(full) and os.path.isfile(full):
-            return send_from_directory(app.static_folder, path)
-        return send_from_directory(app.static_folder, "index.html")
+            return send_static(app.static_folder, path)
+        return send_static(app.static_folder, "index.html")
 
+    metrics.set_gauge("startup_bind_seconds", time.perf_counter() - t0)
+    if (warmup_mode or Config.WARMUP_MODE) == "sync":
+        warmup.run()
+    else:
+        warmup.start()
     return app
 
 if __name__ == "__main__":
     app = create_app()
     app.extensions["log_event"](logging.INFO, "Starting CLAP Flask API Server", operation="startup")
-    app.run(host="0.0.0.0", port=5001, debug=app.config.get("DEBUG", False))
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5001)), debug=app.config.get("DEBUG", False))
@@ -0,0 +1,278 @@
+"""
+Rolling-origin backtest of recursive multi-day forecasts
+evaluate() only scores one-step-ahead predictions on a static test split,
+while the API serves forecasts of up to 14 days in which each day's prediction
+feeds the next. This replays iterative_forecast() from many forecast origins:
+- At an origin day, each county's base features come from its last 30 rows on
+  or before that day, computed as the feature store computes them for serving.
+- Every horizon step builds the model inputs of all counties at once, scales
+  and predicts them in one call, and feeds the predictions back with the same
+  advance_features() step iter_forecast uses.
+- Origins are independent, so they are spread over worker processes.
+Predictions are scored against the AQI observed on each target day (counties
+without a reading that day are skipped). Errors are reported by horizon, by
+county and horizon, and by target month and horizon.
+
+    python backtest.py --model balanced --start 2024-10-19 --horizon 14
+"""
+import json
+import logging
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from feature_store import FEATURE_NAMES, MIN_ROWS, WINDOW, advance_features, compute_features, model_inputs
+
+logger = logging.getLogger(__name__)
+
+MAX_HORIZON = 14  # longest forecast the API serves
+REPORT_HORIZONS = (1, 3, 7, 14)
+
+# Shared per-worker state, set once by _init_worker
+_model = None
+_scaler = None
+_model_type = None
+_series = None
+
+
+class CountySeries:
+    """Every county's AQI rows as padded arrays, plus a dense daily grid of actuals"""
+
+    def __init__(self, source):
+        df = source.df
+        aqi = df["AQI"].to_numpy(dtype=np.float64)
+        dates = df["Date"].to_numpy().astype("datetime64[D]")
+        # Model inputs read these through county_row.get(name, 1); mirror that default
+        code_columns = [df[name].to_numpy(dtype=np.float64) if name in df else None
+                        for name in ("State Code", "County Code")]
+
+        self.keys = list(source._county_rows)
+        n = len(self.keys)
+        longest = max((len(rows) for rows in source._county_rows.values()), default=0)
+        # Rows left-aligned in date order; padding is NaN / NaT
+        self.values = np.full((n, longest), np.nan)
+        self.dates = np.full((n, longest), np.datetime64("NaT"), dtype="datetime64[D]")
+        self.codes = np.ones((n, 2))
+        for i, key in enumerate(self.keys):
+            rows = source._county_rows[key]
+            self.values[i, :len(rows)] = aqi[rows]
+            self.dates[i, :len(rows)] = dates[rows]
+            for j, column in enumerate(code_columns):
+                if column is not None:
+                    self.codes[i, j] = column[rows[0]]
+
+        self.first_day = dates.min() if len(dates) else None
+        self.last_day = dates.max() if len(dates) else None
+        days = int((self.last_day - self.first_day).astype(int)) + 1 if n else 0
+        self.actuals = np.full((n, days), np.nan)
+        for i in range(n):
+            valid = ~np.isnat(self.dates[i])
+            offsets = (self.dates[i, valid] - self.first_day).astype(int)
+            self.actuals[i, offsets] = self.values[i, valid]
+
+    def windows(self, origin):
+        """
+        Right-aligned (n, WINDOW) windows of the rows dated on or before origin
+
+        Returns:
+            (window, counts), as compute_features() takes them
+        """
+        available = np.count_nonzero(self.dates <= origin, axis=1)
+        columns = available[:, None] + np.arange(-WINDOW, 0)
+        window = np.take_along_axis(self.values, np.clip(columns, 0, None), axis=1)
+        window[columns < 0] = np.nan
+        return window, np.minimum(available, WINDOW)
+
+    def observed(self, rows, origin, horizon):
+        """(len(rows), horizon) actual AQI on the days after origin; NaN where missing"""
+        start = int((origin - self.first_day).astype(int)) + 1
+        out = np.full((len(rows), horizon), np.nan)
+        stop = min(start + horizon, self.actuals.shape[1])
+        if stop > start:
+            out[:, :stop - start] = self.actuals[rows, start:stop]
+        return out
+
+
+def default_origins(series, start=None, end=None, stride=1):
+    """
+    Origin days from start to end (inclusive), every `stride` days
+
+    start defaults to the first day with MIN_ROWS days of history, end to the
+    last day that still has an actual after it. Origins closer to the end of
+    the data than the horizon only score their shorter horizons.
+    """
+    first = series.first_day + np.timedelta64(MIN_ROWS - 1, "D")
+    start = max(np.datetime64(start, "D"), first) if start is not None else first
+    end = np.datetime64(end, "D") if end is not None else series.last_day - np.timedelta64(1, "D")
+    return np.arange(start, end + np.timedelta64(1, "D"), np.timedelta64(stride, "D"))
+
+
+def _init_worker(model, scaler, model_type, series, threads=None):
+    global _model, _scaler, _model_type, _series
+    # LightGBM predicts with all cores by default; split them between workers
+    if threads is not None and hasattr(model, "set_params"):
+        model.set_params(n_jobs=threads)
+    _model, _scaler, _model_type, _series = model, scaler, model_type, series
+
+
+def _run_origin(origin, horizon):
+    """
+    Recursive forecast of every ready county from one origin
+
+    Returns:
+        (county rows, predictions (n, horizon), actuals (n, horizon))
+    """
+    window, counts = _series.windows(origin)
+    rows = np.flatnonzero(counts >= MIN_ROWS)
+    if not len(rows):
+        return rows, np.empty((0, horizon)), np.empty((0, horizon))
+    base = compute_features(window[rows], counts[rows])
+    features = dict(zip(FEATURE_NAMES, base.T))
+    state_codes, county_codes = _series.codes[rows, 0], _series.codes[rows, 1]
+
+    predictions = np.empty((len(rows), horizon))
+    origin_date = pd.Timestamp(origin).to_pydatetime()
+    for step in range(horizon):
+        X = model_inputs(_model_type, features, state_codes, county_codes, origin_date + timedelta(days=step + 1))
+        yhat = np.asarray(_model.predict(_scaler.transform(X)), dtype=np.float64)
+        predictions[:, step] = yhat
+        advance_features(features, yhat)
+    return rows, predictions, _series.observed(rows, origin, horizon)
+
+
+def run_backtest(model, scaler, model_type, series, origins=None, horizon=MAX_HORIZON, workers=None):
+    """
+    Replay recursive forecasts from many origins over all counties
+
+    Args:
+        model: Fitted model with predict(X_scaled)
+        scaler: Scaler the model's inputs were fitted with
+        model_type: "balanced" or "prototype" (selects the input layout)
+        series: CountySeries of the data to forecast from and score against
+        origins: datetime64[D] origin days (default: default_origins())
+        horizon: Days forecast from each origin
+        workers: Worker processes (default: CPU count; 1 runs in this process)
+
+    Returns:
+        DataFrame with one row per scored forecast: county, state, origin,
+        target_date, horizon, predicted, actual, error (predicted - actual)
+    """
+    origins = default_origins(series) if origins is None else np.asarray(origins, "datetime64[D]")
+    workers = min(workers or os.cpu_count() or 1, max(len(origins), 1))
+    logger.info(f"Backtest: {len(origins)} origins x {len(series.keys)} counties x {horizon} days, "
+                f"{workers} workers")
+
+    if workers == 1:
+        _init_worker(model, scaler, model_type, series)
+        results = [_run_origin(origin, horizon) for origin in origins]
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model, scaler, model_type, series, threads)) as pool:
+            results = list(pool.map(_run_origin, origins, [horizon] * len(origins)))
+
+    frames = []
+    for origin, (rows, predicted, actual) in zip(origins, results):
+        county_rows = np.repeat(rows, horizon)
+        steps = np.tile(np.arange(1, horizon + 1), len(rows))
+        frames.append(pd.DataFrame({
+            "county_row": county_rows,
+            "origin": np.datetime64(origin, "D"),
+            "horizon": steps,
+            "predicted": predicted.ravel(),
+            "actual": actual.ravel(),
+        }))
+    if not frames:
+        frames.append(pd.DataFrame(columns=["county_row", "origin", "horizon", "predicted", "actual"]))
+    scored = pd.concat(frames, ignore_index=True).dropna(subset=["actual"])
+
+    keys = np.array(series.keys, dtype=object).reshape(-1, 2)
+    county_rows = scored.pop("county_row").to_numpy(dtype=np.int64)
+    scored.insert(0, "county", keys[county_rows, 0])
+    scored.insert(1, "state", keys[county_rows, 1])
+    scored["origin"] = pd.to_datetime(scored["origin"])
+    scored["target_date"] = scored["origin"] + pd.to_timedelta(scored["horizon"], unit="D")
+    scored["error"] = scored["predicted"] - scored["actual"]
+    logger.info(f"Backtest scored {len(scored)} forecasts")
+    return scored.reset_index(drop=True)
+
+
+def _errors(scored, by):
+    grouped = scored.assign(
+        abs_error=scored["error"].abs(), sq_error=scored["error"] ** 2
+    ).groupby(by, sort=True)
+    table = grouped.agg(
+        n=("error", "size"),
+        mae=("abs_error", "mean"),
+        rmse=("sq_error", "mean"),
+        bias=("error", "mean"),
+    )
+    table["rmse"] = np.sqrt(table["rmse"])
+    return table.reset_index()
+
+
+def summarize(scored):
+    """
+    Error tables of a run_backtest() result
+
+    Returns:
+        {"by_horizon", "by_county", "by_month"} DataFrames with n, mae, rmse
+        and bias (mean of predicted - actual); months are target months
+    """
+    return {
+        "by_horizon": _errors(scored, ["horizon"]),
+        "by_county": _errors(scored, ["county", "state", "horizon"]),
+        "by_month": _errors(scored.assign(month=scored["target_date"].dt.strftime("%Y-%m")),
+                            ["month", "horizon"]),
+    }
+
+
+def horizon_metrics(tables, horizons=REPORT_HORIZONS):
+    """JSON-friendly by-horizon errors, for storing next to a model's metrics"""
+    by_horizon = tables["by_horizon"]
+    return {
+        int(row.horizon): {"n": int(row.n), "mae": float(row.mae), "rmse": float(row.rmse), "bias": float(row.bias)}
+        for row in by_horizon[by_horizon["horizon"].isin(horizons)].itertuples()
+    }
+
+
+def save_report(tables, directory):
+    """Write each table as CSV plus by_horizon.json"""
+    os.makedirs(directory, exist_ok=True)
+    for name, table in tables.items():
+        table.to_csv(os.path.join(directory, f"{name}.csv"), index=False)
+    with open(os.path.join(directory, "by_horizon.json"), "w") as f:
+        json.dump(tables["by_horizon"].to_dict(orient="records"), f, indent=2, default=float)
+    logger.info(f"Backtest report saved to {directory}")
+    return directory
+
+
+if __name__ == "__main__":
+    import argparse
+    from data_source import CSVDataSource
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of recursive forecasts")
+    parser.add_argument("--model", default="balanced", choices=["balanced", "prototype"])
+    parser.add_argument("--model-file", default=None, help="model bundle (default: ../models/<model>_lightgbm_model.pkl)")
+    parser.add_argument("--data", default="../data/", help="directory with daily_aqi_by_county_2024.csv")
+    parser.add_argument("--start", default=None, help="first origin day (YYYY-MM-DD)")
+    parser.add_argument("--end", default=None, help="last origin day (YYYY-MM-DD)")
+    parser.add_argument("--stride", type=int, default=1, help="days between origins")
+    parser.add_argument("--horizon", type=int, default=MAX_HORIZON, help="days forecast from each origin")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--output", default="../models/backtest", help="report directory")
+    args = parser.parse_args()
+
+    with open(args.model_file or f"../models/{args.model}_lightgbm_model.pkl", "rb") as f:
+        bundle = pickle.load(f)
+    county_series = CountySeries(CSVDataSource(args.data))
+    origin_days = default_origins(county_series, args.start, args.end, args.stride)
+    report = summarize(run_backtest(bundle["model"], bundle["scaler"], args.model, county_series,
+                                    origins=origin_days, horizon=args.horizon, workers=args.workers))
+    save_report(report, args.output)
+    print(report["by_horizon"].to_string(index=False))
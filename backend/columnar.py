@@ -0,0 +1,135 @@
+"""
+Columnar storage helpers for CLAP training data
+Each column is stored as its own .npy file next to a JSON manifest so that
+readers can memory-map only the columns they need.
+"""
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+MANIFEST_FILE = '_columns.json'
+
+
+def write_columns(directory, columns, meta=None):
+    """
+    Write a set of equally sized arrays as a columnar directory
+
+    Args:
+        directory: Target directory (replaced atomically if it exists)
+        columns: Mapping of column name -> 1-D array
+        meta: Optional JSON-serializable metadata stored in the manifest
+
+    Returns:
+        Number of rows written
+    """
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+    n_rows = lengths.pop() if lengths else 0
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = os.path.join(parent, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp_dir)
+
+    manifest = {'rows': n_rows, 'columns': [], 'meta': meta or {}}
+    for i, (name, values) in enumerate(columns.items()):
+        values = np.asarray(values)
+        if values.dtype == object:
+            values = values.astype(str)
+        filename = f"c{i:03d}.npy"
+        np.save(os.path.join(tmp_dir, filename), values, allow_pickle=False)
+        manifest['columns'].append({'name': name, 'file': filename, 'dtype': values.dtype.str})
+
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished directory in so readers never see a partial write
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp_dir, directory)
+    return n_rows
+
+
+def read_manifest(directory):
+    """Read the manifest of a columnar directory"""
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def read_columns(directory, names=None, mmap=True):
+    """
+    Read columns from a columnar directory
+
+    Args:
+        directory: Directory written by write_columns()
+        names: Optional list of column names to read (default: all)
+        mmap: Memory-map the arrays instead of loading them
+
+    Returns:
+        Dict of column name -> array
+    """
+    manifest = read_manifest(directory)
+    files = {col['name']: col['file'] for col in manifest['columns']}
+    names = list(files) if names is None else names
+
+    missing = [name for name in names if name not in files]
+    if missing:
+        raise KeyError(f"Columns not found in {directory}: {missing}")
+
+    mmap_mode = 'r' if mmap else None
+    return {
+        name: np.load(os.path.join(directory, files[name]), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in names
+    }
+
+
+def concat_columns(part_dirs, directory, meta=None):
+    """
+    Concatenate columnar parts into a single columnar directory
+
+    Copies one part at a time into memory-mapped output files, so memory use
+    is bounded by the largest part rather than the total size.
+
+    Returns:
+        Number of rows written
+    """
+    manifests = [read_manifest(part) for part in part_dirs]
+    if not manifests:
+        raise ValueError("No columnar parts to concatenate")
+    n_rows = sum(m['rows'] for m in manifests)
+    spec = manifests[0]['columns']
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = os.path.join(parent, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp_dir)
+
+    for col in spec:
+        out = np.lib.format.open_memmap(
+            os.path.join(tmp_dir, col['file']), mode='w+', dtype=np.dtype(col['dtype']), shape=(n_rows,)
+        )
+        offset = 0
+        for part in part_dirs:
+            values = read_columns(part, names=[col['name']])[col['name']]
+            out[offset:offset + len(values)] = values
+            offset += len(values)
+        out.flush()
+        del out
+
+    manifest = {'rows': n_rows, 'columns': spec, 'meta': meta or {}}
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp_dir, directory)
+    return n_rows
+
+
+def has_columns(directory):
+    """Return True if directory contains a complete columnar dataset"""
+    return os.path.isfile(os.path.join(directory, MANIFEST_FILE))
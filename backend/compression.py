@@ -0,0 +1,163 @@
+"""
+Response compression for API payloads and the built SPA
+- API responses above a size threshold are gzip- or brotli-encoded,
+  negotiated from Accept-Encoding. Brotli is used when the optional `brotli`
+  package is installed.
+- Responses with an ETag (the per-version payloads) are compressed once per
+  version and encoding and then served from cached bytes.
+- Static assets are served from precompressed .br/.gz siblings written by
+  `python compression.py <dist dir>` (run.sh does this after `npm run build`).
+"""
+import gzip
+import mimetypes
+import os
+import sys
+
+from flask import request, send_from_directory
+
+from response_cache import ResponseCache
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "application/javascript", "application/x-ndjson",
+    "text/javascript", "text/css", "text/html", "text/plain", "text/csv", "image/svg+xml",
+}
+STATIC_EXTENSIONS = (".js", ".mjs", ".css", ".html", ".svg", ".json", ".txt", ".map", ".wasm")
+
+# File suffix and ETag suffix per encoding, in server preference order
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+ETAG_SUFFIXES = ("", "-br", "-gzip")
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # close to gzip -6 speed with smaller output
+COMPRESSED_CACHE_ENTRIES = 512
+
+
+def available_encodings():
+    return [name for name in ENCODINGS if name != "br" or brotli is not None]
+
+
+def negotiate(accept_encodings=None):
+    """Best encoding the client accepts, or None"""
+    accept_encodings = accept_encodings if accept_encodings is not None else request.accept_encodings
+    for name in available_encodings():
+        if accept_encodings[name] > 0:
+            return name
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def _compressible(response, min_size):
+    return (
+        response.status_code == 200
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and "Content-Encoding" not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+        and (response.content_length or 0) >= min_size
+    )
+
+
+def register_compression(app, min_size):
+    """Compress eligible responses in an after_request hook"""
+    compressed = ResponseCache(COMPRESSED_CACHE_ENTRIES)
+    app.extensions["compressed_bodies"] = compressed
+
+    @app.after_request
+    def compress_response(response):
+        if not _compressible(response, min_size):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate()
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        body = None
+        if etag:
+            # Same version, same bytes: encode once per version and encoding
+            key = (etag, encoding)
+            body = compressed.get(key)
+            if body is None:
+                body = compress(response.get_data(), encoding)
+                compressed.put(key, body)
+            # Encoded and identity bodies need distinct validators
+            response.set_etag(f"{etag}-{encoding}", weak)
+        else:
+            body = compress(response.get_data(), encoding)
+
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+def send_static(directory, path):
+    """send_from_directory, preferring a precompressed sibling the client accepts"""
+    encoding = negotiate()
+    if encoding is not None:
+        encoded_path = path + ENCODINGS[encoding]
+        if os.path.isfile(os.path.join(directory, encoded_path)):
+            # Keep the original file's content type
+            mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response = send_from_directory(directory, encoded_path, mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+            response.vary.add("Accept-Encoding")
+            return response
+    response = send_from_directory(directory, path)
+    if any(os.path.isfile(os.path.join(directory, path + suffix)) for suffix in ENCODINGS.values()):
+        response.vary.add("Accept-Encoding")
+    return response
+
+
+def precompress_directory(root, min_size=1024):
+    """
+    Write .gz (and .br when available) next to each compressible static file
+
+    Skips files below min_size and siblings that are already up to date.
+
+    Returns:
+        Number of files written
+    """
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, name)
+            if os.path.getsize(path) < min_size:
+                continue
+            with open(path, "rb") as f:
+                body = None
+                for encoding in available_encodings():
+                    target = path + ENCODINGS[encoding]
+                    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                        continue
+                    body = body if body is not None else f.read()
+                    # Static files are compressed once, so use the strongest settings
+                    data = (brotli.compress(body, quality=11) if encoding == "br"
+                            else gzip.compress(body, compresslevel=9, mtime=0))
+                    with open(target, "wb") as out:
+                        out.write(data)
+                    written += 1
+    return written
+
+
+if __name__ == "__main__":
+    dist = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                               "..", "frontend", "dist")
+    if not os.path.isdir(dist):
+        print(f"No build output at {dist}, nothing to precompress")
+        sys.exit(0)
+    count = precompress_directory(dist)
+    print(f"Precompressed {count} files in {dist} ({', '.join(available_encodings())})")
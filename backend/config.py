@@ -12,7 +12,79 @@ class Config:
     # Flask Configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
-    DEBUG = os.getenv('FLASK_DEBUG', 'True') == 'True'
+    DEBUG = os.getenv('FLASK_DEBUG', 'True' if FLASK_ENV == 'development' else 'False') == 'True'
+    
+    # Production WSGI server (gunicorn.conf.py)
+    WEB_BIND = os.getenv('WEB_BIND', '0.0.0.0:5001')
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', os.cpu_count() or 2))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 4))
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 30))
+    
+    # Cross-request inference batching (inference_batcher.py)
+    # Off by default: a batch holds at most one row per forecast in progress, and
+    # the default pool and admission limits allow only FORECAST_POOL_WORKERS of those
+    INFERENCE_BATCHING = os.getenv('INFERENCE_BATCHING', 'False') == 'True'
+    INFERENCE_BATCH_MAX_SIZE = int(os.getenv('INFERENCE_BATCH_MAX_SIZE', 64))
+    INFERENCE_BATCH_MAX_WAIT_MS = float(os.getenv('INFERENCE_BATCH_MAX_WAIT_MS', 2))
+    
+    # Bounded stage pools per endpoint class (executors.py)
+    FORECAST_POOL_WORKERS = int(os.getenv('FORECAST_POOL_WORKERS', 2))
+    FORECAST_POOL_QUEUE = int(os.getenv('FORECAST_POOL_QUEUE', 0))  # 0: no free worker fails fast
+    DATA_POOL_WORKERS = int(os.getenv('DATA_POOL_WORKERS', 4))
+    DATA_POOL_QUEUE = int(os.getenv('DATA_POOL_QUEUE', 64))
+    STAGE_QUEUE_TIMEOUT = float(os.getenv('STAGE_QUEUE_TIMEOUT', 0))  # seconds waiting for a slot; 0 fails fast
+    
+    # Admission control for forecast endpoints (admission.py)
+    # Limits only bind below the request threads of a worker, so they derive from
+    # WEB_THREADS: admitted plus queued forecast requests leave one thread free
+    ADMISSION_THREAD_BUDGET = int(os.getenv('ADMISSION_THREAD_BUDGET', max(1, WEB_THREADS - 1)))
+    PREDICT_MAX_IN_FLIGHT = int(os.getenv('PREDICT_MAX_IN_FLIGHT', min(FORECAST_POOL_WORKERS, ADMISSION_THREAD_BUDGET)))
+    REFRESH_MAX_IN_FLIGHT = int(os.getenv('REFRESH_MAX_IN_FLIGHT', min(FORECAST_POOL_WORKERS, ADMISSION_THREAD_BUDGET)))
+    STREAM_MAX_IN_FLIGHT = int(os.getenv('STREAM_MAX_IN_FLIGHT', min(FORECAST_POOL_WORKERS, ADMISSION_THREAD_BUDGET)))
+    EXPORT_MAX_IN_FLIGHT = int(os.getenv('EXPORT_MAX_IN_FLIGHT', 1))
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', max(0, ADMISSION_THREAD_BUDGET - FORECAST_POOL_WORKERS)))
+    ADMISSION_DEADLINE = float(os.getenv('ADMISSION_DEADLINE', 2))  # seconds waiting for a slot
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 1))  # seconds
+    ADMISSION_STALE_ENTRIES = int(os.getenv('ADMISSION_STALE_ENTRIES', 1024))
+    REFRESH_CACHE_ENTRIES = int(os.getenv('REFRESH_CACHE_ENTRIES', 2048))
+    
+    # Response compression (compression.py)
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # bytes
+    
+    # Application logging (structured_logging.py)
+    LOG_FILE = os.getenv('LOG_FILE', 'logs/app.log')
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # records waiting for the writer thread
+    # Share of INFO events kept per operation; unlisted operations are kept in full
+    LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', 'validation=0.1,feature_generation=0.1')
+    
+    # Monte Carlo forecasts (monte_carlo.py)
+    MONTE_CARLO_PATHS = int(os.getenv('MONTE_CARLO_PATHS', 500))  # default paths per county
+    MONTE_CARLO_MAX_PATHS = int(os.getenv('MONTE_CARLO_MAX_PATHS', 2000))  # most a request may ask for
+    MONTE_CARLO_MAX_ROWS = int(os.getenv('MONTE_CARLO_MAX_ROWS', 200000))  # rows per predict call in batch mode
+    
+    # Shadow evaluation (shadow.py): candidate models scored on served forecasts off the
+    # request path, as "name=path" bundle files relative to the repository root; empty is off
+    SHADOW_MODELS = os.getenv('SHADOW_MODELS', '')
+    SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', 1024))  # forecast days waiting; more are dropped
+    SHADOW_MAX_PENDING = int(os.getenv('SHADOW_MAX_PENDING', 50000))  # pairs waiting for actuals
+    
+    # Request metrics (metrics.py)
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'True') == 'True'  # per-stage Server-Timing header
+    
+    # Startup (warmup.py): "background" answers at once and loads data/models on a
+    # thread; "sync" loads before create_app() returns (always used by wsgi.py)
+    WARMUP_MODE = os.getenv('WARMUP_MODE', 'background')
+    WARMUP_FORECASTS = int(os.getenv('WARMUP_FORECASTS', 3))  # counties forecast per model during warm-up
+    
+    # On-demand request profiling (profiler.py); off unless a token or sample rate is set
+    PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN', '')  # sent as X-Profile-Token
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))  # 0..1 of PROFILE_ENDPOINTS requests
+    PROFILE_ENDPOINTS = os.getenv(
+        'PROFILE_ENDPOINTS',
+        'predict.predict_aqi,predict.predict_aqi_stream,refresh.refresh_data,historical.get_historical_aqi'
+    ).split(',')
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'logs/profiles')
     
     # Database Configuration
     DB_HOST = os.getenv('DB_HOST', 'localhost')
@@ -30,7 +102,10 @@ class Config:
     
     # Model Configuration
     MODEL_PATH = os.getenv('MODEL_PATH', 'models/lightgbm_model.pkl')
-    DATA_PATH = os.getenv('DATA_PATH', 'data/')
+    DATA_PATH = os.getenv('DATA_PATH', 'data/')  # relative to the repository root, or absolute
+    FEATURE_CACHE_PATH = os.getenv('FEATURE_CACHE_PATH', 'cache/features/')
+    TRAINING_SET_PATH = os.getenv('TRAINING_SET_PATH', 'cache/training_set/')
+    FEATURE_STORE_PATH = os.getenv('FEATURE_STORE_PATH', 'cache/feature_store/')  # latest features per county
     
     # AQI Categories (EPA Standard)
     AQI_CATEGORIES = {
@@ -0,0 +1,275 @@
+"""
+Streaming data pipeline for CLAP training
+Reads the raw EPA daily AQI CSVs in chunks, engineers per-county lag/rolling
+features and writes a month-partitioned columnar training set to disk.
+Featurization memory is bounded by the chunk size plus a short per-county
+history that is carried across chunk (and file) boundaries, not by the number
+of years read. Training itself is not: load_training_set() returns the whole
+featurized set (about 50 bytes per row in its on-disk dtypes), because the
+time split, the scaler and LightGBM all work on it at once.
+"""
+import glob
+import logging
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from config import Config
+from columnar import write_columns, read_columns, read_manifest, has_columns
+from feature_cache import code_digest
+
+logger = logging.getLogger(__name__)
+
+RAW_FILE_PATTERN = 'daily_aqi_by_county_*.csv'
+KEY_COLS = ['State Code', 'County Code']
+TARGET_COL = 'AQI'
+DEFAULT_CHUNK_ROWS = 200_000
+
+# Define BALANCED feature set (~15 features)
+FEATURE_COLS = [
+    'State Code', 'County Code',  # Location identifiers
+    'AQI_lag1', 'AQI_lag3', 'AQI_lag7', 'AQI_lag14',  # Lag features
+    'AQI_rolling_7',  # ONE rolling average
+    'day_of_week', 'month',  # Basic temporal
+    'AQI_rolling_3',  # Short-term trend
+    'AQI_std_7',  # Volatility measure
+]
+LAG_COLS = ['AQI_lag1', 'AQI_lag3', 'AQI_lag7', 'AQI_lag14']
+
+# Rows per county needed to compute the longest lag/window for the next chunk
+HISTORY_ROWS = 14
+
+# Compact on-disk dtypes for the training set
+COLUMN_DTYPES = {
+    'State Code': np.int16,
+    'County Code': np.int16,
+    'day_of_week': np.int8,
+    'month': np.int8,
+}
+
+
+def county_key(frame):
+    """Single integer key (state * 1000 + county, i.e. the county FIPS code)"""
+    return frame['State Code'].astype(np.int64) * 1000 + frame['County Code'].astype(np.int64)
+
+
+def _rolling(grouped, window, how):
+    rolled = getattr(grouped.rolling(window=window, min_periods=1), how)()
+    return rolled.reset_index(level=list(range(rolled.index.nlevels - 1)), drop=True)
+
+
+def add_balanced_features(frame):
+    """
+    Add the balanced feature set to a frame sorted by county and date.
+    Lags and windows are computed within each county.
+
+    All windows, AQI_rolling_3 and AQI_std_7 included, are computed before
+    rows with missing lags are dropped, so they cover the county's full
+    history (and the rows carried over from the previous chunk). The original
+    train_balanced_model.py computed those two after dropping the first 14
+    rows of each county, so the first few kept rows of every county had
+    shorter windows; training features differ only in those rows.
+    """
+    grouped = frame.groupby(KEY_COLS, sort=False)[TARGET_COL]
+    frame['AQI_lag1'] = grouped.shift(1)
+    frame['AQI_lag3'] = grouped.shift(3)
+    frame['AQI_lag7'] = grouped.shift(7)
+    frame['AQI_lag14'] = grouped.shift(14)
+    frame['AQI_rolling_7'] = _rolling(grouped, 7, 'mean')
+    frame['AQI_rolling_3'] = _rolling(grouped, 3, 'mean')
+    frame['AQI_std_7'] = _rolling(grouped, 7, 'std').fillna(0)
+    frame['day_of_week'] = frame['Date'].dt.dayofweek
+    frame['month'] = frame['Date'].dt.month
+    return frame.dropna(subset=LAG_COLS)
+
+
+def stream_county_chunks(csv_files, featurize, history_rows=HISTORY_ROWS,
+                         chunksize=DEFAULT_CHUNK_ROWS, usecols=None):
+    """
+    Read CSV files in chunks and yield featurized rows per chunk
+
+    The last history_rows rows of every county are carried into the next
+    chunk, so per-county lags and rolling windows are exact across chunk and
+    file boundaries. Each county's rows are expected in chronological order
+    across files (EPA annual files read oldest first).
+
+    Args:
+        csv_files: Raw CSV paths in chronological order
+        featurize: Callable taking a frame sorted by county/date, returning featurized rows
+        history_rows: Rows per county to carry between chunks
+        chunksize: Rows read per chunk
+        usecols: Optional subset of CSV columns to read
+
+    Yields:
+        DataFrame of featurized rows belonging to the current chunk
+    """
+    carry = None
+    for path in csv_files:
+        logger.info(f"Streaming {path}")
+        for chunk in pd.read_csv(path, chunksize=chunksize, usecols=usecols, parse_dates=['Date']):
+            chunk['_key'] = county_key(chunk)
+            chunk['_carry'] = False
+
+            if carry is not None:
+                in_chunk = carry['_key'].isin(chunk['_key'].unique())
+                combined = pd.concat([carry[in_chunk], chunk], ignore_index=True)
+                idle = carry[~in_chunk]
+            else:
+                combined = chunk.reset_index(drop=True)
+                idle = None
+
+            # Duplicate (county, date) rows keep the first occurrence, as in the training scripts
+            combined = combined.drop_duplicates(subset=['_key', 'Date'], keep='first')
+            combined = combined.sort_values(['_key', 'Date'], kind='stable').reset_index(drop=True)
+
+            featured = featurize(combined.copy())
+            featured = featured[~featured['_carry']]
+            if len(featured):
+                yield featured.drop(columns=['_key', '_carry'])
+
+            tail = combined.groupby('_key', sort=False).tail(history_rows).assign(_carry=True)
+            carry = tail if idle is None or idle.empty else pd.concat([idle, tail], ignore_index=True)
+
+
+# Identifies the engineered features in cache keys and saved pipelines. The code
+# hash changes whenever the feature engineering does.
+FEATURE_SPEC = {
+    'builder': 'DataPipeline', 'features': FEATURE_COLS, 'history_rows': HISTORY_ROWS, 'version': 1,
+    'code': code_digest(county_key, _rolling, add_balanced_features, stream_county_chunks),
+}
+
+
+class DataPipeline:
+    """Bounded-memory feature pipeline producing a partitioned columnar training set"""
+
+    def __init__(self, data_path='data/', output_path=None, model_path='models/',
+                 chunksize=DEFAULT_CHUNK_ROWS):
+        self.data_path = data_path
+        self.output_path = output_path or Config.TRAINING_SET_PATH
+        self.model_path = model_path
+        self.chunksize = chunksize
+        self.scaler = None
+        self.feature_names = list(FEATURE_COLS)
+
+    def source_files(self):
+        """Raw EPA files in chronological (file name) order"""
+        files = sorted(glob.glob(os.path.join(self.data_path, RAW_FILE_PATTERN)))
+        if not files:
+            raise FileNotFoundError(f"No {RAW_FILE_PATTERN} files found in {self.data_path}")
+        return files
+
+    def run_full_pipeline(self):
+        """
+        Stream the raw files, write the featurized training set and fit the scaler
+
+        Returns:
+            Number of training rows written
+        """
+        if os.path.exists(self.output_path):
+            shutil.rmtree(self.output_path)
+        os.makedirs(self.output_path)
+
+        scaler = StandardScaler()
+        total_rows = 0
+        usecols = KEY_COLS + ['Date', TARGET_COL]
+        chunks = stream_county_chunks(self.source_files(), add_balanced_features,
+                                      chunksize=self.chunksize, usecols=usecols)
+
+        for part, featured in enumerate(chunks):
+            scaler.partial_fit(featured[FEATURE_COLS].values)
+            total_rows += self._write_partitions(featured, part)
+            logger.info(f"Chunk {part}: {len(featured)} rows featurized ({total_rows} total)")
+
+        if total_rows == 0:
+            raise ValueError("Data pipeline produced no training rows")
+
+        self.scaler = scaler
+        logger.info(f"Training set written to {self.output_path}: {total_rows} rows")
+        return total_rows
+
+    def _write_partitions(self, featured, part):
+        """Write one columnar part per month present in the chunk"""
+        rows = 0
+        months = featured['Date'].dt.strftime('%Y-%m')
+        for month, rows_in_month in featured.groupby(months, sort=True):
+            columns = {'Date': rows_in_month['Date'].values.astype('datetime64[D]')}
+            for col in FEATURE_COLS + [TARGET_COL]:
+                columns[col] = rows_in_month[col].values.astype(COLUMN_DTYPES.get(col, np.float32))
+            directory = os.path.join(self.output_path, f"month={month}", f"part-{part:05d}")
+            rows += write_columns(directory, columns, meta={'month': month})
+        return rows
+
+    def partitions(self):
+        """Partition directories in chronological order"""
+        pattern = os.path.join(self.output_path, 'month=*', 'part-*')
+        return [path for path in sorted(glob.glob(pattern)) if has_columns(path)]
+
+    def load_training_set(self, scaled=True, with_dates=False):
+        """
+        Load the written training set in date order
+
+        The result holds every row, so memory grows with the data (see the
+        module docstring). Columns are filled month by month into arrays
+        sized from the partition manifests: besides the result, only one
+        month is in memory at a time.
+
+        Args:
+            scaled: Apply the fitted scaler to the feature columns
+            with_dates: Include the Date column
+
+        Returns:
+            DataFrame with FEATURE_COLS and the AQI target
+        """
+        paths = self.partitions()
+        if not paths:
+            raise ValueError(f"No training partitions found in {self.output_path}")
+
+        months = {}
+        for path in paths:
+            months.setdefault(os.path.dirname(path), []).append(path)
+        n_rows = sum(read_manifest(path)['rows'] for path in paths)
+        columns = (['Date'] if with_dates else []) + FEATURE_COLS + [TARGET_COL]
+        first = read_columns(paths[0])
+        data = {col: np.empty(n_rows, dtype=first[col].dtype) for col in columns}
+
+        # Months are disjoint and in order, so sorting within each month sorts the whole set
+        offset = 0
+        for month_paths in months.values():
+            parts = [read_columns(path) for path in month_paths]
+            order = np.argsort(np.concatenate([part['Date'] for part in parts]), kind='stable')
+            for col in columns:
+                data[col][offset:offset + len(order)] = np.concatenate([part[col] for part in parts])[order]
+            offset += len(order)
+
+        frame = pd.DataFrame(data, copy=False)
+        if with_dates:
+            frame['Date'] = pd.to_datetime(frame['Date'])
+
+        if scaled:
+            if self.scaler is None:
+                raise ValueError("Scaler not fitted. Call run_full_pipeline() first.")
+            frame[FEATURE_COLS] = self.scaler.transform(frame[FEATURE_COLS].values)
+        return frame
+
+    def save_pipeline(self, filename='pipeline.pkl'):
+        """Persist the fitted scaler with the feature spec and training set location"""
+        if self.scaler is None:
+            raise ValueError("Scaler not fitted. Call run_full_pipeline() first.")
+
+        os.makedirs(self.model_path, exist_ok=True)
+        filepath = os.path.join(self.model_path, filename)
+        with open(filepath, 'wb') as f:
+            pickle.dump({
+                'scaler': self.scaler,
+                'label_encoders': {},
+                'feature_names': self.feature_names,
+                'feature_spec': FEATURE_SPEC,
+                'training_set': self.output_path,
+            }, f)
+
+        logger.info(f"Pipeline saved to {filepath}")
+        return filepath
@@ -1,22 +1,100 @@
 """
 Data source adapter - reads from CSV files instead of database
 """
+import hashlib
 import pandas as pd
+import numpy as np
 import os
+import threading
 from datetime import datetime, timedelta
 import logging
 
+from feature_store import code_columns
+
 logger = logging.getLogger(__name__)
 
 
+class CountySnapshot:
+    """
+    One county's full series, sliced and sorted once
+    
+    History payloads and prediction features are both cut from the same
+    chronologically sorted frame, so a dashboard refresh filters the data once.
+    """
+    
+    def __init__(self, county, state, frame):
+        self.county = county
+        self.state = state
+        self.frame = frame
+    
+    @property
+    def fips(self):
+        """County FIPS code (state * 1000 + county), or 0 if the data has no codes"""
+        if 'state_code' not in self.frame or 'county_code' not in self.frame or len(self.frame) == 0:
+            return 0
+        row = self.frame.iloc[0]
+        return int(row['state_code']) * 1000 + int(row['county_code'])
+    
+    def between(self, start=None, end=None):
+        """Rows dated within [start, end] (either bound optional), chronological"""
+        dates = self.frame['Date'].values
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start), side='left')
+        hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(end), side='right')
+        return self.frame.iloc[lo:hi]
+    
+    def recent(self, days=30):
+        """Most recent `days` rows, chronological"""
+        return self.frame.tail(days)
+    
+    def history(self, days=30):
+        """Most recent `days` rows as API records"""
+        result = []
+        for _, row in self.recent(days).iterrows():
+            result.append({
+                'date': row['Date'].strftime('%Y-%m-%d'),
+                'aqi': int(row['AQI']) if pd.notna(row['AQI']) else None,
+                'category': row.get('category', 'Unknown'),
+                'defining_parameter': row.get('defining_parameter', 'Unknown')
+            })
+        return result
+
+
 class CSVDataSource:
     """Read AQI data from CSV files"""
     
     def __init__(self, data_path='../data/'):
         self.data_path = data_path
         self.df = None
+        self.version = None
+        self.last_modified = None
+        self._county_rows = {}
+        # FeatureStore kept in step by append_day(); attached during warm-up
+        self.feature_store = None
+        self._append_lock = threading.Lock()
         self.load_data()
     
+    @staticmethod
+    def _normalize_columns(df):
+        """Rename CSV columns to the names used here"""
+        if 'county Name' in df.columns:
+            df = df.rename(columns={'county Name': 'county_name'})
+        if 'State Name' in df.columns:
+            df = df.rename(columns={'State Name': 'state_name'})
+        if 'State Code' in df.columns:
+            df = df.rename(columns={'State Code': 'state_code'})
+        if 'County Code' in df.columns:
+            df = df.rename(columns={'County Code': 'county_code'})
+        if 'Category' in df.columns:
+            df = df.rename(columns={'Category': 'category'})
+        if 'Defining Parameter' in df.columns:
+            df = df.rename(columns={'Defining Parameter': 'defining_parameter'})
+        
+        # Create county_name if it doesn't exist (for encoded dataset)
+        if 'county_name' not in df.columns and 'county_code' in df.columns:
+            # Create a mapping from county codes to names
+            df['county_name'] = df['county_code'].astype(str) + '_County'
+        return df
+    
     def load_data(self):
         """Load data from CSV file"""
         try:
@@ -28,25 +106,15 @@ class CSVDataSource:
             
             logger.info(f"Loading data from {csv_file}")
             self.df = pd.read_csv(csv_file, parse_dates=['Date'])
+            self.df = self._normalize_columns(self.df)
             
-            # Rename columns to match expected format
-            if 'county Name' in self.df.columns:
-                self.df = self.df.rename(columns={'county Name': 'county_name'})
-            if 'State Name' in self.df.columns:
-                self.df = self.df.rename(columns={'State Name': 'state_name'})
-            if 'State Code' in self.df.columns:
-                self.df = self.df.rename(columns={'State Code': 'state_code'})
-            if 'County Code' in self.df.columns:
-                self.df = self.df.rename(columns={'County Code': 'county_code'})
-            if 'Category' in self.df.columns:
-                self.df = self.df.rename(columns={'Category': 'category'})
-            if 'Defining Parameter' in self.df.columns:
-                self.df = self.df.rename(columns={'Defining Parameter': 'defining_parameter'})
-            
-            # Create county_name if it doesn't exist (for encoded dataset)
-            if 'county_name' not in self.df.columns and 'county_code' in self.df.columns:
-                # Create a mapping from county codes to names
-                self.df['county_name'] = self.df['county_code'].astype(str) + '_County'
+            self._build_county_index()
+            stat = os.stat(csv_file)
+            # Changes whenever the file is replaced or rewritten
+            self.version = hashlib.sha1(
+                f"{os.path.abspath(csv_file)}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+            ).hexdigest()[:16]
+            self.last_modified = datetime.utcfromtimestamp(stat.st_mtime)
             
             logger.info(f"Loaded {len(self.df)} records from CSV")
             logger.info(f"Date range: {self.df['Date'].min()} to {self.df['Date'].max()}")
@@ -56,6 +124,97 @@ class CSVDataSource:
             logger.error(f"Failed to load CSV data: {str(e)}")
             raise
     
+    def _build_county_index(self):
+        """Row positions of each county, in date order"""
+        order = np.argsort(self.df['Date'].values, kind='stable')
+        ordered = self.df.iloc[order]
+        groups = ordered.groupby(['county_name', 'state_name'], sort=False).indices
+        self._county_rows = {key: order[positions] for key, positions in groups.items()}
+    
+    def append_day(self, rows):
+        """
+        Append newly arrived daily rows (CSV columns) in memory
+        
+        Each row must be newer than its county's latest row. The county index
+        is extended rather than rebuilt, the version changes so version-keyed
+        caches refresh, and an attached feature store is updated per county
+        and saved. The CSV file is not written; a restart reloads it.
+        
+        Request threads read without locking, so nothing they may hold is
+        mutated: the new frame, county index and feature store are built
+        aside and swapped in, the frame first. Rows only ever get appended,
+        so an older county index stays valid against the newer frame, and
+        a feature store whose version does not match is not used.
+        
+        Returns:
+            Number of rows appended
+        """
+        rows = self._normalize_columns(rows.copy())
+        rows['Date'] = pd.to_datetime(rows['Date'])
+        rows = rows.sort_values('Date', kind='stable').reset_index(drop=True)
+        keys = list(zip(rows['county_name'], rows['state_name']))
+        dates = rows['Date'].values
+        
+        with self._append_lock:
+            county_rows = dict(self._county_rows)
+            latest = {}
+            for key, date in zip(keys, dates):
+                existing = county_rows.get(key)
+                last = latest.get(key, self.df['Date'].values[existing[-1]] if existing is not None else None)
+                if last is not None and date <= last:
+                    raise ValueError(f"Row for {key[0]}, {key[1]} on {pd.Timestamp(date).date()} is not newer than its data")
+                latest[key] = date
+            
+            start = len(self.df)
+            df = pd.concat([self.df, rows], ignore_index=True)
+            for offset, key in enumerate(keys):
+                existing = county_rows.get(key)
+                position = np.array([start + offset])
+                county_rows[key] = position if existing is None else np.concatenate([existing, position])
+            version = hashlib.sha1(
+                f"{self.version}:{start}:{len(rows)}:{dates.max()}".encode()
+            ).hexdigest()[:16]
+            
+            store = None
+            if self.feature_store is not None:
+                store = self.feature_store.copy()
+                aqi = rows['AQI'].to_numpy(dtype=np.float64)
+                codes = code_columns(rows)
+                new = {}  # first row of each county not yet in the store
+                for i, key in enumerate(keys):
+                    if key not in store.index:
+                        new.setdefault(key, tuple(codes[i]))
+                for date, group in rows.groupby('Date', sort=True).indices.items():
+                    store.append_day(date, {keys[i]: aqi[i] for i in group}, new)
+                store.version = version
+                if store.directory:
+                    store.save(store.directory)
+            
+            self.df = df
+            self._county_rows = county_rows
+            self.version = version
+            self.last_modified = datetime.utcnow()
+            if store is not None:
+                self.feature_store = store
+        
+        logger.info(f"Appended {len(rows)} records, data version {self.version}")
+        return len(rows)
+    
+    def get_county_snapshot(self, county, state):
+        """CountySnapshot for a county, or None if it has no data"""
+        if self.df is None:
+            return None
+        rows = self._county_rows.get((county, state))
+        if rows is None:
+            return None
+        return CountySnapshot(county, state, self.df.iloc[rows])
+    
+    def iter_county_snapshots(self, county=None, state=None):
+        """CountySnapshots ordered by state then county, optionally filtered"""
+        for key in sorted(self._county_rows, key=lambda k: (k[1], k[0])):
+            if (county is None or key[0] == county) and (state is None or key[1] == state):
+                yield self.get_county_snapshot(*key)
+    
     def get_counties(self):
         """Get list of available counties"""
         if self.df is None:
@@ -79,49 +238,23 @@ class CSVDataSource:
         if self.df is None:
             return []
         
-        # Filter by county and state
-        filtered = self.df[
-            (self.df['county_name'] == county) & 
-            (self.df['state_name'] == state)
-        ].copy()
-        
-        if len(filtered) == 0:
+        snapshot = self.get_county_snapshot(county, state)
+        if snapshot is None:
             return []
         
-        # Get the most recent N days
-        filtered = filtered.sort_values('Date', ascending=False).head(days)
-        filtered = filtered.sort_values('Date')  # Sort chronologically for display
-        
-        result = []
-        for _, row in filtered.iterrows():
-            result.append({
-                'date': row['Date'].strftime('%Y-%m-%d'),
-                'aqi': int(row['AQI']) if pd.notna(row['AQI']) else None,
-                'category': row.get('category', 'Unknown'),
-                'defining_parameter': row.get('defining_parameter', 'Unknown')
-            })
-        
-        return result
+        return snapshot.history(days)
     
     def get_recent_data_for_prediction(self, county, state, days=30):
         """Get recent data for generating prediction features"""
         if self.df is None:
             return None
         
-        # Filter by county and state
-        filtered = self.df[
-            (self.df['county_name'] == county) & 
-            (self.df['state_name'] == state)
-        ].copy()
-        
-        if len(filtered) == 0:
+        snapshot = self.get_county_snapshot(county, state)
+        if snapshot is None:
             return None
         
-        # Get the most recent N days
-        filtered = filtered.sort_values('Date', ascending=False).head(days)
-        filtered = filtered.sort_values('Date')  # Sort chronologically
-        
-        return filtered
+        # Most recent N days, chronological
+        return snapshot.recent(days).copy()
 
 
 # Global instance
@@ -0,0 +1,131 @@
+"""
+Bounded executors for CPU-bound request stages
+Data slicing, feature building and model inference run on a small thread
+pool per endpoint class instead of directly on the request thread. Each pool
+caps how many stages run at once and how many may wait, so a burst of
+forecasts cannot starve cheap endpoints (health, categories) of CPU time.
+
+The request thread waits for its stage, so every running or queued stage also
+holds one of the server's request threads. With the default queue of 0 and
+timeout of 0, a stage that finds no free worker fails fast with PoolSaturated
+instead of waiting. At most max_workers request threads are then tied up in a
+pool, and check_thread_budget() warns when a pool could take all of them.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import record_span
+from profiler import profiled_thread
+
+
+class PoolSaturated(Exception):
+    """Raised when a stage cannot get a pool slot (within the queue timeout, if any)"""
+
+    def __init__(self, pool_name, queue_timeout):
+        super().__init__(f"{pool_name} pool saturated (no slot within {queue_timeout:g}s)" if queue_timeout > 0
+                         else f"{pool_name} pool saturated (no free worker)")
+        self.pool_name = pool_name
+        self.queue_timeout = queue_timeout
+
+
+class StagePool:
+    """Thread pool with a bounded number of running plus queued stages"""
+
+    def __init__(self, name, max_workers, max_queue, queue_timeout):
+        """
+        Args:
+            name: Endpoint class served by this pool
+            max_workers: Stages running at once
+            max_queue: Stages allowed to wait for a worker
+            queue_timeout: Seconds a caller waits for a slot before PoolSaturated; 0 fails at once
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # Worker threads start on first submit, i.e. after a gunicorn preload fork
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-stage")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._saturated = 0
+
+    def submit(self, app, fn, *args, **kwargs):
+        """
+        Schedule fn inside an app context; returns a Future
+
+        fn runs in a copy of the caller's contextvars, so request-scoped
+        state such as metric spans follows it onto the worker thread.
+
+        Raises:
+            PoolSaturated: No slot freed up within queue_timeout
+        """
+        acquired = (self._slots.acquire(timeout=self.queue_timeout) if self.queue_timeout > 0
+                    else self._slots.acquire(blocking=False))
+        if not acquired:
+            with self._lock:
+                self._saturated += 1
+            raise PoolSaturated(self.name, self.queue_timeout)
+        with self._lock:
+            self._pending += 1
+
+        context = contextvars.copy_context()
+        submitted = time.perf_counter()
+
+        def call():
+            record_span(f"{self.name}_queue", time.perf_counter() - submitted)
+            with app.app_context(), profiled_thread():
+                return fn(*args, **kwargs)
+
+        try:
+            future = self._executor.submit(context.run, call)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def run(self, app, fn, *args, **kwargs):
+        """Run fn on the pool and wait for its result"""
+        return self.submit(app, fn, *args, **kwargs).result()
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._pending,
+                "saturated": self._saturated,
+            }
+
+
+def check_thread_budget(config):
+    """
+    Warnings when the forecast pool could tie up every request thread of a worker
+
+    Each running or queued stage blocks the request thread that submitted it,
+    so the forecast pool needs fewer slots than WEB_THREADS to leave health and
+    other cheap endpoints a thread. Data stages are short reads and may queue.
+    """
+    slots = config.FORECAST_POOL_WORKERS + config.FORECAST_POOL_QUEUE
+    if slots < config.WEB_THREADS:
+        return []
+    return [f"forecast pool has {slots} slots (workers + queue) for {config.WEB_THREADS} request threads; "
+            f"slow forecasts can block every thread"]
+
+
+def create_stage_pools(config):
+    """One pool per endpoint class, sized from Config"""
+    return {
+        "forecast": StagePool("forecast", config.FORECAST_POOL_WORKERS,
+                              config.FORECAST_POOL_QUEUE, config.STAGE_QUEUE_TIMEOUT),
+        "data": StagePool("data", config.DATA_POOL_WORKERS,
+                          config.DATA_POOL_QUEUE, config.STAGE_QUEUE_TIMEOUT),
+    }
@@ -0,0 +1,158 @@
+"""
+Content-addressed cache for engineered features and LightGBM Dataset binaries
+Training inputs (source files, feature spec, split definition) are hashed and
+the resulting feature matrices are stored under that hash, so repeated runs
+with identical inputs skip loading and feature engineering entirely. Objects
+fitted alongside the features (e.g. the scaler) are stored in the same entry,
+so a hit can restore them.
+"""
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+
+import lightgbm as lgb
+
+from config import Config
+from columnar import write_columns, read_columns, read_manifest, has_columns
+
+logger = logging.getLogger(__name__)
+
+# Parameters that change how LightGBM bins a Dataset. A binary Dataset is only
+# reusable with the same values, so they are part of its cache file name.
+DATASET_PARAMS = (
+    'max_bin', 'min_data_in_bin', 'bin_construct_sample_cnt', 'feature_pre_filter',
+    'min_data_in_leaf', 'use_missing', 'zero_as_missing', 'categorical_feature', 'linear_tree',
+)
+
+_CHUNK_SIZE = 1 << 20
+
+
+def _file_digest(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_digest(*functions):
+    """
+    Short hash of the functions' source code
+
+    Part of a feature spec, so editing feature engineering invalidates cached
+    features without anyone having to bump a version by hand.
+    """
+    digest = hashlib.sha256()
+    for fn in functions:
+        digest.update(inspect.getsource(fn).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _json_digest(obj):
+    payload = json.dumps(obj, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+class FeatureCache:
+    """Store engineered feature matrices and Dataset binaries keyed by input hash"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or Config.FEATURE_CACHE_PATH
+
+    def key_for(self, source_files, feature_spec, split_spec):
+        """
+        Compute the cache key for a training run
+
+        Args:
+            source_files: Paths of the raw data files read by the run
+            feature_spec: JSON-serializable description of the engineered features
+            split_spec: JSON-serializable description of the train/test split
+
+        Returns:
+            Hex digest identifying the inputs
+        """
+        sources = [
+            {'name': os.path.basename(path), 'sha256': _file_digest(path)}
+            for path in sorted(source_files)
+        ]
+        return _json_digest({'sources': sources, 'features': feature_spec, 'split': split_spec})
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _frame_dir(self, key, name):
+        return os.path.join(self.entry_dir(key), name)
+
+    # Feature matrices
+    def has_frame(self, key, name='features'):
+        return has_columns(self._frame_dir(key, name))
+
+    def load_frame(self, key, name='features', mmap=True):
+        """
+        Load a cached feature frame
+
+        Returns:
+            Tuple of (dict of column arrays, metadata) or None on a cache miss
+        """
+        directory = self._frame_dir(key, name)
+        if not has_columns(directory):
+            return None
+        columns = read_columns(directory, mmap=mmap)
+        meta = read_manifest(directory).get('meta', {})
+        logger.info(f"Feature cache hit: {key[:12]}/{name} ({len(next(iter(columns.values()), []))} rows)")
+        return columns, meta
+
+    def save_frame(self, key, columns, name='features', meta=None):
+        """Store a feature frame given as a mapping of column name -> array"""
+        rows = write_columns(self._frame_dir(key, name), columns, meta=meta)
+        logger.info(f"Feature cache stored: {key[:12]}/{name} ({rows} rows)")
+        return rows
+
+    # Fitted objects
+    def _object_path(self, key, name):
+        return os.path.join(self.entry_dir(key), f"{name}.pkl")
+
+    def load_object(self, key, name):
+        """Unpickle an object stored with save_object(), or None on a miss"""
+        path = self._object_path(key, name)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def save_object(self, key, name, obj):
+        path = self._object_path(key, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(obj, f)
+        os.replace(tmp_path, path)
+        return path
+
+    # LightGBM Dataset binaries
+    def dataset_path(self, key, name, params=None):
+        params = params or {}
+        binning = {p: params[p] for p in DATASET_PARAMS if p in params}
+        return os.path.join(self.entry_dir(key), f"{name}-{_json_digest(binning)[:12]}.bin")
+
+    def load_dataset(self, key, name, params=None, reference=None):
+        """Return a lgb.Dataset backed by a cached binary, or None on a miss"""
+        path = self.dataset_path(key, name, params)
+        if not os.path.isfile(path):
+            return None
+        logger.info(f"Dataset cache hit: {os.path.basename(path)}")
+        return lgb.Dataset(path, reference=reference, params=params)
+
+    def save_dataset(self, key, name, dataset, params=None):
+        """Construct a lgb.Dataset (if needed) and write its binary to the cache"""
+        path = self.dataset_path(key, name, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        dataset.construct().save_binary(tmp_path)
+        os.replace(tmp_path, path)
+        logger.info(f"Dataset cache stored: {os.path.basename(path)}")
+        return path
@@ -0,0 +1,280 @@
+"""
+Latest prediction features per county, as packed arrays
+build_features_from_recent() slices a county's last 30 rows into a DataFrame
+and derives lags and rolling means from it on every request. The store keeps,
+for every county, the same 30-day AQI window as one row of a (counties x 30)
+array. From it, one vectorized pass computes the same features, so a predict
+request reads its base features with a single dict lookup and row index.
+
+- Built once from the data source. It is saved as `<data version>.npz` under
+  FEATURE_STORE_PATH, so a restart on unchanged data loads it instead of
+  rebuilding.
+- append_day() adds one new day per county in constant time: the window row
+  is shifted and only that county's features are recomputed. The data source
+  applies it to a copy() and swaps that in, so readers never see a half
+  update.
+- Features match build_features_from_recent() exactly (see FEATURE_NAMES).
+  Windows are right-aligned and padded with NaN for counties with fewer than
+  30 rows. The padding never reaches a lag, because a lag falls back to lag 1
+  when the history is too short, and NaN-skipping means ignore it.
+
+model_inputs() and advance_features() are the model input rows and the
+recursive forecast's feedback step. They work on scalars (one county, as in
+iter_forecast) or on arrays (every county at once, as in backtest.py).
+"""
+import glob
+import os
+import warnings
+
+import numpy as np
+
+WINDOW = 30
+# Same keys, same order, as build_features_from_recent()
+FEATURE_NAMES = ("aqi_lag_1", "aqi_lag_2", "aqi_lag_3", "aqi_lag_7",
+                 "aqi_rolling_7", "aqi_rolling_14", "aqi_rolling_30")
+MIN_ROWS = 7  # forecasts need at least a week of history
+
+
+def _nanmean(values):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows give NaN, like pandas
+        return np.nanmean(values, axis=-1)
+
+
+def compute_features(window, counts):
+    """
+    Features for right-aligned windows
+
+    Args:
+        window: (n, WINDOW) AQI values, oldest first, NaN-padded on the left
+        counts: (n,) rows in each window (at most WINDOW)
+
+    Returns:
+        (n, len(FEATURE_NAMES)) float64
+    """
+    window = np.atleast_2d(window)
+    counts = np.atleast_1d(counts)
+    lag_1 = window[:, -1]
+
+    def lag(k):
+        return np.where(counts >= k, window[:, -k], lag_1)
+
+    rolling_7 = _nanmean(window[:, -7:])
+    return np.column_stack([
+        lag_1, lag(2), lag(3), lag(7),
+        rolling_7,
+        np.where(counts >= 14, _nanmean(window[:, -14:]), rolling_7),
+        _nanmean(window),
+    ])
+
+
+def code_columns(df):
+    """
+    (len(df), 2) "State Code"/"County Code" of each row as model inputs see them
+
+    Model inputs read these through county_row.get(name, 1); mirror that default.
+    """
+    codes = np.ones((len(df), 2))
+    for j, name in enumerate(("State Code", "County Code")):
+        if name in df:
+            codes[:, j] = df[name].to_numpy(dtype=np.float64)
+    return codes
+
+
+def model_inputs(model_type, features, state_code, county_code, when):
+    """
+    Unscaled model input rows
+
+    Args:
+        features: FEATURE_NAMES -> scalar, or -> (n,) array
+        state_code, county_code: Scalars or (n,) arrays
+        when: Forecast date (a datetime)
+
+    Returns:
+        (1, n_features) for scalar inputs, else (n, n_features)
+    """
+    lag_1 = features["aqi_lag_1"]
+    lag_7 = features["aqi_lag_7"]
+    if model_type == "prototype":
+        columns = [state_code, county_code, 0, 0, 0, 0, 0, lag_1, features["aqi_lag_3"], lag_7]
+    elif model_type == "balanced":
+        columns = [
+            state_code, county_code,
+            lag_1,
+            features["aqi_lag_3"],
+            lag_7,
+            features.get("aqi_lag_14", lag_7),
+            features["aqi_rolling_7"],
+            when.weekday(),
+            when.month,
+            features.get("aqi_rolling_3", lag_1),
+            features.get("aqi_std_7", 0),
+        ]
+    else:
+        raise ValueError(f"Unknown model type: {model_type}")
+    return np.column_stack(np.broadcast_arrays(*columns)).astype(np.float64)
+
+
+def advance_features(features, yhat):
+    """Feed one forecast step back into the features, in place"""
+    features["aqi_lag_7"] = features["aqi_lag_3"]
+    features["aqi_lag_3"] = features["aqi_lag_1"]
+    features["aqi_lag_1"] = yhat
+    if "aqi_rolling_7" in features:
+        features["aqi_rolling_7"] = (features["aqi_rolling_7"] * 6 + yhat) / 7
+    if "aqi_rolling_14" in features:
+        features["aqi_rolling_14"] = (features["aqi_rolling_14"] * 13 + yhat) / 14
+    if "aqi_rolling_30" in features:
+        features["aqi_rolling_30"] = (features["aqi_rolling_30"] * 29 + yhat) / 30
+    return features
+
+
+class FeatureStore:
+    """Base forecast features for every county of one data version"""
+
+    def __init__(self, keys, window, counts, codes, last_dates, version):
+        self.keys = list(keys)  # (county, state)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.window = window
+        self.counts = counts
+        self.codes = codes  # (n, 2) "State Code"/"County Code" as model inputs see them
+        self.last_dates = last_dates  # datetime64[D] of each county's newest row
+        self.version = version
+        self.directory = None  # where save() keeps it current, set by load_or_build()
+        self.features = compute_features(window, counts) if len(self.keys) else np.empty((0, len(FEATURE_NAMES)))
+
+    @classmethod
+    def from_source(cls, source):
+        """Build from a CSVDataSource's county index"""
+        df = source.df
+        aqi = df["AQI"].to_numpy(dtype=np.float64)
+        dates = df["Date"].to_numpy().astype("datetime64[D]")
+        row_codes = code_columns(df)
+
+        keys = list(source._county_rows)
+        n = len(keys)
+        window = np.full((n, WINDOW), np.nan)
+        counts = np.zeros(n, dtype=np.int64)
+        codes = np.ones((n, 2))
+        last_dates = np.empty(n, dtype="datetime64[D]")
+        for i, key in enumerate(keys):
+            rows = source._county_rows[key][-WINDOW:]
+            window[i, WINDOW - len(rows):] = aqi[rows]
+            counts[i] = len(rows)
+            last_dates[i] = dates[rows[-1]]
+            codes[i] = row_codes[rows[0]]  # first row of the window, as recent_df.iloc[0]
+        return cls(keys, window, counts, codes, last_dates, source.version)
+
+    # Lookups
+    def get(self, county, state):
+        """
+        (features dict, county_row) for a county, or None if unknown or with
+        fewer than MIN_ROWS rows
+        """
+        i = self.index.get((county, state))
+        if i is None or self.counts[i] < MIN_ROWS:
+            return None
+        return self.row(i)
+
+    def row(self, i):
+        features = dict(zip(FEATURE_NAMES, self.features[i].tolist()))
+        state_code, county_code = self.codes[i].tolist()
+        return features, {"State Code": state_code, "County Code": county_code}
+
+    def ready_rows(self):
+        """Indices of counties with enough history to forecast"""
+        return np.flatnonzero(self.counts >= MIN_ROWS)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "counties": len(self.keys),
+            "ready_counties": int(np.count_nonzero(self.counts >= MIN_ROWS)),
+            "latest_date": str(self.last_dates.max()) if len(self.keys) else None,
+        }
+
+    # Updates
+    def copy(self):
+        """An independent store of the same version, to update and swap in"""
+        store = FeatureStore(self.keys, self.window.copy(), self.counts.copy(), self.codes.copy(),
+                             self.last_dates.copy(), self.version)
+        store.directory = self.directory
+        return store
+
+    def append_day(self, date, values, codes=None):
+        """
+        Add one day of AQI for some counties; O(1) per county
+
+        Args:
+            date: The new day
+            values: {(county, state): aqi}; counties not yet known are added
+            codes: {(county, state): (state_code, county_code)} for the counties
+                not yet known, from their first row (default 1, 1)
+        """
+        day = np.datetime64(date, "D")
+        codes = codes or {}
+        for key, aqi in values.items():
+            i = self.index.get(key)
+            if i is None:
+                i = self._add_county(key, codes.get(key, (1, 1)))
+            row = self.window[i]
+            row[:-1] = row[1:]
+            row[-1] = aqi
+            self.counts[i] = min(self.counts[i] + 1, WINDOW)
+            self.last_dates[i] = day
+            self.features[i] = compute_features(row, self.counts[i:i + 1])[0]
+
+    def _add_county(self, key, codes):
+        # Arrays first: a key in the index always has its rows
+        i = len(self.keys)
+        self.window = np.vstack([self.window, np.full((1, WINDOW), np.nan)])
+        self.counts = np.append(self.counts, 0)
+        self.codes = np.vstack([self.codes, np.asarray(codes, dtype=np.float64)[None, :]])
+        self.last_dates = np.append(self.last_dates, np.datetime64("NaT", "D"))
+        self.features = np.vstack([self.features, np.full((1, len(FEATURE_NAMES)), np.nan)])
+        self.keys.append(key)
+        self.index[key] = i
+        return i
+
+    # Persistence
+    def save(self, directory):
+        """Write `<version>.npz` atomically and drop files of older versions"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.version}.npz")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                counties=np.array([k[0] for k in self.keys], dtype=object),
+                states=np.array([k[1] for k in self.keys], dtype=object),
+                window=self.window, counts=self.counts, codes=self.codes, last_dates=self.last_dates,
+            )
+        os.replace(tmp, path)
+        for old in glob.glob(os.path.join(directory, "*.npz")):
+            if old != path:
+                os.remove(old)
+        return path
+
+    @classmethod
+    def load(cls, directory, version):
+        """The saved store for a data version, or None"""
+        path = os.path.join(directory, f"{version}.npz")
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=True) as data:
+            keys = list(zip(data["counties"].tolist(), data["states"].tolist()))
+            return cls(keys, data["window"], data["counts"], data["codes"], data["last_dates"], version)
+
+    @classmethod
+    def load_or_build(cls, source, directory):
+        """
+        Returns:
+            (FeatureStore, True if loaded from disk)
+        """
+        store = cls.load(directory, source.version)
+        loaded = store is not None and len(store.keys) == len(source._county_rows)
+        if not loaded:
+            store = cls.from_source(source)
+            store.save(directory)
+        store.directory = directory
+        return store, loaded
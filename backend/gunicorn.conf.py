@@ -0,0 +1,28 @@
+# backend/gunicorn.conf.py
+"""
+Gunicorn settings for serving CLAP in production
+Worker/thread counts come from Config (WEB_WORKERS, WEB_THREADS env vars).
+"""
+import os
+
+# One LightGBM/OpenMP thread per worker: single-row predictions gain nothing
+# from more threads, and N workers x all cores oversubscribes the CPU.
+# Must be set before lightgbm is imported by the preloaded app.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("FLASK_ENV", "production")
+
+from config import Config
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = "gthread"
+timeout = Config.WEB_TIMEOUT
+keepalive = 5
+
+# Load data and models once in the master, then fork (copy-on-write sharing)
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
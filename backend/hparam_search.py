@@ -0,0 +1,205 @@
+"""
+Parallel hyperparameter search for the LightGBM AQI models
+Configurations are evaluated fold by fold over time-series CV splits in
+worker processes. After each fold the weaker half of the surviving trials is
+pruned (successive halving), so most compute goes to promising configs.
+Every trial records fit time and inference latency next to its CV score, so
+models can be chosen on both accuracy and serving cost.
+"""
+import csv
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from lightgbm import LGBMRegressor
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import TimeSeriesSplit
+
+logger = logging.getLogger(__name__)
+
+# Sampling space for LGBMRegressor keyword arguments.
+# Lists are sampled uniformly, (low, high, 'log'|'linear') tuples continuously.
+SEARCH_SPACE = {
+    'n_estimators': [100, 200, 400],
+    'learning_rate': (0.02, 0.2, 'log'),
+    'max_depth': [3, 4, 6, 8, -1],
+    'num_leaves': [7, 15, 31, 63],
+    'subsample': (0.6, 1.0, 'linear'),
+    'colsample_bytree': (0.6, 1.0, 'linear'),
+    'reg_alpha': (1e-3, 1.0, 'log'),
+    'reg_lambda': (1e-3, 1.0, 'log'),
+    'min_child_samples': [10, 20, 50, 100],
+}
+
+LATENCY_REPEATS = 50
+
+# Shared per-worker state, set once by _init_worker
+_X = None
+_y = None
+_folds = None
+
+
+def sample_configs(n_trials, base_params, space=SEARCH_SPACE, seed=42):
+    """
+    Sample trial configurations
+
+    The first trial is always base_params unchanged, so the current
+    hand-picked settings appear on the leaderboard as a reference.
+    """
+    rng = np.random.default_rng(seed)
+    configs = [dict(base_params)]
+    for _ in range(n_trials - 1):
+        params = dict(base_params)
+        for name, choice in space.items():
+            if isinstance(choice, list):
+                params[name] = choice[rng.integers(len(choice))]
+            else:
+                low, high, scale = choice
+                if scale == 'log':
+                    params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+                else:
+                    params[name] = float(rng.uniform(low, high))
+        # Bagging only takes effect with a non-zero frequency
+        if params.get('subsample', 1.0) < 1.0:
+            params.setdefault('subsample_freq', 1)
+        configs.append(params)
+    return configs
+
+
+def _init_worker(X, y, folds):
+    global _X, _y, _folds
+    _X, _y, _folds = X, y, folds
+
+
+def _evaluate_fold(trial_id, params, fold):
+    """Fit one trial on one CV fold and measure score, fit time and latency"""
+    train_idx, val_idx = _folds[fold]
+    X_val = _X[val_idx]
+
+    start = time.perf_counter()
+    model = LGBMRegressor(**params)
+    model.fit(_X[train_idx], _y[train_idx])
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(X_val)
+    batch_s = time.perf_counter() - start
+
+    # Serving predicts one row at a time, so single-row latency is what matters there
+    row = X_val[:1]
+    timings = []
+    for _ in range(LATENCY_REPEATS):
+        t0 = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - t0)
+
+    return {
+        'trial': trial_id,
+        'fold': fold,
+        'rmse': float(np.sqrt(mean_squared_error(_y[val_idx], y_pred))),
+        'r2': float(r2_score(_y[val_idx], y_pred)),
+        'fit_s': fit_s,
+        'predict_row_ms': float(np.median(timings) * 1000),
+        'predict_batch_us_per_row': batch_s / len(val_idx) * 1e6,
+    }
+
+
+def run_search(X, y, base_params, n_trials=24, n_splits=5, workers=None,
+               reduction_factor=2, min_survivors=3, seed=42):
+    """
+    Successive-halving search over time-series CV folds
+
+    Args:
+        X: Scaled training features (time ordered)
+        y: Training targets
+        base_params: LGBMRegressor kwargs every trial starts from
+        n_trials: Number of sampled configurations
+        n_splits: TimeSeriesSplit folds (each fold is one pruning rung)
+        workers: Worker processes (default: CPU count)
+        reduction_factor: Keep 1/reduction_factor of trials after each fold
+        min_survivors: Never prune below this many trials
+        seed: Sampling seed
+
+    Returns:
+        List of trial records, best first
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    folds = list(TimeSeriesSplit(n_splits=n_splits).split(X))
+    workers = workers or os.cpu_count() or 1
+
+    # Split CPU threads between workers to avoid oversubscription
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    configs = sample_configs(n_trials, {**base_params, 'n_jobs': threads, 'verbose': -1}, seed=seed)
+    trials = {
+        i: {'trial': i, 'params': params, 'status': 'running', 'folds': []}
+        for i, params in enumerate(configs)
+    }
+
+    survivors = list(trials)
+    logger.info(f"Search: {n_trials} trials, {n_splits} folds, {workers} workers")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y, folds)) as pool:
+        for fold in range(n_splits):
+            futures = [pool.submit(_evaluate_fold, i, trials[i]['params'], fold) for i in survivors]
+            for future in futures:
+                result = future.result()
+                trials[result['trial']]['folds'].append(result)
+
+            # Rank by mean RMSE over the folds seen so far and prune the tail
+            survivors.sort(key=lambda i: np.mean([f['rmse'] for f in trials[i]['folds']]))
+            if fold < n_splits - 1:
+                keep = max(min_survivors, math.ceil(len(survivors) / reduction_factor))
+                for i in survivors[keep:]:
+                    trials[i]['status'] = f'pruned@fold{fold}'
+                survivors = survivors[:keep]
+            best = trials[survivors[0]]
+            logger.info(f"Fold {fold}: {len(survivors)} trials remain, best trial {best['trial']} "
+                        f"RMSE {np.mean([f['rmse'] for f in best['folds']]):.3f}")
+
+    for i in survivors:
+        trials[i]['status'] = 'complete'
+    return _leaderboard(trials.values())
+
+
+def _leaderboard(trials):
+    rows = []
+    for trial in trials:
+        folds = trial['folds']
+        rows.append({
+            'trial': trial['trial'],
+            'status': trial['status'],
+            'folds_evaluated': len(folds),
+            'cv_rmse': float(np.mean([f['rmse'] for f in folds])),
+            'cv_r2': float(np.mean([f['r2'] for f in folds])),
+            'fit_s': float(np.mean([f['fit_s'] for f in folds])),
+            'predict_row_ms': float(np.median([f['predict_row_ms'] for f in folds])),
+            'predict_batch_us_per_row': float(np.mean([f['predict_batch_us_per_row'] for f in folds])),
+            'params': {k: v for k, v in trial['params'].items() if k not in ('n_jobs', 'verbose')},
+        })
+    # Completed trials first, then by how far they got, then by score
+    rows.sort(key=lambda r: (r['status'] != 'complete', -r['folds_evaluated'], r['cv_rmse']))
+    for rank, row in enumerate(rows, start=1):
+        row['rank'] = rank
+    return rows
+
+
+def save_leaderboard(rows, path):
+    """Write the leaderboard as CSV (params JSON-encoded) plus a JSON copy"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fields = ['rank', 'trial', 'status', 'folds_evaluated', 'cv_rmse', 'cv_r2',
+              'fit_s', 'predict_row_ms', 'predict_batch_us_per_row', 'params']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, 'params': json.dumps(row['params'], sort_keys=True, default=float)})
+
+    json_path = os.path.splitext(path)[0] + '.json'
+    with open(json_path, 'w') as f:
+        json.dump(rows, f, indent=2, default=float)
+    logger.info(f"Leaderboard saved to {path} and {json_path}")
+    return path
@@ -0,0 +1,98 @@
+"""
+HTTP conditional caching for read-only endpoints
+Responses carry an ETag derived from the data-source and model versions (plus
+request arguments) and `Cache-Control: no-cache`, so browsers revalidate on
+every load and get a bodiless 304 while nothing has changed. The validators
+are computed from versions alone, so a 304 never touches pandas or the model.
+"""
+import hashlib
+
+from flask import current_app, request
+
+from response_cache import ResponseCache
+from compression import ETAG_SUFFIXES
+
+# Serialized bodies of per-version endpoints (counties, categories, metrics)
+BODY_CACHE_ENTRIES = 256
+
+
+def make_etag(*parts):
+    """Strong ETag value from version strings and arguments"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    The ETag to answer a 304 with if the request's validators match, else None
+
+    If-None-Match takes precedence. Compressed variants carry an encoding
+    suffix (see compression.py); the variant the client holds is returned,
+    so the 304 repeats the validator it stored.
+    """
+    if request.if_none_match:
+        for suffix in ETAG_SUFFIXES:
+            if request.if_none_match.contains(etag + suffix):
+                return etag + suffix
+        return None
+    if last_modified is not None and request.if_modified_since is not None:
+        if last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None):
+            return etag
+    return None
+
+
+def _with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def not_modified_response(etag, last_modified=None):
+    return _with_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def conditional(response, etag, last_modified=None):
+    """Attach validators to a freshly built response"""
+    return _with_validators(response, etag, last_modified)
+
+
+def versioned_json(etag, build_body, last_modified=None):
+    """
+    304, or the JSON body for this version, serialized at most once
+
+    Args:
+        etag: Validator covering everything the body depends on
+        build_body: Callable returning the serialized body bytes (only called on a miss)
+        last_modified: Optional datetime of the underlying data
+    """
+    matched = is_not_modified(etag, last_modified)
+    if matched:
+        return not_modified_response(matched, last_modified)
+
+    bodies = current_app.extensions.setdefault("http_bodies", ResponseCache(BODY_CACHE_ENTRIES))
+    body = bodies.get(etag)
+    if body is None:
+        body = build_body()
+        bodies.put(etag, body)
+    response = current_app.response_class(body, mimetype="application/json")
+    return _with_validators(response, etag, last_modified)
+
+
+def warm_versioned_bodies(app, requests):
+    """
+    Serialize per-version bodies ahead of the first request
+
+    Run during warm-up, so under gunicorn preload the bytes are built once
+    in the master and shared with every worker.
+
+    Args:
+        app: Flask app with blueprints registered
+        requests: (endpoint, query_string) pairs to render
+    """
+    for endpoint, query in requests:
+        try:
+            with app.test_request_context(query_string=query):
+                app.view_functions[endpoint]()
+        except Exception:
+            app.extensions["logger"].exception(f"Failed to warm {endpoint}", extra={"operation": "startup"})
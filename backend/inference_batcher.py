@@ -0,0 +1,137 @@
+"""
+Cross-request micro-batching for model inference
+Concurrent forecast requests each need single-row predictions. The batcher
+queues those rows, lets a dispatcher thread gather them for up to a few
+milliseconds (or until the batch is full) and runs one predict call for the
+whole batch, then hands each caller its own result.
+
+The dispatcher only waits while other requests are mid-forecast and could
+still contribute a row, so a lone request at low load is dispatched at once.
+"""
+import bisect
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import numpy as np
+
+from process_worker import ProcessWorker
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class InferenceBatcher:
+    """Coalesce predict calls from concurrent requests into batched predicts"""
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0, stats_window=1000):
+        """
+        Args:
+            predict_fn: Callable mapping a 2-D feature array to a 1-D prediction array
+            max_batch_size: Most rows per predict call
+            max_wait_ms: Longest a queued row waits for others to join its batch
+            stats_window: Recent batches kept for wait-time percentiles
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._dispatcher = ProcessWorker(self._run, "inference-batcher")
+
+        self._batches = 0
+        self._rows = 0
+        self._size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._recent_waits = deque(maxlen=stats_window)
+
+    # Caller side
+    @contextmanager
+    def session(self):
+        """Mark a request as mid-forecast so the dispatcher waits for its next row"""
+        with self._lock:
+            self._active += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def submit(self, X):
+        """Queue rows for prediction; returns a Future resolving to their predictions"""
+        future = Future()
+        self._dispatcher.queue().put((np.asarray(X, dtype=np.float64), future, time.perf_counter()))
+        return future
+
+    def predict(self, X):
+        """Blocking convenience wrapper around submit()"""
+        return self.submit(X).result()
+
+    # Dispatcher side (one thread per pre-forked process, see process_worker.py)
+    def _run(self, pending):
+        while True:
+            batch = [pending.get()]
+            rows = len(batch[0][0])
+            deadline = batch[0][2] + self.max_wait
+            while rows < self.max_batch_size:
+                # Nobody else is mid-forecast: no more rows can arrive, dispatch now
+                if self._active <= len(batch):
+                    try:
+                        item = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                else:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = pending.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                batch.append(item)
+                rows += len(item[0])
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        started = time.perf_counter()
+        try:
+            X = batch[0][0] if len(batch) == 1 else np.vstack([item[0] for item in batch])
+            predictions = np.asarray(self.predict_fn(X))
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for X_rows, future, _ in batch:
+            future.set_result(predictions[offset:offset + len(X_rows)])
+            offset += len(X_rows)
+
+        with self._lock:
+            self._batches += 1
+            self._rows += offset
+            self._size_counts[bisect.bisect_left(BATCH_SIZE_BUCKETS, len(batch))] += 1
+            self._recent_waits.extend(started - item[2] for item in batch)
+
+    def stats(self):
+        """Batch size and queue wait metrics"""
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            histogram = {
+                f"le_{bound}": count for bound, count in zip(BATCH_SIZE_BUCKETS, self._size_counts)
+            }
+            histogram["gt_%d" % BATCH_SIZE_BUCKETS[-1]] = self._size_counts[-1]
+            return {
+                "batches": self._batches,
+                "rows": self._rows,
+                "mean_batch_size": self._rows / self._batches if self._batches else 0.0,
+                "batch_size_histogram": histogram,
+                "wait_ms_p50": waits[len(waits) // 2] * 1000 if waits else 0.0,
+                "wait_ms_p99": waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000 if waits else 0.0,
+                "active_sessions": self._active,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
@@ -0,0 +1,145 @@
+"""
+Binary map-layer payload for all-county forecasts
+A compact, typed-array friendly encoding of one forecast per county, so a
+national choropleth can be drawn from ~10 KB instead of megabytes of JSON.
+
+Layout (little-endian, arrays start 4-byte aligned so they can be viewed as
+typed arrays without copying):
+
+    offset        size   type      field
+    0             4      char[4]   magic "AQML"
+    4             2      uint16    layout version (1)
+    6             2      uint16    flags; bit 0 = probabilities present
+    8             4      uint32    N, number of counties
+    12            4      int32     forecast date, days since 1970-01-01 (UTC)
+    16            1      uint8     K, number of categories (6)
+    17            3      -         reserved (zero)
+    20            4N     uint32    county FIPS code (state * 1000 + county)
+    20+4N         2N     int16     predicted AQI, rounded
+    20+6N         N      uint8     category index (0 = Good ... 5 = Hazardous, 255 = unknown)
+    20+7N         pad    -         zero padding to a multiple of 4
+    P             N*K    uint8     category probabilities, row-major per county,
+                                   scaled to 0-255 (only if flag bit 0 is set)
+
+Category order follows Config.AQI_CATEGORIES.
+
+Layers are precomputed: MapLayerStore keeps the latest layer of each model,
+with and without probabilities (both packed from one forecast). Requests only
+read it; a new layer is built off the request path when the data or model
+version or the day changes.
+"""
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b"AQML"
+LAYOUT_VERSION = 1
+FLAG_PROBABILITIES = 0x1
+UNKNOWN_CATEGORY = 255
+HEADER = struct.Struct("<4sHHIiB3x")  # 20 bytes
+
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def _align4(n):
+    return (n + 3) & ~3
+
+
+def pack_layer(fips, aqi, category, forecast_date, probabilities=None):
+    """
+    Encode per-county forecasts
+
+    Args:
+        fips: County FIPS codes (N)
+        aqi: Predicted AQI values (N, float)
+        category: Category indices, -1 for unknown (N)
+        forecast_date: date/datetime of the forecast
+        probabilities: Optional (N, K) probabilities in [0, 1]
+
+    Returns:
+        bytes
+    """
+    n = len(fips)
+    k = probabilities.shape[1] if probabilities is not None else 6
+    days = int((np.datetime64(forecast_date, "D") - EPOCH).astype(np.int64))
+    flags = FLAG_PROBABILITIES if probabilities is not None else 0
+
+    parts = [
+        HEADER.pack(MAGIC, LAYOUT_VERSION, flags, n, days, k),
+        np.asarray(fips, dtype="<u4").tobytes(),
+        np.clip(np.rint(aqi), -32768, 32767).astype("<i2").tobytes(),
+        np.where(np.asarray(category) < 0, UNKNOWN_CATEGORY, category).astype(np.uint8).tobytes(),
+    ]
+    size = HEADER.size + 7 * n
+    parts.append(b"\0" * (_align4(size) - size))
+    if probabilities is not None:
+        parts.append(np.rint(np.clip(probabilities, 0, 1) * 255).astype(np.uint8).tobytes())
+    return b"".join(parts)
+
+
+def unpack_layer(payload):
+    """Decode a payload into a dict of numpy arrays (zero-copy views)"""
+    magic, version, flags, n, days, k = HEADER.unpack_from(payload, 0)
+    if magic != MAGIC or version != LAYOUT_VERSION:
+        raise ValueError(f"Not a version {LAYOUT_VERSION} map layer")
+    offset = HEADER.size
+    layer = {
+        "forecast_date": EPOCH + np.timedelta64(days, "D"),
+        "fips": np.frombuffer(payload, dtype="<u4", count=n, offset=offset),
+        "aqi": np.frombuffer(payload, dtype="<i2", count=n, offset=offset + 4 * n),
+        "category": np.frombuffer(payload, dtype=np.uint8, count=n, offset=offset + 6 * n),
+        "probabilities": None,
+    }
+    if flags & FLAG_PROBABILITIES:
+        start = _align4(offset + 7 * n)
+        layer["probabilities"] = np.frombuffer(payload, dtype=np.uint8, count=n * k, offset=start).reshape(n, k)
+    return layer
+
+
+class MapLayerStore:
+    """Latest packed layers per model; requests read them, builders replace them"""
+
+    def __init__(self):
+        self._layers = {}  # model_type -> (key, {with_probabilities: bytes})
+        self._building = set()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.failures = 0
+        self.stale = 0  # requests answered with an outdated layer
+
+    def get(self, model_type):
+        """(key, {False: bytes, True: bytes}) of the latest layer, or None"""
+        with self._lock:
+            return self._layers.get(model_type)
+
+    def put(self, model_type, key, variants):
+        with self._lock:
+            self._layers[model_type] = (key, variants)
+            self.builds += 1
+
+    def count_stale(self):
+        with self._lock:
+            self.stale += 1
+
+    def clear(self):
+        with self._lock:
+            self._layers.clear()
+
+    def claim_build(self, model_type):
+        """True if the caller should build model_type's layer (no build is running)"""
+        with self._lock:
+            if model_type in self._building:
+                return False
+            self._building.add(model_type)
+            return True
+
+    def release_build(self, model_type, failed=False):
+        with self._lock:
+            self._building.discard(model_type)
+            self.failures += bool(failed)
+
+    def stats(self):
+        with self._lock:
+            return {"layers": len(self._layers), "building": len(self._building),
+                    "builds": self.builds, "failures": self.failures, "stale": self.stale}
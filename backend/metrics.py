@@ -0,0 +1,355 @@
+"""
+Request and stage latency metrics
+- Every API request is timed end to end. Code on the request path marks its
+  stages with `span("features")` etc. Span timings follow the request onto
+  stage-pool threads through a ContextVar, because StagePool runs work in a
+  copy of the caller's context.
+- Durations go into fixed-bucket histograms per endpoint and per
+  (endpoint, stage). They are exposed in Prometheus text format at
+  /api/metrics, and per request in a `Server-Timing` header.
+- Streamed responses (SSE forecasts, exports) are observed when they close,
+  so the spans of their bodies count; they get no Server-Timing header.
+- slo_report() checks reliability (answered requests without a 5xx),
+  availability (requests not turned away with a 503) and latency percentiles
+  against the performance thresholds in Config.
+
+Metrics are per process. Under gunicorn each worker keeps its own registry.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from structured_logging import log_pipeline_stats
+
+# Upper bounds in seconds, Prometheus style (cumulative, plus +Inf). Stages
+# are often well under a millisecond, hence the fine low end.
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Endpoints whose latency makes up a dashboard render
+DASHBOARD_ENDPOINTS = ("refresh.refresh_data", "predict.predict_aqi", "historical.get_historical_aqi",
+                       "counties.get_counties")
+
+_current = ContextVar("clap_request_timings", default=None)
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q):
+        """Estimate, interpolating linearly within the bucket (as histogram_quantile does)"""
+        counts, _, total = self.snapshot()
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    # Beyond the last bound there is nothing to interpolate to
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class RequestTimings:
+    """Stage durations collected while one request is handled"""
+    __slots__ = ("start", "spans")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # list.append is atomic, so stages running on pool threads can add concurrently
+        self.spans = []
+
+    def totals(self):
+        totals = {}
+        for stage, seconds in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+
+@contextmanager
+def span(stage):
+    """Time a stage of the current request; a no-op outside a request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.spans.append((stage, time.perf_counter() - t0))
+
+
+def record_span(stage, seconds):
+    """Add an externally measured duration (e.g. pool queue wait) to the current request"""
+    timings = _current.get()
+    if timings is not None:
+        timings.spans.append((stage, seconds))
+
+
+def timed(stage, fn):
+    """fn wrapped in span(stage), for stages handed to a pool"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(stage):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class MetricsRegistry:
+    """Per-process request, stage and startup metrics"""
+
+    def __init__(self):
+        self.requests = {}  # endpoint -> Histogram
+        self.stages = {}  # (endpoint, stage) -> Histogram
+        self.statuses = {}  # (endpoint, status code) -> count
+        self.gauges = {}  # name -> value, e.g. startup ingestion time
+        self._lock = threading.Lock()
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(key, Histogram())
+        return histogram
+
+    def observe_request(self, endpoint, status, seconds, stages):
+        self._histogram(self.requests, endpoint).observe(seconds)
+        for stage, stage_seconds in stages.items():
+            self._histogram(self.stages, (endpoint, stage)).observe(stage_seconds)
+        with self._lock:
+            key = (endpoint, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def _status_counts(self):
+        """(total, unavailable 503s, other 5xx) over all endpoints"""
+        with self._lock:
+            items = list(self.statuses.items())
+        total = unavailable = failed = 0
+        for (_, status), count in items:
+            total += count
+            if status == 503:
+                unavailable += count
+            elif status >= 500:
+                failed += count
+        return total, unavailable, failed
+
+    def success_ratio(self):
+        """Share of answered (non-503) requests without a 5xx response; None before any"""
+        total, unavailable, failed = self._status_counts()
+        answered = total - unavailable
+        return (answered - failed) / answered if answered else None
+
+    def availability_ratio(self):
+        """
+        Share of requests that were not turned away with a 503; None before any
+
+        503s are load shedding (admission, saturated pools), /api/health while
+        warming up and routes whose model is not loaded.
+        """
+        total, unavailable, _ = self._status_counts()
+        return (total - unavailable) / total if total else None
+
+    def slo_report(self, config):
+        """
+        Compare measured values with the Config performance thresholds
+
+        Returns:
+            dict of check name -> {"target", "value", "ok"}; ok is None without data
+        """
+        def check(target, value, ok):
+            return {"target": target, "value": value, "ok": None if value is None else ok}
+
+        reliability = self.success_ratio()
+        availability = self.availability_ratio()
+        checks = {
+            "reliability": check(config.RELIABILITY_THRESHOLD, reliability,
+                                 reliability is not None and reliability >= config.RELIABILITY_THRESHOLD),
+            "availability": check(config.AVAILABILITY_TARGET, availability,
+                                  availability is not None and availability >= config.AVAILABILITY_TARGET),
+        }
+        ingestion = self.gauges.get("ingestion_seconds")
+        checks["ingestion_time"] = check(config.MAX_INGESTION_TIME, ingestion,
+                                         ingestion is not None and ingestion <= config.MAX_INGESTION_TIME)
+        for endpoint in DASHBOARD_ENDPOINTS:
+            histogram = self.requests.get(endpoint)
+            p99 = histogram.quantile(0.99) if histogram else None
+            checks[f"dashboard_p99:{endpoint}"] = check(
+                config.MAX_DASHBOARD_RENDER_TIME, p99, p99 is not None and p99 <= config.MAX_DASHBOARD_RENDER_TIME
+            )
+        return checks
+
+    def latency_summary(self):
+        """p50/p95/p99 in milliseconds per endpoint and per stage"""
+        def summary(histogram):
+            return {
+                "count": histogram.count,
+                **{f"p{int(q * 100)}_ms": round(histogram.quantile(q) * 1000, 3) if histogram.count else None
+                   for q in (0.5, 0.95, 0.99)},
+            }
+        return {
+            "requests": {endpoint: summary(h) for endpoint, h in sorted(self.requests.items())},
+            "stages": {f"{endpoint}:{stage}": summary(h) for (endpoint, stage), h in sorted(self.stages.items())},
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _render_histogram(lines, name, histogram, **labels):
+    counts, total_sum, total_count = histogram.snapshot()
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {total_count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {total_sum:.6f}")
+    lines.append(f"{name}_count{_labels(**labels)} {total_count}")
+
+
+def _render_stats(lines, name, label, components):
+    """Numeric fields of component stats() dicts as gauges; nested dicts become a 'key' label"""
+    for component, stats in components.items():
+        for field, value in stats.items():
+            metric = f"clap_{name}_{field}"
+            if isinstance(value, dict):
+                for key, nested in value.items():
+                    if isinstance(nested, (int, float)):
+                        lines.append(f"{metric}{_labels(**{label: component}, key=key)} {float(nested):g}")
+            elif isinstance(value, (int, float)):
+                lines.append(f"{metric}{_labels(**{label: component})} {float(value):g}")
+
+
+def render_prometheus(app, config):
+    """All metrics of this process in the Prometheus text exposition format"""
+    registry = app.extensions["metrics"]
+    lines = ["# TYPE clap_request_duration_seconds histogram"]
+    for endpoint, histogram in sorted(registry.requests.items()):
+        _render_histogram(lines, "clap_request_duration_seconds", histogram, endpoint=endpoint)
+    lines.append("# TYPE clap_stage_duration_seconds histogram")
+    for (endpoint, stage), histogram in sorted(registry.stages.items()):
+        _render_histogram(lines, "clap_stage_duration_seconds", histogram, endpoint=endpoint, stage=stage)
+    lines.append("# TYPE clap_requests_total counter")
+    for (endpoint, status), count in sorted(registry.statuses.items()):
+        lines.append(f"clap_requests_total{_labels(endpoint=endpoint, status=status)} {count}")
+    for name, value in sorted(registry.gauges.items()):
+        lines.append(f"# TYPE clap_{name} gauge")
+        lines.append(f"clap_{name} {value:g}")
+
+    _render_stats(lines, "batcher", "model", {name: b.stats() for name, b in app.extensions.get("batchers", {}).items()})
+    _render_stats(lines, "pool", "pool", {name: p.stats() for name, p in app.extensions.get("stage_pools", {}).items()})
+    _render_stats(lines, "admission", "endpoint",
+                  {name: c.stats() for name, c in app.extensions.get("admission", {}).items()})
+    _render_stats(lines, "cache", "cache", {
+        name: app.extensions[name].stats()
+        for name in ("refresh_cache", "http_bodies", "compressed_bodies", "map_layers")
+        if name in app.extensions
+    })
+
+    if "shadow" in app.extensions:
+        _render_stats(lines, "shadow", "evaluator", {"shadow": app.extensions["shadow"].stats()})
+
+    logging_stats = log_pipeline_stats()
+    if logging_stats is not None:
+        _render_stats(lines, "logging", "logger", {"CLAP": logging_stats})
+
+    lines.append("# TYPE clap_slo_ok gauge")
+    for check, result in registry.slo_report(config).items():
+        if result["ok"] is not None:
+            lines.append(f"clap_slo_ok{_labels(slo=check)} {int(result['ok'])}")
+    return "\n".join(lines) + "\n"
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify() with its serialization recorded as the "serialize" stage"""
+
+    def response(self, *args, **kwargs):
+        with span("serialize"):
+            return super().response(*args, **kwargs)
+
+
+def register_metrics(app, server_timing=True):
+    """
+    Time API requests and attach Server-Timing
+
+    Register before other after_request hooks (e.g. compression) so the
+    total includes them; Flask runs after_request hooks in reverse order.
+
+    Returns:
+        The app's MetricsRegistry
+    """
+    registry = MetricsRegistry()
+    app.extensions["metrics"] = registry
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timing():
+        # Always reset: server threads are reused across requests
+        _current.set(RequestTimings() if request.path.startswith("/api/") else None)
+
+    @app.after_request
+    def record_timing(response):
+        timings = _current.get()
+        if timings is None:
+            return response
+        endpoint = request.endpoint or "unmatched"
+        if response.is_streamed:
+            # The body (SSE days, export chunks) runs after this hook, on this
+            # thread, and records its spans into the same timings; observe them
+            # once the response is closed. Headers are already out by then.
+            def record_streamed():
+                _current.set(None)
+                registry.observe_request(endpoint, response.status_code,
+                                         time.perf_counter() - timings.start, timings.totals())
+            response.call_on_close(record_streamed)
+            return response
+        _current.set(None)
+        elapsed = time.perf_counter() - timings.start
+        stages = timings.totals()
+        registry.observe_request(endpoint, response.status_code, elapsed, stages)
+        if server_timing:
+            entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in stages.items()]
+            entries.append(f"total;dur={elapsed * 1000:.2f}")
+            response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    return registry
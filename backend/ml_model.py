@@ -4,11 +4,9 @@ Implements LightGBM for AQI prediction (Stages 7, 8, 9)
 """
 import pandas as pd
 import numpy as np
-import lightgbm as lgb
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import pickle
 import os
+import glob
 import logging
 from datetime import datetime
 import json
@@ -23,6 +21,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# EPA AQI categories: (name, min, max)
+AQI_CATEGORY_BOUNDS = [
+    ('Good', 0, 50),
+    ('Moderate', 51, 100),
+    ('Unhealthy for Sensitive Groups', 101, 150),
+    ('Unhealthy', 151, 200),
+    ('Very Unhealthy', 201, 300),
+    ('Hazardous', 301, 500)
+]
+
 
 class AQIPredictor:
     """LightGBM-based AQI prediction model"""
@@ -33,6 +41,8 @@ class AQIPredictor:
         self.feature_names = None
         self.model_version = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.metrics = {}
+        # One-step errors (actual - predicted) resampled by Monte Carlo forecasts
+        self.residuals = None
         
         # LightGBM hyperparameters
         self.params = {
@@ -70,7 +80,8 @@ class AQIPredictor:
             logger.error(f"Failed to log operation: {str(e)}")
     
     # Stage 7: Train
-    def train(self, X_train, y_train, X_val=None, y_val=None, num_rounds=1000):
+    def train(self, X_train, y_train, X_val=None, y_val=None, num_rounds=1000,
+              feature_cache=None, cache_key=None):
         """
         Stage 7: Train LightGBM model
         
@@ -80,11 +91,16 @@ class AQIPredictor:
             X_val: Validation features (optional)
             y_val: Validation targets (optional)
             num_rounds: Number of boosting rounds
+            feature_cache: FeatureCache for Dataset binaries (optional)
+            cache_key: Input hash the Dataset binaries are stored under (optional)
             
         Returns:
             Trained model
         """
         import time
+        # lightgbm (and with it scikit-learn and scipy) is only needed to train;
+        # loading a pickled model imports it on demand
+        import lightgbm as lgb
         start_time = time.time()
         
         try:
@@ -98,8 +114,13 @@ class AQIPredictor:
             if isinstance(y_train, pd.Series):
                 y_train = y_train.values
             
-            # Create LightGBM datasets
-            train_data = lgb.Dataset(X_train, label=y_train)
+            # Create LightGBM datasets (reusing cached binaries when available)
+            use_cache = feature_cache is not None and cache_key is not None
+            train_data = feature_cache.load_dataset(cache_key, 'train', self.params) if use_cache else None
+            if train_data is None:
+                train_data = lgb.Dataset(X_train, label=y_train, params=self.params)
+                if use_cache:
+                    feature_cache.save_dataset(cache_key, 'train', train_data, self.params)
             
             valid_sets = [train_data]
             valid_names = ['train']
@@ -110,7 +131,12 @@ class AQIPredictor:
                 if isinstance(y_val, pd.Series):
                     y_val = y_val.values
                 
-                val_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
+                val_data = (feature_cache.load_dataset(cache_key, 'valid', self.params, reference=train_data)
+                            if use_cache else None)
+                if val_data is None:
+                    val_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
+                    if use_cache:
+                        feature_cache.save_dataset(cache_key, 'valid', val_data, self.params)
                 valid_sets.append(val_data)
                 valid_names.append('valid')
             
@@ -157,6 +183,7 @@ class AQIPredictor:
             Dictionary of evaluation metrics
         """
         import time
+        from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
         start_time = time.time()
         
         try:
@@ -260,29 +287,13 @@ class AQIPredictor:
         try:
             logger.info("Stage 9: Forecasting AQI")
             
-            if self.model is None:
-                raise ValueError("Model not trained. Call train() first.")
-            
-            # Make prediction
-            if isinstance(X_forecast, pd.DataFrame):
-                X_forecast = X_forecast.values
-            
-            predicted_aqi = self.model.predict(X_forecast)
+            predicted_aqi = self.predict_values(X_forecast)
             
             # Calculate category and probabilities
-            results = []
-            for i, aqi_value in enumerate(predicted_aqi):
-                category, probabilities = self._calculate_category_probabilities(aqi_value)
-                
-                result = {
-                    'predicted_aqi': float(aqi_value),
-                    'predicted_category': category,
-                    'probabilities': probabilities,
-                    'county_name': county_name,
-                    'state_name': state_name,
-                    'forecast_date': forecast_date or datetime.utcnow()
-                }
-                results.append(result)
+            results = [
+                self.format_prediction(aqi_value, county_name, state_name, forecast_date)
+                for aqi_value in predicted_aqi
+            ]
             
             duration = time.time() - start_time
             
@@ -303,6 +314,61 @@ class AQIPredictor:
             self.log_operation('FORECAST', 'ERROR', duration, error_msg=str(e))
             raise
     
+    def predict_values(self, X_forecast):
+        """
+        Raw AQI predictions for a feature matrix
+        
+        This is the only step that touches the model, so concurrent requests
+        can batch their rows through it (see inference_batcher.py).
+        """
+        if self.model is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        if isinstance(X_forecast, pd.DataFrame):
+            X_forecast = X_forecast.values
+        
+        return self.model.predict(X_forecast)
+    
+    def format_prediction(self, aqi_value, county_name=None, state_name=None, forecast_date=None):
+        """Build the forecast record for one predicted AQI value"""
+        category, probabilities = self._calculate_category_probabilities(aqi_value)
+        return {
+            'predicted_aqi': float(aqi_value),
+            'predicted_category': category,
+            'probabilities': probabilities,
+            'county_name': county_name,
+            'state_name': state_name,
+            'forecast_date': forecast_date or datetime.utcnow()
+        }
+    
+    def category_probability_matrix(self, aqi_values):
+        """
+        Vectorized _calculate_category_probabilities for many predictions
+        
+        Args:
+            aqi_values: 1-D array of predicted AQI values
+            
+        Returns:
+            Tuple of (category index per value, -1 for 'Unknown';
+                      probabilities of shape (n, 6) in AQI_CATEGORY_BOUNDS order)
+        """
+        from scipy import stats
+        aqi_values = np.asarray(aqi_values, dtype=np.float64)
+        lows = np.array([low for _, low, _ in AQI_CATEGORY_BOUNDS], dtype=np.float64)
+        highs = np.array([high for _, _, high in AQI_CATEGORY_BOUNDS], dtype=np.float64)
+        
+        inside = (aqi_values[:, None] >= lows) & (aqi_values[:, None] <= highs)
+        category = np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+        category[aqi_values > 500] = len(AQI_CATEGORY_BOUNDS) - 1
+        
+        std_dev = 15
+        probs = (stats.norm.cdf((highs - aqi_values[:, None]) / std_dev)
+                 - stats.norm.cdf((lows - aqi_values[:, None]) / std_dev))
+        probs = np.clip(probs, 0, 1)
+        totals = probs.sum(axis=1, keepdims=True)
+        probs = np.divide(probs, totals, out=probs, where=totals > 0)
+        return category, probs
+    
     def _calculate_category_probabilities(self, aqi_value):
         """
         Calculate AQI category and probability distribution
@@ -314,14 +380,7 @@ class AQIPredictor:
             Tuple of (category, probabilities_dict)
         """
         # Define AQI categories
-        categories = [
-            ('Good', 0, 50),
-            ('Moderate', 51, 100),
-            ('Unhealthy for Sensitive Groups', 101, 150),
-            ('Unhealthy', 151, 200),
-            ('Very Unhealthy', 201, 300),
-            ('Hazardous', 301, 500)
-        ]
+        categories = AQI_CATEGORY_BOUNDS
         
         # Determine primary category
         category = 'Unknown'
@@ -397,7 +456,8 @@ class AQIPredictor:
                 'feature_names': self.feature_names,
                 'params': self.params,
                 'metrics': self.metrics,
-                'version': self.model_version
+                'version': self.model_version,
+                'residuals': self.residuals
             }
             
             with open(filepath, 'wb') as f:
@@ -423,6 +483,7 @@ class AQIPredictor:
             self.params = model_data.get('params', self.params)
             self.metrics = model_data.get('metrics', {})
             self.model_version = model_data.get('version', 'loaded')
+            self.residuals = model_data.get('residuals')
             
             logger.info(f"Model loaded from {filepath}")
             logger.info(f"Model version: {self.model_version}")
@@ -438,25 +499,52 @@ class AQIPredictor:
             return False
 
 
-def train_model_pipeline(data_path='data/', model_path='models/'):
+def train_model_pipeline(data_path='data/', model_path='models/', use_cache=True):
     """
     Complete model training pipeline
     
     Args:
         data_path: Path to data directory
         model_path: Path to save trained model
+        use_cache: Reuse cached features/Dataset binaries for identical inputs
         
     Returns:
         Trained AQIPredictor instance
     """
+    from feature_cache import FeatureCache
+    from data_pipeline import DataPipeline, FEATURE_SPEC
     
     logger.info("="*60)
     logger.info("Starting Model Training Pipeline")
     logger.info("="*60)
     
-    # Run data pipeline
-    pipeline = DataPipeline(data_path=data_path)
-    scaled_data = pipeline.run_full_pipeline()
+    # Hash the training inputs so identical runs skip straight to boosting
+    cache = FeatureCache() if use_cache else None
+    cache_key = None
+    cached = None
+    if cache is not None:
+        source_files = sorted(glob.glob(os.path.join(data_path, 'daily_aqi_by_county_*.csv')))
+        cache_key = cache.key_for(
+            source_files,
+            feature_spec=FEATURE_SPEC,
+            split_spec={'method': 'time', 'train_fraction': 0.8},
+        )
+        cached = cache.load_frame(cache_key)
+    
+    pipeline = DataPipeline(data_path=data_path, model_path=model_path)
+    # The scaler is stored in the cache entry: a hit may be for another model_path
+    scaler = cache.load_object(cache_key, 'scaler') if cached is not None else None
+    if scaler is not None:
+        columns, _ = cached
+        scaled_data = pd.DataFrame(columns)
+        pipeline.scaler = scaler
+    else:
+        # Run data pipeline (streams the raw CSVs into an on-disk training set)
+        pipeline.run_full_pipeline()
+        scaled_data = pipeline.load_training_set(scaled=True)
+        if cache is not None:
+            cache.save_frame(cache_key, {col: scaled_data[col].values for col in scaled_data.columns})
+            cache.save_object(cache_key, 'scaler', pipeline.scaler)
     
     # Prepare training data
     logger.info("\nPreparing training/test split...")
@@ -480,7 +568,7 @@ def train_model_pipeline(data_path='data/', model_path='models/'):
     
     # Train model
     predictor = AQIPredictor(model_path=model_path)
-    predictor.train(X_train, y_train, X_test, y_test)
+    predictor.train(X_train, y_train, X_test, y_test, feature_cache=cache, cache_key=cache_key)
     
     # Evaluate model
     metrics = predictor.evaluate(X_test, y_test)
@@ -0,0 +1,103 @@
+"""
+Monte Carlo forecasts: many residual-perturbed recursive paths per county
+format_prediction() spreads every day's point forecast with the same ±15 AQI
+normal error, although recursive errors compound: each day's prediction is
+an input of the next. Here the recursion itself is sampled:
+- Every path adds a one-step residual to each day's prediction and feeds the
+  perturbed value back (advance_features), so later days inherit earlier errors.
+- Residuals are drawn from the model's observed one-step backtest errors
+  (predictor.residuals, saved by train_balanced_model.py). Models without them
+  fall back to the normal ±15 error format_prediction() assumes.
+- Features are (counties x paths) rows of one matrix, and each day is one
+  scale + predict call for all of them. All paths share the first day's
+  inputs, so that day predicts one row per county.
+Per day, the paths give quantiles and category probabilities.
+"""
+import numpy as np
+
+from config import Config
+from feature_store import FEATURE_NAMES, advance_features, model_inputs
+
+FALLBACK_STD = 15  # format_prediction()'s assumed error
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+CATEGORY_NAMES = list(Config.AQI_CATEGORIES)
+# A value belongs to the first category whose upper bound it does not exceed
+_CATEGORY_HIGHS = np.array([r["range"][1] for r in Config.AQI_CATEGORIES.values()][:-1], dtype=np.float64)
+
+
+def simulate_paths(predict, scaler, model_type, features, state_codes, county_codes, dates,
+                   n_paths, residuals=None, rng=None):
+    """
+    Sample recursive forecast paths
+
+    Args:
+        predict: Model call on scaled rows (e.g. predictor.predict_values)
+        scaler: The model's feature scaler
+        model_type: "balanced" or "prototype"
+        features: FEATURE_NAMES -> (n,) base features
+        state_codes, county_codes: (n,) codes as model inputs see them
+        dates: Forecast dates, one per day
+        n_paths: Paths per county
+        residuals: One-step errors (actual - predicted) to resample; None for normal errors
+        rng: numpy Generator
+
+    Returns:
+        (n, n_paths, days) simulated AQI
+    """
+    rng = rng or np.random.default_rng()
+    n = len(state_codes)
+    out = np.empty((n, n_paths, len(dates)))
+
+    def draw():
+        if residuals is not None and len(residuals):
+            return rng.choice(residuals, size=n * n_paths)
+        return rng.normal(0, FALLBACK_STD, size=n * n_paths)
+
+    # Day 1: identical inputs on every path
+    X = model_inputs(model_type, features, state_codes, county_codes, dates[0])
+    yhat = np.repeat(np.asarray(predict(scaler.transform(X)), dtype=np.float64), n_paths)
+    features = {name: np.repeat(np.asarray(features[name], dtype=np.float64), n_paths) for name in FEATURE_NAMES}
+    state_codes, county_codes = np.repeat(state_codes, n_paths), np.repeat(county_codes, n_paths)
+
+    for day, when in enumerate(dates):
+        if day:
+            X = model_inputs(model_type, features, state_codes, county_codes, when)
+            yhat = np.asarray(predict(scaler.transform(X)), dtype=np.float64)
+        values = np.maximum(yhat + draw(), 0)  # AQI is never negative
+        out[:, :, day] = values.reshape(n, n_paths)
+        advance_features(features, values)
+    return out
+
+
+def summarize_paths(paths, quantiles=QUANTILES):
+    """
+    Per-day distribution of simulated paths
+
+    Args:
+        paths: (n, n_paths, days)
+
+    Returns:
+        (quantiles (n, days, len(quantiles)),
+         category probabilities (n, days, len(CATEGORY_NAMES)))
+    """
+    values = np.quantile(paths, quantiles, axis=1)  # (q, n, days)
+    categories = np.searchsorted(_CATEGORY_HIGHS, paths, side="left")
+    counts = np.stack([(categories == c).sum(axis=1) for c in range(len(CATEGORY_NAMES))], axis=-1)
+    return np.moveaxis(values, 0, -1), counts / paths.shape[1]
+
+
+def day_records(quantiles, probabilities, dates, n_paths):
+    """Forecast records of one county from its summarize_paths() rows"""
+    records = []
+    for day, when in enumerate(dates):
+        q = quantiles[day]
+        median = float(np.interp(0.5, QUANTILES, q))
+        records.append({
+            "predicted_aqi": median,
+            "predicted_category": CATEGORY_NAMES[int(np.searchsorted(_CATEGORY_HIGHS, median, side="left"))],
+            "probabilities": dict(zip(CATEGORY_NAMES, probabilities[day].tolist())),
+            "quantiles": {f"p{round(level * 100):02d}": float(value) for level, value in zip(QUANTILES, q)},
+            "paths": n_paths,
+            "forecast_date": when,
+        })
+    return records
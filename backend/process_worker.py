@@ -0,0 +1,48 @@
+"""
+Queue-fed background threads that survive pre-forking
+gunicorn preloads the app and then forks its workers. Threads don't survive
+fork, so a thread started in the master would be missing in every worker.
+ProcessWorker starts its thread lazily, on first use in each process, and
+hands out the queue that feeds it (see inference_batcher.py and shadow.py).
+"""
+import os
+import queue
+import threading
+
+
+class ProcessWorker:
+    """One daemon thread per process, running target(queue)"""
+
+    def __init__(self, target, name, make_queue=queue.SimpleQueue):
+        """
+        Args:
+            target: Callable run on the thread with its queue; should never return
+            name: Thread name
+            make_queue: Builds the queue of each new thread
+        """
+        self.target = target
+        self.name = name
+        self.make_queue = make_queue
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def queue(self):
+        """This process's queue, starting its thread first if needed"""
+        pid = os.getpid()
+        if self._thread is None or self._pid != pid:
+            with self._lock:
+                if self._thread is None or self._pid != pid:
+                    self._queue = self.make_queue()
+                    self._pid = pid
+                    self._thread = threading.Thread(target=self.target, args=(self._queue,),
+                                                    name=self.name, daemon=True)
+                    self._thread.start()
+        return self._queue
+
+    def qsize(self):
+        """Items waiting in this process's queue (0 before the thread starts)"""
+        if self._queue is None or self._pid != os.getpid():
+            return 0
+        return self._queue.qsize()
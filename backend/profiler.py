@@ -0,0 +1,193 @@
+"""
+On-demand sampling profiler for individual requests
+A request is profiled when it carries `X-Profile-Token: <PROFILE_ADMIN_TOKEN>`,
+or, for the endpoints in PROFILE_ENDPOINTS, at random with probability
+PROFILE_SAMPLE_RATE. While it runs, a background thread samples the stacks of
+the request thread and of any stage-pool threads working for it every
+PROFILE_INTERVAL_MS, via sys._current_frames(). Nothing is traced, so the
+profiled code runs at full speed.
+
+Each profile is written to PROFILE_DIR as a folded-stack file
+(`frame;frame;frame count`, readable by flamegraph.pl and speedscope), with a
+JSON sidecar tagging it with endpoint, county, state, model and days. The
+response carries `X-Profile-Id` with the file stem.
+
+With no token and a zero sample rate no hooks are registered at all.
+"""
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from flask import request
+
+# Profiles sampled at once; further requests run unprofiled
+MAX_CONCURRENT_PROFILES = 2
+
+_active = ContextVar("clap_request_profile", default=None)
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT_PROFILES)
+_frame_labels = {}  # code object -> "function (file:line)"
+
+
+def _frame_label(code):
+    label = _frame_labels.get(code)
+    if label is None:
+        label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        _frame_labels[code] = label
+    return label
+
+
+def _slug(value):
+    return re.sub(r"[^A-Za-z0-9]+", "-", str(value)).strip("-")[:40] or "none"
+
+
+class RequestProfile:
+    """Stack samples of the threads serving one request"""
+
+    def __init__(self, tags, interval, out_dir):
+        self.tags = tags
+        self.interval = interval
+        self.out_dir = out_dir
+        self.profile_id = "_".join([
+            datetime.utcnow().strftime("%Y%m%dT%H%M%S"),
+            *(_slug(tags.get(key)) for key in ("endpoint", "county", "state", "model", "days")),
+            f"{random.getrandbits(24):06x}",
+        ])
+        self.threads = {threading.get_ident(): "request"}  # thread ident -> root label
+        self.stacks = Counter()
+        self.samples = 0
+        self._started = time.perf_counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self.tags["duration_ms"] = round((time.perf_counter() - self._started) * 1000, 3)
+        self._stop.set()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                self._sample()
+            self._write()
+        finally:
+            _slots.release()
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for ident, root in list(self.threads.items()):
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(root)
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _write(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, self.profile_id)
+        with open(path + ".folded", "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(path + ".json", "w") as f:
+            json.dump({
+                **self.tags,
+                "samples": self.samples,
+                "interval_ms": self.interval * 1000,
+                "created": datetime.utcnow().isoformat(),
+            }, f, indent=2)
+
+
+@contextmanager
+def profiled_thread():
+    """Include the calling (pool) thread in the current request's profile, if any"""
+    profile = _active.get()
+    if profile is None:
+        yield
+        return
+    ident = threading.get_ident()
+    profile.threads[ident] = threading.current_thread().name
+    try:
+        yield
+    finally:
+        profile.threads.pop(ident, None)
+
+
+def _request_tags():
+    payload = request.get_json(silent=True) if request.is_json else None
+    source = payload if isinstance(payload, dict) else request.args
+    return {
+        "endpoint": request.endpoint,
+        "path": request.path,
+        "county": source.get("county"),
+        "state": source.get("state"),
+        "model": source.get("model", "balanced"),
+        "days": source.get("days"),
+    }
+
+
+def register_profiling(app, config):
+    """
+    Profile requests selected by admin token or sample rate
+
+    Returns:
+        True if profiling hooks were registered
+    """
+    token = config.PROFILE_ADMIN_TOKEN
+    sample_rate = config.PROFILE_SAMPLE_RATE
+    if not token and sample_rate <= 0:
+        return False
+    endpoints = set(config.PROFILE_ENDPOINTS)
+    interval = config.PROFILE_INTERVAL_MS / 1000
+    out_dir = config.PROFILE_DIR
+
+    def wanted():
+        supplied = request.headers.get("X-Profile-Token")
+        if token and supplied:
+            return hmac.compare_digest(supplied.encode(), token.encode())
+        return request.endpoint in endpoints and random.random() < sample_rate
+
+    @app.before_request
+    def start_profile():
+        _active.set(None)
+        if not request.path.startswith("/api/") or not wanted():
+            return
+        if not _slots.acquire(blocking=False):
+            return
+        profile = RequestProfile(_request_tags(), interval, out_dir)
+        _active.set(profile)
+        profile.start()
+
+    @app.after_request
+    def tag_response(response):
+        profile = _active.get()
+        if profile is not None:
+            profile.tags["status"] = response.status_code
+            response.headers["X-Profile-Id"] = profile.profile_id
+        return response
+
+    @app.teardown_request
+    def stop_profile(exc):
+        # Runs after a streamed body has been sent, so streams are covered in full
+        profile = _active.get()
+        if profile is not None:
+            _active.set(None)
+            if exc is not None:
+                profile.tags["status"] = 500
+            profile.stop()
+
+    return True
@@ -10,6 +10,10 @@ def register_blueprints(app):
     from .refresh import bp as refresh_bp
     from .model_metrics import bp as metrics_bp
     from .categories import bp as categories_bp
+    from .export import bp as export_bp
+    from .map_layer import bp as map_layer_bp
+    from .metrics import bp as service_metrics_bp
+    from .shadow import bp as shadow_bp
     from .errors import register_error_handlers
 
     app.register_blueprint(index_bp)
@@ -20,5 +24,9 @@ def register_blueprints(app):
     app.register_blueprint(refresh_bp, url_prefix="/api")
     app.register_blueprint(metrics_bp, url_prefix="/api")
     app.register_blueprint(categories_bp, url_prefix="/api")
+    app.register_blueprint(export_bp, url_prefix="/api")
+    app.register_blueprint(map_layer_bp, url_prefix="/api")
+    app.register_blueprint(service_metrics_bp, url_prefix="/api")
+    app.register_blueprint(shadow_bp, url_prefix="/api")
 
     register_error_handlers(app)
@@ -1,11 +1,15 @@
 # backend/routes/aqi_utils.py
 
 import logging
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 import numpy as np
 import os
 import pickle
 from flask import current_app
+from metrics import span
+from feature_store import FEATURE_NAMES, model_inputs, advance_features
+from monte_carlo import simulate_paths, summarize_paths, day_records
 
 def logger():
     return current_app.extensions["logger"]
@@ -16,12 +20,52 @@ def log_event(level, msg, operation="general", **kv):
 def ds():
     return current_app.extensions.get("data_source")
 
+def feature_store():
+    """The data source's FeatureStore, or None if it is not built or out of date"""
+    source = ds()
+    store = getattr(source, "feature_store", None)
+    if store is None or store.version != source.version:
+        return None
+    return store
+
 def predictors():
     return current_app.extensions.get("predictors", {})
 
 def get_predictor(model_key: str):
     return predictors().get(model_key)
 
+def submit_stage(pool_name, fn, *args, **kwargs):
+    """Schedule a CPU-bound stage on its endpoint-class pool; returns a Future"""
+    pool = current_app.extensions["stage_pools"][pool_name]
+    return pool.submit(current_app._get_current_object(), fn, *args, **kwargs)
+
+def run_stage(pool_name, fn, *args, **kwargs):
+    return submit_stage(pool_name, fn, *args, **kwargs).result()
+
+def get_shadow():
+    # None unless SHADOW_MODELS names candidate models
+    return current_app.extensions.get("shadow")
+
+def get_batcher(model_key: str):
+    # None when batching is disabled; callers then predict directly
+    return current_app.extensions.get("batchers", {}).get(model_key)
+
+SCALER_PATHS = {
+    "prototype": "../models/prototype_pipeline.pkl",
+    "balanced": "../models/balanced_pipeline.pkl",
+}
+
+def load_scaler(model_type):
+    with open(SCALER_PATHS[model_type], "rb") as f:
+        return pickle.load(f)
+
+def get_scaler(model_type):
+    # Scalers are preloaded during warm-up; load lazily for models added later
+    scalers = current_app.extensions.setdefault("scalers", {})
+    if model_type not in scalers:
+        scalers[model_type] = load_scaler(model_type)
+    return scalers[model_type]
+
 def build_features_from_recent(recent_df):
     recent_df = recent_df.sort_values("Date")
     aqi = recent_df["AQI"]
@@ -37,77 +81,241 @@ def build_features_from_recent(recent_df):
     return feats, recent_df
 
 def vector_for_model(model_type, features, county_row, when: datetime):
-    if model_type == "prototype":
-        state_code = county_row.get("State Code", 1)
-        county_code = county_row.get("County Code", 1)
-        X = np.array([[
-            state_code, county_code,
-            0, 0, 0, 0, 0,
-            features["aqi_lag_1"],
-            features["aqi_lag_3"],
-            features["aqi_lag_7"],
-        ]])
-        scaler_path = "../models/prototype_pipeline.pkl"
-    elif model_type == "balanced":
-        state_code = county_row.get("State Code", 1)
-        county_code = county_row.get("County Code", 1)
-        aqi_rolling_3 = features.get("aqi_rolling_3", features["aqi_lag_1"])
-        aqi_std_7 = features.get("aqi_std_7", 0)
-        X = np.array([[
-            state_code, county_code,
-            features["aqi_lag_1"],
-            features["aqi_lag_3"],
-            features["aqi_lag_7"],
-            features.get("aqi_lag_14", features["aqi_lag_7"]),
-            features["aqi_rolling_7"],
-            when.weekday(),
-            when.month,
-            aqi_rolling_3,
-            aqi_std_7,
-        ]])
-        scaler_path = "../models/balanced_pipeline.pkl"
-    else:
-        raise ValueError(f"Unknown model type: {model_type}")
+    X = raw_vector_for_model(model_type, features, county_row, when)
 
     # Scale
     try:
-        with open(scaler_path, "rb") as f:
-            scaler = pickle.load(f)
-        X_scaled = scaler.transform(X)
+        X_scaled = get_scaler(model_type).transform(X)
     except Exception:
         logger().exception("Failed to load scaler", extra={"operation": "feature_generation"})
         raise
     return X_scaled
 
-def iterative_forecast(selected_predictor, model_type, recent_df, base_features, days, county, state):
-    predictions = []
-    current_date = datetime.utcnow()
-    current_features = base_features.copy()
+def raw_vector_for_model(model_type, features, county_row, when: datetime):
+    """Unscaled (1, n_features) model input"""
+    return model_inputs(
+        model_type, features, county_row.get("State Code", 1), county_row.get("County Code", 1), when
+    )
 
-    for day in range(days):
-        forecast_date = current_date + timedelta(days=day + 1)
-        county_row = recent_df.iloc[0]
-        X_day_scaled = vector_for_model(model_type, current_features, county_row, forecast_date)
+def latest_features(county, state, snapshot=None):
+    """
+    (features, county_row) for a county's latest day; None if it has fewer than 7 rows
 
-        day_pred = selected_predictor.forecast(
-            X_day_scaled,
+    Read from the feature store when it is current, otherwise built from the
+    last 30 rows of `snapshot` (sliced here if not given).
+    """
+    store = feature_store()
+    if store is not None:
+        return store.get(county, state)
+    if snapshot is None:
+        snapshot = ds().get_county_snapshot(county, state)
+        if snapshot is None:
+            return None
+    recent_df = snapshot.recent(30)
+    if len(recent_df) < 7:
+        return None
+    features, recent_df = build_features_from_recent(recent_df)
+    log_event(logging.INFO, f"Recent rows for features: {len(recent_df)}", operation="feature_generation")
+    return features, recent_df.iloc[0]
+
+def iterative_forecast(selected_predictor, model_type, county_row, base_features, days, county, state):
+    return list(iter_forecast(selected_predictor, model_type, county_row, base_features, days, county, state))
+
+def forecast_step(selected_predictor, model_type, county_row, features, forecast_date, county, state):
+    """One day of a recursive forecast from the current features"""
+    batcher = get_batcher(model_type)
+    # Days depend on each other, so rows are batched across requests rather than days.
+    # The session covers this step only: a paused caller doesn't hold up the dispatcher.
+    with batcher.session() if batcher else nullcontext():
+        with span("scale"):
+            X_day_scaled = vector_for_model(model_type, features, county_row, forecast_date)
+
+        if batcher is None:
+            with span("predict"):
+                return selected_predictor.forecast(
+                    X_day_scaled,
+                    county_name=county,
+                    state_name=state,
+                    forecast_date=forecast_date,
+                    store_predictions=False,
+                )
+        with span("predict"):
+            yhat = batcher.predict(X_day_scaled)[0]
+    with span("postprocess"):
+        return selected_predictor.format_prediction(
+            yhat,
             county_name=county,
             state_name=state,
             forecast_date=forecast_date,
-            store_predictions=False,
         )
-        predictions.append(day_pred)
-
-        # Feedback loop
-        yhat = day_pred["predicted_aqi"]
-        current_features["aqi_lag_7"] = current_features["aqi_lag_3"]
-        current_features["aqi_lag_3"] = current_features["aqi_lag_1"]
-        current_features["aqi_lag_1"] = yhat
-        if "aqi_rolling_7" in current_features:
-            current_features["aqi_rolling_7"] = (current_features["aqi_rolling_7"] * 6 + yhat) / 7
-        if "aqi_rolling_14" in current_features:
-            current_features["aqi_rolling_14"] = (current_features["aqi_rolling_14"] * 13 + yhat) / 14
-        if "aqi_rolling_30" in current_features:
-            current_features["aqi_rolling_30"] = (current_features["aqi_rolling_30"] * 29 + yhat) / 30
-
-    return predictions
+
+def iter_forecast(selected_predictor, model_type, county_row, base_features, days, county, state, run_step=None):
+    """
+    Yield each day's prediction as soon as it is computed
+
+    Closing the generator (e.g. when a streaming client disconnects) skips the
+    remaining steps. run_step(fn, *args) runs each forecast_step(), e.g. on the
+    forecast pool; by default steps run on the caller's thread.
+    """
+    current_date = datetime.utcnow()
+    current_features = base_features.copy()
+    shadow = get_shadow()
+    served = []
+
+    try:
+        for day in range(days):
+            forecast_date = current_date + timedelta(days=day + 1)
+            step_args = (selected_predictor, model_type, county_row, current_features, forecast_date, county, state)
+            day_pred = run_step(forecast_step, *step_args) if run_step else forecast_step(*step_args)
+            served.append((forecast_date, day_pred["predicted_aqi"]))
+            yield day_pred
+
+            # Feedback loop
+            advance_features(current_features, day_pred["predicted_aqi"])
+    finally:
+        # Candidates replay the days actually served, also when a stream stops early
+        if shadow is not None and served:
+            shadow.submit(model_type, county, state, county_row, base_features, served)
+
+def forecast_county(selected_predictor, model_type, county, state, days):
+    """Read base features and forecast; None if history is too short"""
+    steps = iter_forecast_county(selected_predictor, model_type, county, state, days)
+    return list(steps) if steps is not None else None
+
+def forecast_snapshot(selected_predictor, model_type, snapshot, days):
+    """Forecast from a CountySnapshot; None if history is too short"""
+    steps = iter_forecast_snapshot(selected_predictor, model_type, snapshot, days)
+    return list(steps) if steps is not None else None
+
+def iter_forecast_county(selected_predictor, model_type, county, state, days, snapshot=None, run_step=None):
+    """Read base features and return the per-day generator; None if history is too short"""
+    with span("features"):
+        base = latest_features(county, state, snapshot)
+    if base is None:
+        return None
+    features, county_row = base
+    return iter_forecast(selected_predictor, model_type, county_row, features, days, county, state, run_step)
+
+def iter_forecast_snapshot(selected_predictor, model_type, snapshot, days):
+    """iter_forecast_county() for a CountySnapshot"""
+    return iter_forecast_county(selected_predictor, model_type, snapshot.county, snapshot.state, days, snapshot)
+
+def forecast_all_counties(selected_predictor, model_type, forecast_date):
+    """
+    Next-day forecast for every county with enough history, in one predict call
+
+    Base features are read exactly as in the first step of iterative_forecast;
+    only the scaling and the model call are batched.
+
+    Returns:
+        (list of CountySnapshot, array of predicted AQI)
+    """
+    snapshots, rows = [], []
+    for snapshot in ds().iter_county_snapshots():
+        base = latest_features(snapshot.county, snapshot.state, snapshot)
+        if base is None:
+            continue
+        features, county_row = base
+        rows.append(raw_vector_for_model(model_type, features, county_row, forecast_date))
+        snapshots.append(snapshot)
+    if not rows:
+        return [], np.empty(0)
+
+    X_scaled = get_scaler(model_type).transform(np.vstack(rows))
+    return snapshots, np.asarray(selected_predictor.predict_values(X_scaled))
+
+def iter_forecast_all_counties(selected_predictor, model_type, days, max_counties, county=None, state=None):
+    """
+    Recursive forecasts of every county (optionally filtered) in chunks of
+    counties, one scale + predict call per chunk and day
+
+    Each step builds the inputs of the whole chunk with model_inputs() and feeds
+    the predictions back with advance_features(), as iter_forecast does per county.
+
+    Yields:
+        (chunk of (county, state), predicted AQI (n, days), dates)
+    """
+    keys, features, codes = base_features_all_counties(county, state)
+    dates = forecast_dates(days)
+    scaler = get_scaler(model_type)
+    for start in range(0, len(keys), max_counties):
+        stop = start + max_counties
+        chunk = {name: values[start:stop] for name, values in features.items()}
+        predicted = np.empty((len(keys[start:stop]), days))
+        for day, when in enumerate(dates):
+            X = model_inputs(model_type, chunk, codes[start:stop, 0], codes[start:stop, 1], when)
+            predicted[:, day] = selected_predictor.predict_values(scaler.transform(X))
+            advance_features(chunk, predicted[:, day])
+        yield keys[start:stop], predicted, dates
+
+def forecast_dates(days):
+    """Forecast dates of a request made now, as iter_forecast dates them"""
+    current_date = datetime.utcnow()
+    return [current_date + timedelta(days=day + 1) for day in range(days)]
+
+def probabilistic_forecast_county(selected_predictor, model_type, county, state, days, n_paths):
+    """Monte Carlo forecast of one county (monte_carlo.py); None if history is too short"""
+    with span("features"):
+        base = latest_features(county, state)
+    if base is None:
+        return None
+    features, county_row = base
+    dates = forecast_dates(days)
+    with span("simulate"):
+        paths = simulate_paths(
+            selected_predictor.predict_values, get_scaler(model_type), model_type, features,
+            np.array([county_row.get("State Code", 1)]), np.array([county_row.get("County Code", 1)]),
+            dates, n_paths, residuals=getattr(selected_predictor, "residuals", None),
+        )
+    with span("postprocess"):
+        quantiles, probabilities = summarize_paths(paths)
+        return [
+            {**record, "county_name": county, "state_name": state}
+            for record in day_records(quantiles[0], probabilities[0], dates, n_paths)
+        ]
+
+def base_features_all_counties(county=None, state=None):
+    """
+    Base features of every county with enough history (optionally filtered), as arrays
+
+    Returns:
+        (list of (county, state), FEATURE_NAMES -> (n,) array, (n, 2) State/County Code)
+    """
+    store = feature_store()
+    if store is not None:
+        rows = [i for i in store.ready_rows()
+                if (county is None or store.keys[i][0] == county) and (state is None or store.keys[i][1] == state)]
+        keys = [store.keys[i] for i in rows]
+        return keys, dict(zip(FEATURE_NAMES, store.features[rows].T)), store.codes[rows]
+    keys, features, codes = [], [], []
+    for snapshot in ds().iter_county_snapshots(county, state):
+        base = latest_features(snapshot.county, snapshot.state, snapshot)
+        if base is None:
+            continue
+        keys.append((snapshot.county, snapshot.state))
+        features.append([base[0][name] for name in FEATURE_NAMES])
+        codes.append([base[1].get("State Code", 1), base[1].get("County Code", 1)])
+    features = np.array(features, dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+    return keys, dict(zip(FEATURE_NAMES, features.T)), np.array(codes, dtype=np.float64).reshape(-1, 2)
+
+def iter_probabilistic_all_counties(selected_predictor, model_type, days, n_paths, max_rows, county=None, state=None):
+    """
+    Monte Carlo forecasts of every county, simulated in chunks of counties
+    so no predict call exceeds max_rows rows
+
+    Yields:
+        (chunk of (county, state), quantiles (n, days, q), probabilities (n, days, categories), dates)
+    """
+    keys, features, codes = base_features_all_counties(county, state)
+    dates = forecast_dates(days)
+    scaler = get_scaler(model_type)
+    residuals = getattr(selected_predictor, "residuals", None)
+    chunk = max(1, max_rows // n_paths)
+    for start in range(0, len(keys), chunk):
+        stop = start + chunk
+        paths = simulate_paths(
+            selected_predictor.predict_values, scaler, model_type,
+            {name: values[start:stop] for name, values in features.items()},
+            codes[start:stop, 0], codes[start:stop, 1], dates, n_paths, residuals=residuals,
+        )
+        yield (keys[start:stop], *summarize_paths(paths), dates)
@@ -2,9 +2,15 @@
 
 from flask import Blueprint, jsonify, current_app
 from config import Config
+from http_cache import make_etag, versioned_json
 
 bp = Blueprint("categories", __name__)
 
+CATEGORIES_ETAG = make_etag("categories", Config.AQI_CATEGORIES)
+
 @bp.get("/categories")
 def get_aqi_categories():
-    return jsonify({"success": True, "categories": Config.AQI_CATEGORIES})
+    return versioned_json(
+        CATEGORIES_ETAG,
+        lambda: jsonify({"success": True, "categories": Config.AQI_CATEGORIES}).get_data(),
+    )
@@ -3,19 +3,25 @@
 import logging
 from flask import Blueprint, jsonify
 from .aqi_utils import ds, log_event
+from http_cache import make_etag, versioned_json
 
 bp = Blueprint("counties", __name__)
 
 @bp.get("/counties")
 def get_counties():
     try:
-        log_event(logging.INFO, "Fetching counties", operation="ingestion")
         source = ds()
         if source is None:
             return jsonify({"success": False, "error": "Data source not available"}), 500
-        counties = source.get_counties()
-        log_event(logging.INFO, f"Counties retrieved: {len(counties)}", operation="ingestion")
-        return jsonify({"success": True, "counties": counties, "count": len(counties), "source": "csv"})
+
+        def build_body():
+            log_event(logging.INFO, "Fetching counties", operation="ingestion")
+            counties = source.get_counties()
+            log_event(logging.INFO, f"Counties retrieved: {len(counties)}", operation="ingestion")
+            return jsonify({"success": True, "counties": counties, "count": len(counties), "source": "csv"}).get_data()
+
+        # Only changes when the data does
+        return versioned_json(make_etag("counties", source.version), build_body, source.last_modified)
     except Exception as e:
         from .aqi_utils import logger
         logger().exception("Error fetching counties", extra={"operation": "ingestion"})
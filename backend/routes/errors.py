@@ -1,6 +1,7 @@
 # backend/routes/errors.py
 
 from flask import jsonify
+from executors import PoolSaturated
 
 def register_error_handlers(app):
     @app.errorhandler(404)
@@ -10,3 +11,9 @@ def register_error_handlers(app):
     @app.errorhandler(500)
     def internal_error(error):
         return jsonify({"success": False, "error": "Internal server error"}), 500
+
+    @app.errorhandler(PoolSaturated)
+    def pool_saturated(error):
+        response = jsonify({"success": False, "error": "Server busy, please retry"})
+        response.headers["Retry-After"] = str(max(1, int(error.queue_timeout)))
+        return response, 503
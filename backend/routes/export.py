@@ -0,0 +1,207 @@
+# backend/routes/export.py
+
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from .aqi_utils import (ds, get_predictor, iter_forecast_all_counties, iter_probabilistic_all_counties,
+                        run_stage, log_event)
+from .predict import _parse_days, _parse_paths
+from admission import admission_controlled, no_stale_key
+from config import Config
+from executors import PoolSaturated
+from ml_model import AQI_CATEGORY_BOUNDS
+from monte_carlo import CATEGORY_NAMES, QUANTILES
+
+bp = Blueprint("export", __name__)
+
+HISTORY_FIELDS = ["date", "state", "county", "aqi", "category", "defining_parameter"]
+FORECAST_FIELDS = ["forecast_date", "state", "county", "model", "day", "predicted_aqi", "predicted_category"]
+DISTRIBUTION_FIELDS = (["forecast_date", "state", "county", "model", "day", "paths"]
+                       + [f"p{round(level * 100):02d}" for level in QUANTILES]
+                       + [f"prob_{name.lower().replace(' ', '_')}" for name in CATEGORY_NAMES])
+MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+FORECAST_CHUNK = 256  # counties per forecast-pool stage
+POOL_RETRY_DELAY = 0.05  # seconds between tries for a forecast worker mid-export
+POOL_WAIT_LIMIT = 10.0  # seconds a later chunk waits for a forecast worker before the export is cut short
+
+
+class ExportAborted(Exception):
+    """A started export could not be finished; the body ends with an error record"""
+
+
+def _parse_date(value, name):
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' parameter: '{value}'. Use YYYY-MM-DD.")
+
+
+def _history_rows(snapshots, start, end):
+    """One tuple per row, county by county; only one county's slice is in memory"""
+    import pandas as pd  # loaded by the data source by now; kept off the startup path
+    for snapshot in snapshots:
+        frame = snapshot.between(start, end)
+        if len(frame) == 0:
+            continue
+        dates = frame["Date"].dt.strftime("%Y-%m-%d").tolist()
+        aqi = frame["AQI"].tolist()
+        category = frame["category"].tolist() if "category" in frame else ["Unknown"] * len(frame)
+        parameter = frame["defining_parameter"].tolist() if "defining_parameter" in frame else ["Unknown"] * len(frame)
+        yield [
+            (d, snapshot.state, snapshot.county, int(a) if pd.notna(a) else None, c, p)
+            for d, a, c, p in zip(dates, aqi, category, parameter)
+        ]
+
+
+def _on_forecast_pool(chunks):
+    """
+    Compute each chunk of a generator as one forecast-pool stage
+
+    The first chunk is computed before the response starts, so a saturated
+    pool sheds the request (503). Later chunks wait for a free worker instead
+    of cutting a half-written export short, but for at most POOL_WAIT_LIMIT
+    seconds; then the export ends with an error record (ExportAborted), so
+    the request thread and admission slot are not held indefinitely.
+    """
+    first = run_stage("forecast", next, chunks, None)
+
+    def pooled():
+        chunk = first
+        while chunk is not None:
+            yield chunk
+            deadline = time.monotonic() + POOL_WAIT_LIMIT
+            while True:
+                try:
+                    chunk = run_stage("forecast", next, chunks, None)
+                    break
+                except PoolSaturated:
+                    if time.monotonic() >= deadline:
+                        log_event(logging.WARNING, "Export cut short: forecast pool saturated", operation="prediction")
+                        raise ExportAborted(f"Forecast pool saturated for {POOL_WAIT_LIMIT:g}s, export incomplete")
+                    time.sleep(POOL_RETRY_DELAY)
+    return pooled()
+
+
+def _forecast_rows(predictor, model_type, days, county, state):
+    """Point forecasts, one chunk of counties (one batch of predict calls) at a time"""
+    names = [name for name, _, _ in AQI_CATEGORY_BOUNDS] + ["Unknown"]  # index -1 is Unknown
+    chunks = iter_forecast_all_counties(predictor, model_type, days, FORECAST_CHUNK, county, state)
+    for keys, predicted, dates in chunks:
+        labels = [d.strftime("%Y-%m-%d") for d in dates]
+        category, _ = predictor.category_probability_matrix(predicted.ravel())
+        category = category.reshape(predicted.shape)
+        yield [
+            (labels[day], key[1], key[0], model_type, day + 1,
+             round(float(predicted[i, day]), 2), names[category[i, day]])
+            for i, key in enumerate(keys)
+            for day in range(days)
+        ]
+
+
+def _distribution_rows(predictor, model_type, days, n_paths, county, state):
+    """Monte Carlo forecasts, one chunk of counties (one batch of predict calls) at a time"""
+    chunks = iter_probabilistic_all_counties(predictor, model_type, days, n_paths, Config.MONTE_CARLO_MAX_ROWS,
+                                             county, state)
+    for keys, quantiles, probabilities, dates in chunks:
+        labels = [d.strftime("%Y-%m-%d") for d in dates]
+        yield [
+            (labels[day], key[1], key[0], model_type, day + 1, n_paths,
+             *[round(v, 2) for v in quantiles[i, day].tolist()],
+             *[round(p, 4) for p in probabilities[i, day].tolist()])
+            for i, key in enumerate(keys)
+            for day in range(days)
+        ]
+
+
+def _ndjson(chunks, fields):
+    """Records as JSON lines; an aborted export ends with an {"error": ...} line"""
+    try:
+        for rows in chunks:
+            yield "".join(json.dumps(dict(zip(fields, row))) + "\n" for row in rows)
+    except ExportAborted as e:
+        yield json.dumps({"error": str(e)}) + "\n"
+
+
+def _csv(chunks, fields):
+    """Header plus rows; an aborted export ends with an "error,<message>" row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue()
+    try:
+        for rows in chunks:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    except ExportAborted as e:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(["error", str(e)])
+        yield buffer.getvalue()
+
+
+@bp.get("/export")
+@admission_controlled("export", cache_key=no_stale_key)
+def export_data():
+    """
+    Stream history or forecasts for every county (or a county/state subset)
+    Query: kind=history|forecast, format=ndjson|csv, start/end=YYYY-MM-DD (history),
+           days=1, 3, 7 or 14 and model (forecast), county, state
+           paths=N (forecast): Monte Carlo quantiles and category probabilities
+           from N simulated paths per county instead of point forecasts
+    """
+    kind = request.args.get("kind", "history")
+    fmt = request.args.get("format", "ndjson")
+    county = request.args.get("county")
+    state = request.args.get("state")
+
+    if kind not in ("history", "forecast"):
+        return jsonify({"success": False, "error": f"Invalid 'kind' value: {kind}. Must be history or forecast"}), 400
+    if fmt not in MIMETYPES:
+        return jsonify({"success": False, "error": f"Invalid 'format' value: {fmt}. Must be ndjson or csv"}), 400
+
+    source = ds()
+    if source is None:
+        return jsonify({"success": False, "error": "Data source not available"}), 500
+    snapshots = source.iter_county_snapshots(county, state)
+
+    if kind == "history":
+        try:
+            start = _parse_date(request.args.get("start"), "start")
+            end = _parse_date(request.args.get("end"), "end")
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        fields, chunks = HISTORY_FIELDS, _history_rows(snapshots, start, end)
+    else:
+        model_type = request.args.get("model", "balanced")
+        days, error = _parse_days(request.args.get("days", "1"))
+        if error:
+            return error
+        predictor = get_predictor(model_type)
+        if predictor is None or predictor.model is None:
+            return jsonify({"success": False, "error": f"{model_type.title()} model not loaded. Please train model first."}), 503
+        paths_input = request.args.get("paths")
+        if paths_input is None:
+            fields, chunks = FORECAST_FIELDS, _on_forecast_pool(_forecast_rows(predictor, model_type, days, county, state))
+        else:
+            n_paths, error = _parse_paths(paths_input)
+            if error:
+                return error
+            fields = DISTRIBUTION_FIELDS
+            chunks = _on_forecast_pool(_distribution_rows(predictor, model_type, days, n_paths, county, state))
+
+    log_event(logging.INFO, f"Export request: kind={kind}, format={fmt}, county={county}, state={state}",
+              operation="ingestion")
+    body = _ndjson(chunks, fields) if fmt == "ndjson" else _csv(chunks, fields)
+    response = Response(stream_with_context(body), mimetype=MIMETYPES[fmt])
+    response.headers["Content-Disposition"] = f'attachment; filename="aqi_{kind}.{fmt}"'
+    # Let proxies pass chunks through as they are produced
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
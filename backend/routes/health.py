@@ -2,17 +2,49 @@
 
 from flask import Blueprint, jsonify, current_app
 from datetime import datetime
+from structured_logging import log_pipeline_stats
 
 bp = Blueprint("health", __name__)
 
 @bp.get("/health")
 def health_check():
+    """Status and component stats; 503 (with warm-up progress) until the app is ready"""
     predictors = current_app.extensions.get("predictors", {})
     default_key = current_app.extensions.get("default_predictor_key", "balanced")
     predictor = predictors.get(default_key)
+    warmup = current_app.extensions.get("warmup")
+    source = current_app.extensions.get("data_source")
+    ready = warmup is None or warmup.ready
     return jsonify({
-        "status": "healthy",
+        "status": "healthy" if ready else "warming_up",
+        "ready": ready,
+        "warmup": warmup.status() if warmup is not None else None,
+        "startup": {
+            name: current_app.extensions["metrics"].gauges.get(name)
+            for name in ("startup_import_seconds", "startup_bind_seconds", "ingestion_seconds", "warmup_seconds")
+        },
         "timestamp": datetime.utcnow().isoformat(),
         "model_loaded": bool(predictor and predictor.model is not None),
-        "database_connected": False  # CSV mode
-    })
+        "database_connected": False,  # CSV mode
+        "inference_batching": {
+            name: batcher.stats()
+            for name, batcher in current_app.extensions.get("batchers", {}).items()
+        },
+        "stage_pools": {
+            name: pool.stats()
+            for name, pool in current_app.extensions.get("stage_pools", {}).items()
+        },
+        "admission": {
+            name: controller.stats()
+            for name, controller in current_app.extensions.get("admission", {}).items()
+        },
+        "feature_store": source.feature_store.stats()
+        if getattr(source, "feature_store", None) is not None else None,
+        "shadow": current_app.extensions["shadow"].stats()
+        if "shadow" in current_app.extensions else None,
+        "refresh_cache": current_app.extensions["refresh_cache"].stats()
+        if "refresh_cache" in current_app.extensions else None,
+        "map_layers": current_app.extensions["map_layers"].stats()
+        if "map_layers" in current_app.extensions else None,
+        "logging": log_pipeline_stats(),
+    }), 200 if ready else 503
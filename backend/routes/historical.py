@@ -2,7 +2,10 @@
 
 import logging
 from flask import Blueprint, request, jsonify
-from .aqi_utils import ds, log_event, logger
+from .aqi_utils import ds, run_stage, log_event, logger
+from executors import PoolSaturated
+from http_cache import make_etag, is_not_modified, not_modified_response, conditional
+from metrics import timed
 
 bp = Blueprint("historical", __name__)
 
@@ -21,10 +24,16 @@ def get_historical_aqi():
         if source is None:
             return jsonify({"success": False, "error": "Data source not available"}), 500
 
-        historical_data = source.get_historical_data(county, state, days)
+        # Revalidation is answered from versions alone, before any pandas work
+        etag = make_etag("historical", source.version, county, state, days)
+        matched = is_not_modified(etag, source.last_modified)
+        if matched:
+            return not_modified_response(matched, source.last_modified)
+
+        historical_data = run_stage("data", timed("data_slice", source.get_historical_data), county, state, days)
         log_event(logging.INFO, f"Historical rows returned: {len(historical_data)}", operation="ingestion")
 
-        return jsonify({
+        return conditional(jsonify({
             "success": True,
             "county": county,
             "state": state,
@@ -32,7 +41,9 @@ def get_historical_aqi():
             "data": historical_data,
             "count": len(historical_data),
             "source": "csv"
-        })
+        }), etag, source.last_modified)
+    except PoolSaturated:
+        raise
     except Exception as e:
         logger().exception("Error fetching historical data", extra={"operation": "ingestion"})
         return jsonify({"success": False, "error": str(e)}), 500
@@ -1,9 +1,10 @@
 # backend/routes/index.py
 
-from flask import Blueprint, current_app, send_from_directory
+from flask import Blueprint, current_app
+from compression import send_static
 
 bp = Blueprint("index", __name__)
 
 @bp.route("/")
 def index():
-    return send_from_directory(current_app.static_folder, "index.html")
+    return send_static(current_app.static_folder, "index.html")
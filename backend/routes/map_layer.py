@@ -0,0 +1,104 @@
+# backend/routes/map_layer.py
+
+import logging
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from .aqi_utils import ds, get_predictor, forecast_all_counties, submit_stage, log_event, logger
+from executors import PoolSaturated
+from http_cache import make_etag, is_not_modified, not_modified_response, conditional
+from map_layer import MapLayerStore, pack_layer
+
+bp = Blueprint("map_layer", __name__)
+
+
+def _layers():
+    return current_app.extensions.setdefault("map_layers", MapLayerStore())
+
+
+def layer_key(source, predictor, model_type):
+    # Forecasts are for tomorrow (UTC), so the layer changes daily as well as per version
+    return source.version, predictor.model_version, model_type, datetime.utcnow().date()
+
+
+def build_map_layers(predictor, model_type, forecast_date):
+    """Both payload variants, {with_probabilities: bytes}, from one all-county forecast"""
+    snapshots, predicted = forecast_all_counties(predictor, model_type, forecast_date)
+    category, probabilities = predictor.category_probability_matrix(predicted)
+    fips = [snapshot.fips for snapshot in snapshots]
+    return {
+        False: pack_layer(fips, predicted, category, forecast_date),
+        True: pack_layer(fips, predicted, category, forecast_date, probabilities),
+    }
+
+
+def refresh_map_layer(predictor, model_type):
+    """Build and store model_type's layer for the current versions and day"""
+    key = layer_key(ds(), predictor, model_type)
+    variants = build_map_layers(predictor, model_type, key[-1] + timedelta(days=1))
+    _layers().put(model_type, key, variants)
+    log_event(logging.INFO, f"Map layer built for {model_type}: {len(variants[True])} bytes", operation="prediction")
+
+
+def _rebuild_in_background(predictor, model_type):
+    """Rebuild the layer on the forecast pool unless a build is running or the pool is full"""
+    layers = _layers()
+    if not layers.claim_build(model_type):
+        return
+
+    def rebuild():
+        failed = False
+        try:
+            refresh_map_layer(predictor, model_type)
+        except Exception:
+            failed = True
+            logger().exception("Error building map layer", extra={"operation": "prediction"})
+        finally:
+            layers.release_build(model_type, failed)
+
+    try:
+        submit_stage("forecast", rebuild)
+    except PoolSaturated:
+        layers.release_build(model_type)  # the next request tries again
+
+
+@bp.get("/aqi/map")
+def get_map_layer():
+    """
+    Next-day forecast for every county as a binary map layer (see map_layer.py)
+    Query: model (default balanced), probabilities=1 to include category probabilities
+
+    Layers are built during warm-up and rebuilt on the forecast pool when the
+    data or model version or the day changes; meanwhile the previous layer is
+    served. Without any layer yet the response is a 503 with Retry-After.
+    """
+    try:
+        model_type = request.args.get("model", "balanced")
+        with_probabilities = request.args.get("probabilities", "0") in ("1", "true", "True")
+
+        source = ds()
+        if source is None:
+            return jsonify({"success": False, "error": "Data source not available"}), 500
+        predictor = get_predictor(model_type)
+        if predictor is None or predictor.model is None:
+            return jsonify({"success": False, "error": f"{model_type.title()} model not loaded. Please train model first."}), 503
+
+        layers = _layers()
+        entry = layers.get(model_type)
+        if entry is None or entry[0] != layer_key(source, predictor, model_type):
+            _rebuild_in_background(predictor, model_type)
+            if entry is None:
+                response = jsonify({"success": False, "error": "Map layer is being built, retry shortly"})
+                response.headers["Retry-After"] = "1"
+                return response, 503
+            layers.count_stale()
+
+        key, variants = entry
+        etag = make_etag("map", *key, with_probabilities)
+        matched = is_not_modified(etag)
+        if matched:
+            return not_modified_response(matched)
+        response = current_app.response_class(variants[with_probabilities], mimetype="application/octet-stream")
+        return conditional(response, etag)
+    except Exception as e:
+        logger().exception("Error serving map layer", extra={"operation": "prediction"})
+        return jsonify({"success": False, "error": str(e)}), 500
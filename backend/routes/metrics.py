@@ -0,0 +1,25 @@
+# backend/routes/metrics.py
+
+from flask import Blueprint, request, jsonify, current_app
+from config import Config
+from metrics import render_prometheus
+
+bp = Blueprint("metrics", __name__)
+
+@bp.get("/metrics")
+def get_metrics():
+    """
+    Request/stage latency histograms and component stats for this process
+    Prometheus text by default; ?format=json returns percentiles and SLO checks
+    """
+    registry = current_app.extensions["metrics"]
+    if request.args.get("format") == "json":
+        return jsonify({
+            "success": True,
+            "latency": registry.latency_summary(),
+            "gauges": registry.gauges,
+            "slo": registry.slo_report(Config),
+        })
+    return current_app.response_class(
+        render_prometheus(current_app, Config), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -3,6 +3,7 @@
 import logging
 from flask import Blueprint, request, jsonify
 from .aqi_utils import predictors, log_event
+from http_cache import make_etag, versioned_json
 
 bp = Blueprint("model_metrics", __name__)
 
@@ -13,12 +14,13 @@ def get_model_metrics():
         log_event(logging.INFO, f"Metrics request: model={model_type}", operation="validation")
         selected = predictors().get(model_type)
         if selected and getattr(selected, "metrics", None):
-            return jsonify({
+            etag = make_etag("metrics", model_type, selected.model_version)
+            return versioned_json(etag, lambda: jsonify({
                 "success": True,
                 "model_type": model_type,
                 "metrics": selected.metrics,
                 "version": selected.model_version
-            })
+            }).get_data())
         return jsonify({"success": False, "error": f"No metrics available for {model_type} model"}), 404
     except Exception as e:
         from .aqi_utils import logger
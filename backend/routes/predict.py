@@ -2,43 +2,102 @@
 
 import logging
 from datetime import datetime
-from flask import Blueprint, request, jsonify
-from .aqi_utils import ds, predictors, get_predictor, build_features_from_recent, iterative_forecast, log_event, logger
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from .aqi_utils import (ds, predictors, get_predictor, forecast_county, iter_forecast_county, run_stage,
+                        probabilistic_forecast_county, log_event, logger)
+from config import Config
+from executors import PoolSaturated
+from admission import admission_controlled, forecast_args_key, remember_stale
+from metrics import span
 
 bp = Blueprint("predict", __name__)
 
+# Valid days values: 1, 3, 7, or 14
+VALID_DAYS = [1, 3, 7, 14]
+
+
+def _parse_days(days_input):
+    """(days, None) or (None, error response)"""
+    try:
+        days = int(days_input)
+    except (ValueError, TypeError):
+        return None, (jsonify({
+            "success": False,
+            "error": f"Invalid 'days' parameter: '{days_input}'. Must be an integer."
+        }), 400)
+
+    if days not in VALID_DAYS:
+        return None, (jsonify({
+            "success": False,
+            "error": f"Invalid 'days' value: {days}. Must be one of: {', '.join(map(str, VALID_DAYS))}"
+        }), 400)
+    return days, None
+
+
+def _parse_paths(paths_input):
+    """(paths, None) or (None, error response)"""
+    try:
+        paths = int(paths_input)
+    except (ValueError, TypeError):
+        return None, (jsonify({
+            "success": False,
+            "error": f"Invalid 'paths' parameter: '{paths_input}'. Must be an integer."
+        }), 400)
+
+    if not 1 <= paths <= Config.MONTE_CARLO_MAX_PATHS:
+        return None, (jsonify({
+            "success": False,
+            "error": f"Invalid 'paths' value: {paths}. Must be between 1 and {Config.MONTE_CARLO_MAX_PATHS}"
+        }), 400)
+    return paths, None
+
+
+def _parse_flag(name, value):
+    """(bool, None) or (None, error response); only JSON true/false are accepted"""
+    if not isinstance(value, bool):
+        return None, (jsonify({
+            "success": False,
+            "error": f"Invalid '{name}' parameter: '{value}'. Must be true or false."
+        }), 400)
+    return value, None
+
+
+def _sse(event, data):
+    # Same JSON encoding as jsonify, so dates match /api/aqi/predict
+    return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+
 @bp.post("/aqi/predict")
+@admission_controlled("predict")
 def predict_aqi():
     try:
         t0 = datetime.utcnow()
-        payload = request.get_json(force=True) or {}
-        county = payload.get("county")
-        state = payload.get("state")
-        model_type = payload.get("model", "balanced")
-        
-        # Validate days parameter
-        days_input = payload.get("days", 1)
-        try:
-            days = int(days_input)
-        except (ValueError, TypeError):
-            return jsonify({
-                "success": False, 
-                "error": f"Invalid 'days' parameter: '{days_input}'. Must be an integer."
-            }), 400
-        
-        # Valid days values: 1, 3, 7, or 14
-        valid_days = [1, 3, 7, 14]
-        if days not in valid_days:
-            return jsonify({
-                "success": False, 
-                "error": f"Invalid 'days' value: {days}. Must be one of: {', '.join(map(str, valid_days))}"
-            }), 400
+        with span("validate"):
+            payload = request.get_json(force=True) or {}
+            county = payload.get("county")
+            state = payload.get("state")
+            model_type = payload.get("model", "balanced")
+
+            # Validate days parameter
+            days, error = _parse_days(payload.get("days", 1))
+            if error:
+                return error
 
-        log_event(logging.INFO, f"Prediction request: county={county}, state={state}, model={model_type}, days={days}",
-                  operation="validation")
+            # Monte Carlo mode: quantiles and category probabilities from simulated paths
+            probabilistic, error = _parse_flag("probabilistic", payload.get("probabilistic", False))
+            if error:
+                return error
+            n_paths = None
+            if probabilistic:
+                n_paths, error = _parse_paths(payload.get("paths", Config.MONTE_CARLO_PATHS))
+                if error:
+                    return error
 
-        if not county or not state:
-            return jsonify({"success": False, "error": "County and state are required"}), 400
+            log_event(logging.INFO, f"Prediction request: county={county}, state={state}, model={model_type}, days={days}",
+                      operation="validation")
+
+            if not county or not state:
+                return jsonify({"success": False, "error": "County and state are required"}), 400
 
         selected_predictor = get_predictor(model_type)
         if selected_predictor is None or selected_predictor.model is None:
@@ -48,15 +107,14 @@ def predict_aqi():
         if source is None:
             return jsonify({"success": False, "error": "Data source not available"}), 500
 
-        recent_df = source.get_recent_data_for_prediction(county, state, 30)
-        if recent_df is None or len(recent_df) < 7:
+        if probabilistic:
+            preds = run_stage("forecast", probabilistic_forecast_county, selected_predictor, model_type,
+                              county, state, days, n_paths)
+        else:
+            preds = run_stage("forecast", forecast_county, selected_predictor, model_type, county, state, days)
+        if preds is None:
             return jsonify({"success": False, "error": f"Insufficient historical data for {county}, {state}. Need at least 7 days."}), 400
 
-        features, recent_df = build_features_from_recent(recent_df)
-        log_event(logging.INFO, f"Recent rows for features: {len(recent_df)}", operation="feature_generation")
-
-        preds = iterative_forecast(selected_predictor, model_type, recent_df, features, days, county, state)
-
         elapsed_ms = int((datetime.utcnow() - t0).total_seconds() * 1000)
         log_event(logging.INFO, f"Prediction completed in {elapsed_ms} ms (days={days})", operation="prediction")
 
@@ -77,6 +135,85 @@ def predict_aqi():
                 "predictions": preds,
             })
 
+    except PoolSaturated:
+        raise
     except Exception as e:
         logger().exception("Error making prediction", extra={"operation": "prediction"})
         return jsonify({"success": False, "error": str(e)}), 500
+
+
+def _run_forecast_step(fn, *args):
+    return run_stage("forecast", fn, *args)
+
+
+@bp.get("/aqi/predict/stream")
+@admission_controlled("stream", cache_key=forecast_args_key)
+def predict_aqi_stream():
+    """
+    Multi-day forecast as Server-Sent Events, one event per day as it is computed
+    Query: county, state, model, days (same values as /api/aqi/predict)
+    Events: "prediction" (day, plus the prediction fields), then "done", or
+    "forecast_error" if a step fails. Closing the connection cancels the
+    remaining steps.
+
+    The admission slot is held until the stream ends; each day runs on the
+    forecast pool. A shed request replays the last complete stream of the
+    same query, if any.
+    """
+    county = request.args.get("county")
+    state = request.args.get("state")
+    model_type = request.args.get("model", "balanced")
+    days, error = _parse_days(request.args.get("days", 7))
+    if error:
+        return error
+
+    log_event(logging.INFO, f"Streaming prediction request: county={county}, state={state}, model={model_type}, days={days}",
+              operation="validation")
+
+    if not county or not state:
+        return jsonify({"success": False, "error": "County and state are required"}), 400
+
+    selected_predictor = get_predictor(model_type)
+    if selected_predictor is None or selected_predictor.model is None:
+        return jsonify({"success": False, "error": f"{model_type.title()} model not loaded. Please train model first."}), 503
+
+    source = ds()
+    if source is None:
+        return jsonify({"success": False, "error": "Data source not available"}), 500
+
+    # Base features are read on the forecast pool like /api/aqi/predict; the
+    # recursive steps then go to the pool one at a time as the response is written
+    steps = run_stage("forecast", iter_forecast_county, selected_predictor, model_type, county, state, days,
+                      run_step=_run_forecast_step)
+    if steps is None:
+        return jsonify({"success": False, "error": f"Insufficient historical data for {county}, {state}. Need at least 7 days."}), 400
+
+    def events():
+        t0 = datetime.utcnow()
+        sent = 0
+        chunks = []
+        try:
+            for day, pred in enumerate(steps, start=1):
+                chunks.append(_sse("prediction", {"day": day, "forecast_days": days, **pred}))
+                yield chunks[-1]
+                sent = day
+            elapsed_ms = int((datetime.utcnow() - t0).total_seconds() * 1000)
+            log_event(logging.INFO, f"Streamed prediction completed in {elapsed_ms} ms (days={days})", operation="prediction")
+            chunks.append(_sse("done", {"county": county, "state": state, "forecast_days": days}))
+            remember_stale("stream", forecast_args_key(), "".join(chunks), "text/event-stream")
+            yield chunks[-1]
+        except GeneratorExit:
+            # Client went away: the remaining steps are never computed
+            log_event(logging.INFO, f"Streamed prediction cancelled after {sent}/{days} days", operation="prediction")
+            raise
+        except Exception as e:
+            logger().exception("Error streaming prediction", extra={"operation": "prediction"})
+            yield _sse("forecast_error", {"error": str(e)})
+        finally:
+            steps.close()
+
+    response = Response(stream_with_context(events()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Let proxies pass events through as they are produced
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -1,13 +1,25 @@
 # backend/routes/refresh.py
 
+import json
 import logging
 from datetime import datetime
-from flask import Blueprint, request, jsonify
-from .aqi_utils import ds, get_predictor, build_features_from_recent, iterative_forecast, log_event, logger
+from flask import Blueprint, request, jsonify, current_app
+from .aqi_utils import ds, get_predictor, forecast_snapshot, submit_stage, run_stage, log_event, logger
+from executors import PoolSaturated
+from admission import admission_controlled
+from metrics import span, timed
 
 bp = Blueprint("refresh", __name__)
 
+
+def _with_timestamp(body):
+    """Cached response body (JSON object bytes) with the current time as its "timestamp" key"""
+    stamp = json.dumps(datetime.utcnow().isoformat()).encode()
+    return b'{"timestamp":' + stamp + b"," + body.lstrip()[1:]
+
+
 @bp.post("/aqi/refresh")
+@admission_controlled("refresh")
 def refresh_data():
     """
     Recompute historical + prediction without internally calling HTTP endpoints.
@@ -41,31 +53,40 @@ def refresh_data():
         if not county or not state:
             return jsonify({"success": False, "error": "County and state are required"}), 400
 
-        # Historical
         source = ds()
         if source is None:
             return jsonify({"success": False, "error": "Data source not available"}), 500
-        log_event(logging.INFO, "Refreshing historical data", operation="ingestion")
-        historical_data = source.get_historical_data(county, state, int(payload.get("history_days", 30)))
-
-        # Prediction
-        log_event(logging.INFO, "Refreshing prediction", operation="prediction")
-        recent_df = source.get_recent_data_for_prediction(county, state, 30)
-        if recent_df is None or len(recent_df) < 7:
-            return jsonify({"success": False, "error": f"Insufficient historical data for {county}, {state}. Need at least 7 days."}), 400
-
-        features, recent_df = build_features_from_recent(recent_df)
         predictor = get_predictor(model_type)
         if predictor is None or predictor.model is None:
             return jsonify({"success": False, "error": f"{model_type.title()} model not loaded. Please train model first."}), 503
 
-        preds = iterative_forecast(predictor, model_type, recent_df, features, days, county, state)
+        # Same data, model and arguments on the same day give the same response
+        # (apart from its timestamp)
+        history_days = int(payload.get("history_days", 30))
+        cache = current_app.extensions["refresh_cache"]
+        cache_key = (source.version, predictor.model_version, county, state, model_type,
+                     days, history_days, datetime.utcnow().date())
+        cached = cache.get(cache_key)
+        if cached is not None:
+            log_event(logging.INFO, "Refresh served from cache", operation="prediction")
+            return current_app.response_class(_with_timestamp(cached), mimetype="application/json")
+
+        # One county slice feeds both the history payload and the model features
+        with span("data_slice"):
+            snapshot = source.get_county_snapshot(county, state)
+        if snapshot is None or len(snapshot.recent(30)) < 7:
+            return jsonify({"success": False, "error": f"Insufficient historical data for {county}, {state}. Need at least 7 days."}), 400
+
+        log_event(logging.INFO, "Refreshing historical data", operation="ingestion")
+        historical_future = submit_stage("data", timed("data_slice", snapshot.history), history_days)
+        log_event(logging.INFO, "Refreshing prediction", operation="prediction")
+        preds = run_stage("forecast", forecast_snapshot, predictor, model_type, snapshot, days)
+        historical_data = historical_future.result()
 
-        return jsonify({
+        response = jsonify({
             "success": True,
             "county": county,
             "state": state,
-            "timestamp": datetime.utcnow().isoformat(),
             "historical": {
                 "success": True,
                 "county": county,
@@ -90,6 +111,12 @@ def refresh_data():
                 }
             ),
         })
+        # Cached without the timestamp, which is added per response
+        body = response.get_data()
+        cache.put(cache_key, body)
+        return current_app.response_class(_with_timestamp(body), mimetype="application/json")
+    except PoolSaturated:
+        raise
     except Exception as e:
         logger().exception("Error refreshing data", extra={"operation": "ingestion"})
         return jsonify({"success": False, "error": str(e)}), 500
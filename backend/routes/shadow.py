@@ -0,0 +1,13 @@
+# backend/routes/shadow.py
+
+from flask import Blueprint, jsonify, current_app
+
+bp = Blueprint("shadow", __name__)
+
+@bp.get("/model/shadow")
+def get_shadow_report():
+    """Served vs candidate model errors from shadow evaluation (this process)"""
+    shadow = current_app.extensions.get("shadow")
+    if shadow is None:
+        return jsonify({"success": False, "error": "Shadow evaluation is off; set SHADOW_MODELS to enable it"}), 404
+    return jsonify({"success": True, **shadow.report()})
@@ -0,0 +1,271 @@
+"""
+Shadow evaluation of candidate models on live traffic
+Every served forecast is handed to a background worker with its predicted days
+and the unscaled base features of its first day. From those base features the
+worker replays each candidate's own recursive forecast, in the candidate's
+input layout and scaler. Each day feeds back the candidate's prediction, not
+the served model's, so at every horizon the pair compares two full
+recursions. Once the data source has the AQI of a forecast day (ingestion
+bumps its version), both errors are added to per-candidate, per-horizon totals.
+
+- The request side only does a put_nowait on a bounded queue. When the queue
+  is full the item is dropped and counted, so a slow or failing candidate never
+  delays or breaks a response.
+- Pending pairs are keyed by model, county, forecast day and horizon, so a
+  forecast requested repeatedly is scored once. They are capped too; the
+  oldest are evicted first.
+- Like the inference batcher, the worker thread is started lazily in each
+  (pre-forked) process (process_worker.py), and stats are per process.
+- A failing candidate is counted in `errors` and logged at most once per
+  ERROR_LOG_INTERVAL, with the number of failures since the last log line.
+"""
+import logging
+import pickle
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from feature_store import FEATURE_NAMES, advance_features, model_inputs
+from process_worker import ProcessWorker
+
+RESOLVE_INTERVAL = 5.0  # seconds between checks for new actuals while idle
+MAX_BATCH = 256  # queued forecasts replayed together, one predict call per candidate and day
+ERROR_LOG_INTERVAL = 60.0  # seconds between logged worker errors
+
+default_logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator:
+    """Score served forecasts with candidate models off the request path"""
+
+    def __init__(self, candidates, get_source, max_queue=1024, max_pending=50000, recent=200, logger=None):
+        """
+        Args:
+            candidates: {name: (model_type, model, scaler)}; model_type selects the input layout
+            get_source: Callable returning the current data source (or None)
+            logger: Where worker errors are logged (default: this module's logger)
+            max_queue: Forecasts waiting for the worker before new ones are dropped
+            max_pending: Pairs kept while waiting for actuals
+            recent: Resolved pairs kept for report()
+        """
+        self.candidates = candidates
+        self.get_source = get_source
+        self.max_queue = max_queue
+        self.max_pending = max_pending
+        self.logger = logger or default_logger
+
+        self._lock = threading.Lock()
+        self._worker = ProcessWorker(self._run, "shadow-evaluator", lambda: queue.Queue(maxsize=max_queue))
+        self._resolved_version = None
+
+        self._pending = OrderedDict()  # (served model, county, state, date, horizon) -> pair
+        self._totals = {}  # (served model, candidate, horizon) -> [n, served |e|, served e², cand |e|, cand e²]
+        self._recent = deque(maxlen=recent)
+        self.submitted = 0
+        self.dropped = 0
+        self.scored = 0
+        self.evicted = 0
+        self.unmatched = 0  # forecast days that passed without an actual
+        self.errors = 0
+        self._errors_logged = 0
+        self._last_error_log = None
+
+    # Request side
+    def submit(self, served_model, county, state, county_row, base_features, served):
+        """
+        Queue one served forecast; never blocks
+
+        Args:
+            base_features: Unscaled features of the first forecast day
+            served: [(forecast_date, predicted AQI)] for days 1, 2, ...
+        """
+        item = (served_model, county, state,
+                county_row.get("State Code", 1), county_row.get("County Code", 1),
+                {name: float(base_features[name]) for name in FEATURE_NAMES},
+                [(when, float(predicted)) for when, predicted in served])
+        try:
+            self._worker.queue().put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+        else:
+            with self._lock:
+                self.submitted += 1
+
+    # Worker side
+    def _run(self, items):
+        while True:
+            batch = []
+            try:
+                batch.append(items.get(timeout=RESOLVE_INTERVAL))
+                while len(batch) < MAX_BATCH:
+                    batch.append(items.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                if batch:
+                    self._score(batch)
+                self._resolve()
+            except Exception:
+                self._log_error()
+
+    def _log_error(self):
+        """Count the current exception; log it unless one was logged within ERROR_LOG_INTERVAL"""
+        with self._lock:
+            self.errors += 1
+            now = time.monotonic()
+            if self._last_error_log is not None and now - self._last_error_log < ERROR_LOG_INTERVAL:
+                return
+            since = self.errors - self._errors_logged
+            self._last_error_log, self._errors_logged = now, self.errors
+        self.logger.exception(f"Shadow evaluation failed (failures since the last report: {since})",
+                              extra={"operation": "prediction"})
+
+    def _score(self, batch):
+        """Replay every candidate's recursion for the batch, grouped by first forecast day"""
+        groups = {}
+        for item in batch:
+            groups.setdefault(np.datetime64(item[6][0][0], "D"), []).append(item)
+
+        pairs = []
+        for items in groups.values():
+            # Forecasts starting the same day share their dates; replay the longest
+            dates = [when for when, _ in max((item[6] for item in items), key=len)]
+            replayed = {name: self._replay(model_type, model, scaler, items, dates)
+                        for name, (model_type, model, scaler) in self.candidates.items()}
+            for i, (served_model, county, state, _, _, _, served) in enumerate(items):
+                for step, (when, predicted) in enumerate(served):
+                    key = (served_model, county, state, np.datetime64(when, "D"), step + 1)
+                    pairs.append((key, {
+                        "served": predicted,
+                        "candidates": {name: float(values[i, step]) for name, values in replayed.items()},
+                    }))
+
+        with self._lock:
+            for key, pair in pairs:
+                self._pending[key] = pair
+                self._pending.move_to_end(key)
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+                self.evicted += 1
+            self.scored += len(pairs)
+
+    @staticmethod
+    def _replay(model_type, model, scaler, items, dates):
+        """(len(items), len(dates)) recursive forecast of one candidate from the items' base features"""
+        features = {name: np.array([item[5][name] for item in items]) for name in FEATURE_NAMES}
+        state_codes = np.array([item[3] for item in items], dtype=np.float64)
+        county_codes = np.array([item[4] for item in items], dtype=np.float64)
+        out = np.empty((len(items), len(dates)))
+        for step, when in enumerate(dates):
+            X = model_inputs(model_type, features, state_codes, county_codes, when)
+            out[:, step] = model.predict(scaler.transform(X))
+            advance_features(features, out[:, step])
+        return out
+
+    def _resolve(self):
+        """Score pending pairs whose day now has data, once per data version"""
+        source = self.get_source()
+        if source is None or source.version == self._resolved_version:
+            return
+        self._resolved_version = source.version
+        with self._lock:
+            pending = list(self._pending.items())
+
+        resolved, unmatched = [], []
+        snapshots = {}
+        for key, pair in pending:
+            served_model, county, state, day, horizon = key
+            if (county, state) not in snapshots:
+                snapshots[(county, state)] = source.get_county_snapshot(county, state)
+            snapshot = snapshots[(county, state)]
+            if snapshot is None:
+                unmatched.append(key)
+                continue
+            last_day = np.datetime64(snapshot.frame["Date"].values[-1], "D")
+            if day > last_day:
+                continue  # not arrived yet
+            rows = snapshot.between(day, day)
+            actual = rows["AQI"].values[-1] if len(rows) else np.nan
+            if np.isnan(actual):
+                unmatched.append(key)
+            else:
+                resolved.append((key, pair, float(actual)))
+
+        with self._lock:
+            for key in unmatched:
+                if self._pending.pop(key, None) is not None:
+                    self.unmatched += 1
+            for key, pair, actual in resolved:
+                if self._pending.pop(key, None) is None:
+                    continue
+                served_model, county, state, day, horizon = key
+                served_error = pair["served"] - actual
+                for name, predicted in pair["candidates"].items():
+                    error = predicted - actual
+                    totals = self._totals.setdefault((served_model, name, horizon), [0, 0.0, 0.0, 0.0, 0.0])
+                    totals[0] += 1
+                    totals[1] += abs(served_error)
+                    totals[2] += served_error ** 2
+                    totals[3] += abs(error)
+                    totals[4] += error ** 2
+                self._recent.append({
+                    "served_model": served_model, "county": county, "state": state,
+                    "forecast_date": str(day), "horizon": horizon, "actual": actual,
+                    "served": pair["served"], "candidates": pair["candidates"],
+                })
+
+    # Reporting
+    def stats(self):
+        """Queue and pair counters"""
+        with self._lock:
+            return {
+                "candidates": len(self.candidates),
+                "submitted": self.submitted,
+                "dropped": self.dropped,
+                "queued": self._worker.qsize(),
+                "scored": self.scored,
+                "pending": len(self._pending),
+                "evicted": self.evicted,
+                "unmatched": self.unmatched,
+                "errors": self.errors,
+            }
+
+    def report(self):
+        """Served vs candidate MAE/RMSE per horizon, plus the latest resolved pairs"""
+        stats = self.stats()
+        with self._lock:
+            comparisons = []
+            for (served_model, name, horizon), (n, s_abs, s_sq, c_abs, c_sq) in sorted(self._totals.items()):
+                comparisons.append({
+                    "served_model": served_model,
+                    "candidate": name,
+                    "horizon": horizon,
+                    "n": n,
+                    "served_mae": s_abs / n,
+                    "served_rmse": (s_sq / n) ** 0.5,
+                    "candidate_mae": c_abs / n,
+                    "candidate_rmse": (c_sq / n) ** 0.5,
+                })
+            recent = list(self._recent)
+        return {"stats": stats, "comparisons": comparisons, "recent": recent,
+                "generated": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def parse_shadow_models(spec):
+    """'name=path,name=path' -> {name: path}"""
+    models = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, path = entry.partition("=")
+        models[name.strip()] = path.strip()
+    return models
+
+
+def load_candidate(path):
+    """(model_type, model, scaler) from a training bundle"""
+    with open(path, "rb") as f:
+        bundle = pickle.load(f)
+    return bundle.get("model_type", "balanced"), bundle["model"], bundle["scaler"]
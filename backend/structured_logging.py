@@ -0,0 +1,167 @@
+"""
+Structured application logging
+- The CLAP logger puts records on a bounded in-memory queue. A background
+  QueueListener thread formats them and does the file and console I/O, so
+  request threads never wait on the disk or on handler locks. When the queue
+  is full, records are dropped and counted rather than blocking the request.
+- High-volume INFO events can be sampled per operation (LOG_SAMPLE_RATES).
+  A sampled line carries "sample_rate" so counts can be scaled back up.
+  WARNING and above are never sampled.
+- JSON lines are assembled from pre-escaped string fragments instead of
+  json.dumps on a dict, with the timestamp rendered once per second.
+- Under gunicorn preload the listener thread does not survive the fork, so it
+  is restarted, with a fresh queue, in every worker.
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+import time
+from json.encoder import encode_basestring
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+_traceback_formatter = logging.Formatter()
+_active_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, operation, message (+ sample_rate, error)"""
+
+    def __init__(self):
+        super().__init__()
+        self._stamp = (None, None)  # (epoch second, rendered timestamp)
+
+    def format(self, record):
+        second = int(record.created)
+        cached_second, stamp = self._stamp
+        if cached_second != second:
+            stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(second))
+            self._stamp = (second, stamp)
+
+        line = (
+            f'{{"timestamp": "{stamp}", "level": "{record.levelname}", '
+            f'"operation": {encode_basestring(getattr(record, "operation", "general"))}, '
+            f'"message": {encode_basestring(record.getMessage())}'
+        )
+        sample_rate = getattr(record, "sample_rate", None)
+        if sample_rate is not None:
+            line += f', "sample_rate": {sample_rate:g}'
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += f', "error": {encode_basestring(record.exc_text)}'
+        return line + "}"
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener unformatted; drops them when the queue is full"""
+
+    def __init__(self, log_queue, listener_handlers):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.listener = _Listener(log_queue, *listener_handlers, respect_handler_level=True)
+
+    def prepare(self, record):
+        # Resolve the message and traceback now, while their objects are still
+        # current; all formatting happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def restart_listener(self):
+        """Fresh queue and writer thread; the parent's queue lock may be held at fork time"""
+        self.queue = self.listener.queue = queue.Queue(self.queue.maxsize)
+        self.listener._thread = None
+        self.listener.start()
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "queue_size": self.queue.maxsize, "dropped": self.dropped}
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room on a full queue so shutdown still flushes everything
+        self.queue.put(self._sentinel, timeout=5)
+
+
+def _restart_in_child():
+    if _active_handler is not None:
+        _active_handler.restart_listener()
+
+
+def _stop_listener():
+    if _active_handler is not None and _active_handler.listener._thread is not None:
+        _active_handler.listener.stop()
+
+
+os.register_at_fork(after_in_child=_restart_in_child)
+atexit.register(_stop_listener)
+
+
+def parse_sample_rates(spec):
+    """'validation=0.1,feature_generation=0.1' -> {"validation": 0.1, ...}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        operation, _, rate = item.partition("=")
+        rates[operation.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+def build_logger(log_file="logs/app.log", queue_size=10000):
+    global _active_handler
+    logger = logging.getLogger("CLAP")
+    logger.setLevel(logging.INFO)
+
+    os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+    file_handler = RotatingFileHandler(log_file, maxBytes=5_000_000, backupCount=3)
+    file_handler.setFormatter(JsonFormatter())
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+
+    # Building the app again (e.g. in tests) replaces the previous writer
+    _stop_listener()
+    handler = NonBlockingQueueHandler(queue.Queue(queue_size), [file_handler, console_handler])
+    handler.listener.start()
+    _active_handler = handler
+
+    logger.handlers = [handler]
+    logger.propagate = False
+    return logger
+
+
+def make_log_event(logger, sample_rates=None):
+    """
+    log_event(level, message, operation="general", **extra_kv) bound to logger
+
+    INFO and below for an operation in sample_rates are kept with that
+    probability; the check runs before any LogRecord is built.
+    """
+    sample_rates = sample_rates or {}
+
+    def log_event(level, message, operation="general", **extra_kv):
+        if not logger.isEnabledFor(level):
+            return
+        if level <= logging.INFO:
+            rate = sample_rates.get(operation, 1.0)
+            if rate < 1.0:
+                if random.random() >= rate:
+                    return
+                extra_kv["sample_rate"] = rate
+        logger.log(level, message, extra={"operation": operation, **extra_kv})
+
+    return log_event
+
+
+def log_pipeline_stats():
+    return _active_handler.stats() if _active_handler is not None else None
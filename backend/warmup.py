@@ -0,0 +1,119 @@
+"""
+Startup warm-up, run after the app is bound
+create_app() registers routes, pools and caches using only light imports and
+returns. The expensive steps run afterwards as a WarmUp:
+- data: load the CSV data source (imports pandas)
+- features: load the per-county feature store saved for this data version,
+  or build and save it (feature_store.py)
+- models: unpickle the models (imports lightgbm, scikit-learn, scipy)
+- scalers: load feature scalers and set up the inference batchers
+- caches: pre-render per-version bodies (counties list, categories, model metrics)
+- predict: a few real forecasts, so LightGBM's and pandas' first-call costs
+  are paid before the first user request
+- maps: the all-county map layer of every model (routes/map_layer.py)
+- shadow: load the candidate models of SHADOW_MODELS, if any (shadow.py)
+
+In "background" mode the steps run on a thread while the server already
+answers. Until they finish, /api requests other than health and metrics get
+503 with Retry-After, and /api/health reports progress. In "sync" mode
+create_app() returns only once warm-up is done. wsgi.py uses sync mode, so
+gunicorn's preloading master is fully loaded before it forks, and no warm-up
+thread has to survive the fork.
+
+A failing step is logged and recorded, and the remaining steps still run.
+The app is then ready but degraded, as a failed load was before.
+"""
+import logging
+import threading
+import time
+
+from flask import jsonify, request
+
+# Endpoints answered while warming up
+ALWAYS_AVAILABLE = ("health.health_check", "metrics.get_metrics")
+
+
+class WarmUp:
+    """Ordered startup steps, each a callable taking the app"""
+
+    def __init__(self, app, steps):
+        self.app = app
+        self.steps = list(steps)
+        self.current = None
+        self.completed = []
+        self.timings = {}  # step -> seconds
+        self.errors = {}  # step -> message
+        self.seconds = None
+        self._started = None
+        self._done = threading.Event()
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def run(self):
+        """Run every step in order on the calling thread"""
+        log_event = self.app.extensions["log_event"]
+        self._started = time.perf_counter()
+        with self.app.app_context():
+            for name, step in self.steps:
+                self.current = name
+                t0 = time.perf_counter()
+                try:
+                    step(self.app)
+                except Exception as e:
+                    self.app.extensions["logger"].exception(
+                        f"Warm-up step '{name}' failed", extra={"operation": "startup"}
+                    )
+                    self.errors[name] = str(e)
+                self.timings[name] = time.perf_counter() - t0
+                self.completed.append(name)
+        self.current = None
+        self.seconds = time.perf_counter() - self._started
+        self.app.extensions["metrics"].set_gauge("warmup_seconds", self.seconds)
+        log_event(logging.INFO, f"Warm-up finished in {self.seconds:.2f}s", operation="startup")
+        self._done.set()
+
+    def start(self):
+        """Run the steps on a background thread"""
+        threading.Thread(target=self.run, name="warm-up", daemon=True).start()
+
+    def wait(self, timeout=None):
+        """Block until warm-up has finished; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    def status(self):
+        elapsed = self.seconds
+        if elapsed is None and self._started is not None:
+            elapsed = time.perf_counter() - self._started
+        return {
+            "ready": self.ready,
+            "current_step": self.current,
+            "progress": len(self.completed) / len(self.steps) if self.steps else 1.0,
+            "seconds": elapsed,
+            "steps": {
+                name: {
+                    "done": name in self.timings,
+                    "seconds": self.timings.get(name),
+                    "error": self.errors.get(name),
+                }
+                for name, _ in self.steps
+            },
+        }
+
+
+def register_readiness(app, warmup):
+    """503 for API requests that need data or models until warm-up is done"""
+
+    @app.before_request
+    def require_ready():
+        if warmup.ready or not request.path.startswith("/api/") or request.endpoint in ALWAYS_AVAILABLE:
+            return None
+        response = jsonify({
+            "success": False,
+            "error": "Service is warming up, retry shortly",
+            "warmup": warmup.status(),
+        })
+        response.status_code = 503
+        response.headers["Retry-After"] = "1"
+        return response
@@ -0,0 +1,26 @@
+# backend/wsgi.py
+"""
+Production WSGI entry point for CLAP
+- Builds the app (data source, models, scalers) once at import time, with
+  warm-up run synchronously
+- With gunicorn's preload_app this happens in the master before forking,
+  so workers share the loaded pages copy-on-write
+
+Run from backend/:  gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import gc
+import os
+
+os.environ.setdefault("FLASK_ENV", "production")
+
+from app import create_app
+
+# Finish warm-up before gunicorn forks: a warm-up thread would not survive the
+# fork, and the loaded data and models are what the workers share
+app = create_app(warmup_mode="sync")
+
+# Move everything allocated so far out of the GC's tracked generations. Without
+# this the first collection in each worker touches every object header and
+# turns the shared pages into private copies.
+gc.collect()
+gc.freeze()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Compare the Flask development server with the preloaded gunicorn entry point
+Starts each server locally, drives the same dashboard request mix at fixed
+concurrency and reports requests per second, latency and memory per process.
+PSS/USS show how much of each worker's RSS is shared copy-on-write pages.
+
+    python benchmarks/compare_servers.py --duration 30 --concurrency 16 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import (start_server, stop_server, wait_ready, get_json, dashboard_mix,
+                     run_closed_loop, percentile, process_tree, memory_mb, write_results)
+
+
+def measure(mode, port, args):
+    proc = start_server(mode, port, workers=args.workers, threads=args.threads)
+    try:
+        ready_s = wait_ready(port, proc=proc)
+        counties = get_json(port, "/api/counties")["counties"][:args.counties]
+        mix = dashboard_mix(counties)
+
+        run_closed_loop(port, mix, args.concurrency, args.warmup)
+        start = time.perf_counter()
+        samples = run_closed_loop(port, mix, args.concurrency, args.duration)
+        elapsed = time.perf_counter() - start
+
+        latencies = [s[2] for s in samples if s[1] == 200]
+        processes = []
+        for pid in process_tree(proc.pid):
+            mem = memory_mb(pid)
+            if mem:
+                processes.append({"pid": pid, "role": "master" if pid == proc.pid else "worker", **mem})
+        serving = [p for p in processes if p["role"] == "worker"] or processes
+
+        return {
+            "mode": mode,
+            "ready_s": ready_s,
+            "requests": len(samples),
+            "errors": sum(1 for s in samples if s[1] != 200),
+            "rps": len(samples) / elapsed,
+            "p50_ms": (percentile(latencies, 50) or 0) * 1000,
+            "p99_ms": (percentile(latencies, 99) or 0) * 1000,
+            "processes": processes,
+            "rss_per_worker_mb": sum(p["rss"] for p in serving) / len(serving) if serving else None,
+            "pss_per_worker_mb": sum(p["pss"] for p in serving) / len(serving) if serving else None,
+            "uss_per_worker_mb": sum(p["uss"] for p in serving) / len(serving) if serving else None,
+        }
+    finally:
+        stop_server(proc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds per server")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before each run")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent client connections")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--counties", type=int, default=50, help="counties sampled by the request mix")
+    parser.add_argument("--port", type=int, default=5091)
+    args = parser.parse_args()
+
+    results = [measure(mode, args.port, args) for mode in ("dev", "gunicorn")]
+
+    print(f"{'server':<10}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}"
+          f"{'RSS/wkr':>10}{'PSS/wkr':>10}{'USS/wkr':>10}")
+    for r in results:
+        mem = [r[k] for k in ("rss_per_worker_mb", "pss_per_worker_mb", "uss_per_worker_mb")]
+        mem_cols = "".join(f"{m:>10.1f}" if m is not None else f"{'n/a':>10}" for m in mem)
+        print(f"{r['mode']:<10}{r['rps']:>9.1f}{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['errors']:>8}{mem_cols}")
+
+    path = write_results("compare_servers", {"args": vars(args), "results": results})
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic national daily_aqi_by_county dataset
+Writes one `daily_aqi_by_county_<year>.csv` per year with the same columns
+as the EPA files, for `--counties` counties over the `--years` years ending in
+2024 (the year the API serves). Series have a seasonal cycle, a weekly
+cycle, AR(1) noise and occasional pollution episodes, and categories follow
+the EPA AQI bounds. The output depends only on the arguments and the seed.
+
+    python benchmarks/generate_data.py --counties 3000 --years 2 --out /tmp/clap-data
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+LAST_YEAR = 2024
+COUNTIES_PER_STATE = 60
+PARAMETERS = np.array(["Ozone", "PM2.5", "PM10", "NO2", "CO", "SO2"])
+# (upper bound, name), as in Config.AQI_CATEGORIES
+CATEGORY_BOUNDS = [(50, "Good"), (100, "Moderate"), (150, "Unhealthy for Sensitive Groups"),
+                   (200, "Unhealthy"), (300, "Very Unhealthy"), (np.inf, "Hazardous")]
+
+
+def county_table(n_counties):
+    """State/county names and codes; FIPS-shaped, 60 counties per state with odd county codes"""
+    index = np.arange(n_counties)
+    state_code = 1 + index // COUNTIES_PER_STATE
+    county_code = 1 + 2 * (index % COUNTIES_PER_STATE)
+    return pd.DataFrame({
+        "State Name": [f"State{s}" for s in state_code],
+        "county Name": [f"County{c}" for c in county_code],
+        "State Code": state_code,
+        "County Code": county_code,
+        "Defining Site": [f"{s:02d}-{c:03d}-0001" for s, c in zip(state_code, county_code)],
+    })
+
+
+def aqi_series(rng, climate_rng, n_counties, n_days, day_of_year):
+    """(n_counties, n_days) int AQI matrix; climate_rng gives the same county climate every year"""
+    base = climate_rng.gamma(6.0, 7.0, size=(n_counties, 1))  # mostly 20-80
+    season_amp = climate_rng.uniform(5, 25, size=(n_counties, 1))
+    season_phase = climate_rng.uniform(0, 2 * np.pi, size=(n_counties, 1))
+    seasonal = season_amp * np.sin(2 * np.pi * day_of_year / 365.25 + season_phase)
+    weekly = rng.uniform(0, 6, size=(n_counties, 1)) * np.sin(2 * np.pi * np.arange(n_days) / 7)
+
+    # AR(1) noise, so lag features carry signal as in the real data
+    shocks = rng.normal(0, 7, size=(n_counties, n_days))
+    noise = np.empty_like(shocks)
+    noise[:, 0] = shocks[:, 0]
+    for day in range(1, n_days):
+        noise[:, day] = 0.7 * noise[:, day - 1] + shocks[:, day]
+
+    # Rare multi-day episodes (wildfire smoke, inversions)
+    onsets = (rng.random((n_counties, n_days)) < 0.004) * rng.uniform(60, 220, size=(n_counties, n_days))
+    episodes = onsets.copy()
+    for lag, decay in ((1, 0.6), (2, 0.35)):
+        episodes[:, lag:] += decay * onsets[:, :-lag]
+
+    return np.clip(np.rint(base + seasonal + weekly + noise + episodes), 0, 500).astype(np.int32)
+
+
+def categorize(aqi):
+    bounds = np.array([bound for bound, _ in CATEGORY_BOUNDS[:-1]])
+    names = np.array([name for _, name in CATEGORY_BOUNDS])
+    return names[np.searchsorted(bounds, aqi, side="left")]
+
+
+def generate_year(year, counties, seed):
+    """One year's rows for every county, county-major then date, like the EPA files"""
+    rng = np.random.default_rng([seed, year])
+    dates = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="D")
+    n_counties, n_days = len(counties), len(dates)
+    aqi = aqi_series(rng, np.random.default_rng(seed), n_counties, n_days, dates.dayofyear.to_numpy()).ravel()
+
+    repeat = lambda column: np.repeat(counties[column].to_numpy(), n_days)
+    return pd.DataFrame({
+        "State Name": repeat("State Name"),
+        "county Name": repeat("county Name"),
+        "State Code": repeat("State Code"),
+        "County Code": repeat("County Code"),
+        "Date": np.tile(dates.strftime("%Y-%m-%d").to_numpy(), n_counties),
+        "AQI": aqi,
+        "Category": categorize(aqi),
+        "Defining Parameter": PARAMETERS[rng.integers(0, len(PARAMETERS), size=aqi.size)],
+        "Defining Site": repeat("Defining Site"),
+        "Number of Sites Reporting": rng.integers(1, 6, size=aqi.size),
+    })
+
+
+def generate(out_dir, n_counties, n_years, seed=0):
+    """
+    Write the yearly CSVs
+
+    Returns:
+        dict with files, rows, bytes and seconds
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    counties = county_table(n_counties)
+    start = time.perf_counter()
+    files, rows, size = [], 0, 0
+    for year in range(LAST_YEAR - n_years + 1, LAST_YEAR + 1):
+        frame = generate_year(year, counties, seed)
+        path = os.path.join(out_dir, f"daily_aqi_by_county_{year}.csv")
+        frame.to_csv(path, index=False)
+        files.append(path)
+        rows += len(frame)
+        size += os.path.getsize(path)
+    return {"files": files, "rows": rows, "bytes": size, "seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counties", type=int, default=500)
+    parser.add_argument("--years", type=int, default=1, help=f"years ending in {LAST_YEAR}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="output directory")
+    args = parser.parse_args()
+    if args.counties < 1 or args.years < 1:
+        parser.error("--counties and --years must be at least 1")
+
+    info = generate(args.out, args.counties, args.years, args.seed)
+    print(f"Wrote {info['rows']:,} rows ({info['bytes'] / 1e6:.1f} MB) in {info['seconds']:.1f}s "
+          f"to {len(info['files'])} file(s) under {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
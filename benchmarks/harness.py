@@ -0,0 +1,271 @@
+"""
+Shared helpers for CLAP benchmarks: start a local server, drive HTTP load
+and read per-process memory. Memory figures come from /proc and are only
+available on Linux.
+"""
+import http.client
+import json
+import os
+import queue
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+# Server processes
+def start_server(mode, port, workers=2, threads=4, env=None):
+    """
+    Start the API locally
+
+    Args:
+        mode: "dev" (python app.py, Flask dev server) or "gunicorn" (wsgi:app, preloaded)
+        port: Port to bind on 127.0.0.1
+        workers: Gunicorn worker processes
+        threads: Gunicorn threads per worker
+        env: Extra environment variables
+    """
+    proc_env = {**os.environ, **(env or {})}
+    if mode == "dev":
+        # No reloader, so the measured process is the one serving requests
+        proc_env.update({"PORT": str(port), "FLASK_DEBUG": "False"})
+        cmd = [sys.executable, "app.py"]
+    elif mode == "gunicorn":
+        proc_env.update({"WEB_WORKERS": str(workers), "WEB_THREADS": str(threads)})
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+               "--bind", f"127.0.0.1:{port}", "--access-logfile", os.devnull, "wsgi:app"]
+    else:
+        raise ValueError(f"Unknown server mode: {mode}")
+    return subprocess.Popen(cmd, cwd=BACKEND, env=proc_env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_server(proc, timeout=10):
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def wait_ready(port, timeout=120, path="/api/health", proc=None):
+    """Poll until the server answers 200 on path; returns seconds waited"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode} before becoming ready")
+        try:
+            status, _ = request(port, "GET", path)
+            if status == 200:
+                return time.perf_counter() - start
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"Server on port {port} not ready after {timeout}s")
+
+
+# HTTP
+def request(port, method, path, body=None, conn=None, timeout=30):
+    """Send one request; returns (status, body bytes)"""
+    own = conn is None
+    conn = conn or http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        if own:
+            conn.close()
+
+
+def get_json(port, path):
+    status, body = request(port, "GET", path)
+    if status != 200:
+        raise RuntimeError(f"GET {path} returned {status}")
+    return json.loads(body)
+
+
+def dashboard_mix(counties, history_days=30):
+    """
+    Request mix a dashboard session produces: counties list, history,
+    predictions at all horizons and the combined refresh call.
+    Returns a list of (weight, factory) where factory() -> (name, method, path, body).
+    """
+    def pick():
+        return random.choice(counties)
+
+    def historical():
+        c = pick()
+        query = urlencode({"county": c["county"], "state": c["state"], "days": history_days})
+        return "historical", "GET", f"/api/aqi/historical?{query}", None
+
+    def predict():
+        c = pick()
+        body = {"county": c["county"], "state": c["state"], "model": "balanced",
+                "days": random.choice([1, 1, 1, 3, 7, 14])}
+        return "predict", "POST", "/api/aqi/predict", body
+
+    def refresh():
+        c = pick()
+        return "refresh", "POST", "/api/aqi/refresh", {"county": c["county"], "state": c["state"], "days": 1}
+
+    def counties_list():
+        return "counties", "GET", "/api/counties", None
+
+    return [(0.1, counties_list), (0.3, historical), (0.4, predict), (0.2, refresh)]
+
+
+def choose(mix):
+    r = random.random() * sum(weight for weight, _ in mix)
+    for weight, factory in mix:
+        r -= weight
+        if r <= 0:
+            return factory()
+    return mix[-1][1]()
+
+
+def run_closed_loop(port, mix, concurrency, duration):
+    """
+    Drive the server as hard as `concurrency` clients can for `duration` seconds
+
+    Returns:
+        List of (name, status, latency_s) samples
+    """
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local = []
+        while time.perf_counter() < deadline:
+            name, method, path, body = choose(mix)
+            t0 = time.perf_counter()
+            try:
+                status, _ = request(port, method, path, body, conn=conn)
+            except (OSError, http.client.HTTPException):
+                status = 0
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            local.append((name, status, time.perf_counter() - t0))
+        conn.close()
+        with lock:
+            samples.extend(local)
+
+    workers = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return samples
+
+
+def run_open_loop(port, mix, rps, duration, concurrency=32, samples=None):
+    """
+    Send `rps` requests per second on a fixed schedule for `duration` seconds,
+    whether or not earlier requests have finished
+
+    Latency is measured from each request's scheduled send time, so time spent
+    waiting for a free client counts too and a slow server cannot hide behind
+    a reduced request rate. Pass `samples` to watch progress from another thread.
+
+    Returns:
+        List of (name, status, latency_s, scheduled_s) samples; scheduled_s is
+        the offset from the start of the run, status 0 a connection failure
+    """
+    samples = [] if samples is None else samples
+    pending = queue.Queue()
+    start = time.perf_counter()
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            scheduled, (name, method, path, body) = item
+            try:
+                status, _ = request(port, method, path, body, conn=conn)
+            except (OSError, http.client.HTTPException):
+                status = 0
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            # list.append is atomic, so the caller may read samples meanwhile
+            samples.append((name, status, time.perf_counter() - scheduled, scheduled - start))
+        conn.close()
+
+    workers = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for t in workers:
+        t.start()
+    for i in range(int(rps * duration)):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put((scheduled, choose(mix)))
+    for _ in workers:
+        pending.put(None)
+    for t in workers:
+        t.join()
+    return samples
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+# Memory
+def process_tree(pid):
+    """pid followed by all descendant pids (Linux)"""
+    pids = [pid]
+    for child_pid in pids:
+        try:
+            with open(f"/proc/{child_pid}/task/{child_pid}/children") as f:
+                pids.extend(int(p) for p in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def memory_mb(pid):
+    """RSS, PSS and private (USS) memory of a process in MB, or None off Linux"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith(" "))
+    except OSError:
+        return None
+
+    def kb(name):
+        return int(fields.get(name, "0 kB").split()[0])
+
+    return {
+        "rss": kb("Rss") / 1024,
+        "pss": kb("Pss") / 1024,
+        "uss": (kb("Private_Clean") + kb("Private_Dirty")) / 1024,
+    }
+
+
+def write_results(name, results):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
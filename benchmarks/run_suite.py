@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Offline performance suite for releases
+Generates (or reuses) a synthetic daily_aqi_by_county dataset of
+`--counties` x `--years`, then measures against it:
+- cold start: a fresh interpreter importing the app, running create_app()
+  (bind) and waiting for warm-up to finish (ready)
+- CSVDataSource load time
+- historical and predict (1 and 7 days) latency through the Flask test client,
+  and one county's 14-day Monte Carlo export against MAX_DASHBOARD_RENDER_TIME
+- batch throughput: all-county next-day forecast, raw model rows/s and
+  concurrent predict requests/s
+- rolling-origin backtest time (14-day forecasts from the last 30 days)
+- training time and peak RSS of train_balanced_model.py
+Results are written as JSON to benchmarks/results/suite-<timestamp>.json.
+Nothing needs a server or the network. Training runs in a scratch directory,
+so models/ is never touched; serving uses the committed models.
+
+    python benchmarks/run_suite.py --counties 1000 --years 2
+    python benchmarks/run_suite.py --baseline benchmarks/results/suite-20250101-120000.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from importlib import metadata
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import ROOT, BACKEND, RESULTS_DIR, percentile, memory_mb, write_results
+from generate_data import LAST_YEAR, generate
+
+PACKAGES = ("flask", "numpy", "pandas", "scikit-learn", "lightgbm")
+
+# Run in a fresh interpreter (cwd=backend); prints its timings as JSON
+COLD_START = """
+import json, resource, time
+t0 = time.perf_counter()
+import app as app_module
+t1 = time.perf_counter()
+application = app_module.create_app()
+t2 = time.perf_counter()
+application.extensions["warmup"].wait()
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "create_app_s": t2 - t1,
+    "ready_s": t3 - t0,
+    "warmup_s": application.extensions["metrics"].gauges.get("warmup_seconds"),
+    "ingestion_s": application.extensions["metrics"].gauges.get("ingestion_seconds"),
+    "models_loaded": sorted(application.extensions.get("predictors", {})),
+}))
+"""
+
+
+def run_measured(cmd, cwd, env, stderr_path=None):
+    """Run a child process to completion; wall time, exit code, stdout and its peak RSS"""
+    stderr = open(stderr_path, "w") if stderr_path else subprocess.DEVNULL
+    try:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=stderr)
+        stdout = proc.stdout.read()
+        # wait4 rather than proc.wait(), for the child's resource usage
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        proc.stdout.close()
+    finally:
+        if stderr_path:
+            stderr.close()
+    return {"seconds": elapsed, "exit_code": proc.returncode,
+            "peak_rss_mb": usage.ru_maxrss / 1024, "stdout": stdout.decode(errors="replace")}
+
+
+def ensure_dataset(args):
+    if args.data_dir:
+        return os.path.abspath(args.data_dir), None
+    data_dir = os.path.join(RESULTS_DIR, "synthetic", f"{args.counties}x{args.years}-seed{args.seed}")
+    expected = [os.path.join(data_dir, f"daily_aqi_by_county_{year}.csv")
+                for year in range(LAST_YEAR - args.years + 1, LAST_YEAR + 1)]
+    if all(os.path.exists(path) for path in expected):
+        return data_dir, None
+    info = generate(data_dir, args.counties, args.years, args.seed)
+    print(f"Generated {info['rows']:,} rows in {info['seconds']:.1f}s under {data_dir}")
+    return data_dir, info["seconds"]
+
+
+def measure_cold_start(env, runs):
+    samples = []
+    for _ in range(runs):
+        result = run_measured([sys.executable, "-c", COLD_START], BACKEND, env)
+        if result["exit_code"] != 0:
+            raise RuntimeError(f"Cold start exited with code {result['exit_code']}")
+        samples.append({**json.loads(result["stdout"].strip().splitlines()[-1]),
+                        "total_s": result["seconds"], "peak_rss_mb": result["peak_rss_mb"]})
+    median = lambda key: statistics.median(s[key] for s in samples)
+    return {
+        "cold_start_total_s": median("total_s"),
+        "cold_start_import_s": median("import_s"),
+        "cold_start_create_app_s": median("create_app_s"),
+        "cold_start_ready_s": median("ready_s"),
+        "cold_start_warmup_s": median("warmup_s"),
+        "cold_start_ingestion_s": median("ingestion_s"),
+        "cold_start_peak_rss_mb": max(s["peak_rss_mb"] for s in samples),
+    }, samples[0]["models_loaded"]
+
+
+def measure_csv_load(data_dir, runs):
+    from data_source import CSVDataSource
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        source = CSVDataSource(data_dir)
+        seconds.append(time.perf_counter() - start)
+    return {"csv_load_s": statistics.median(seconds), "csv_rows": len(source.df)}
+
+
+def timed_requests(client, make_request, n, warmup):
+    """Latencies in seconds of n requests after warmup unmeasured ones; non-200s count as errors"""
+    latencies, errors = [], 0
+    for i in range(warmup + n):
+        method, path, body = make_request()
+        start = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        response.get_data()  # streamed bodies are produced while read
+        response.close()  # releases a streamed response's admission slot
+        elapsed = time.perf_counter() - start
+        if i < warmup:
+            continue
+        if response.status_code == 200:
+            latencies.append(elapsed)
+        else:
+            errors += 1
+    return latencies, errors
+
+
+def latency_metrics(name, latencies, errors):
+    return {
+        f"{name}_p50_ms": (percentile(latencies, 50) or 0) * 1000,
+        f"{name}_p99_ms": (percentile(latencies, 99) or 0) * 1000,
+        f"{name}_errors": errors,
+    }
+
+
+def measure_serving(app, args):
+    from config import Config
+    from routes.aqi_utils import forecast_all_counties
+    import numpy as np
+
+    rng = random.Random(args.seed)
+    client = app.test_client()
+    counties = client.get("/api/counties").get_json()["counties"]
+
+    def historical():
+        c = rng.choice(counties)
+        return "GET", "/api/aqi/historical?" + urlencode({"county": c["county"], "state": c["state"], "days": 30}), None
+
+    def predict(days):
+        def make():
+            c = rng.choice(counties)
+            return "POST", "/api/aqi/predict", {"county": c["county"], "state": c["state"],
+                                                "model": "balanced", "days": days}
+        return make
+
+    def distribution_export():
+        # One county's Monte Carlo export, the interactive use of kind=forecast&paths=N
+        c = rng.choice(counties)
+        return "GET", "/api/export?" + urlencode({"kind": "forecast", "days": 14, "paths": Config.MONTE_CARLO_PATHS,
+                                                  "county": c["county"], "state": c["state"]}), None
+
+    metrics = {}
+    for name, make in (("historical", historical), ("predict_1d", predict(1)), ("predict_7d", predict(7)),
+                       ("distribution_export_14d", distribution_export)):
+        metrics.update(latency_metrics(name, *timed_requests(client, make, args.requests, args.warmup)))
+    metrics["distribution_export_14d_within_budget"] = (
+        metrics["distribution_export_14d_p99_ms"] <= Config.MAX_DASHBOARD_RENDER_TIME * 1000
+    )
+
+    # Concurrent 1-day predictions, one test client per thread (batched if INFERENCE_BATCHING is on)
+    # More threads than one worker admits would measure load shedding, not batching
+    n_threads = args.threads or Config.ADMISSION_THREAD_BUDGET
+    per_thread = max(1, args.requests // n_threads)
+    results = []
+
+    def worker():
+        results.append(timed_requests(app.test_client(), predict(1), per_thread, 0))
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    metrics["predict_concurrent_rps"] = per_thread * n_threads / elapsed
+    metrics["predict_concurrent_errors"] = sum(errors for _, errors in results)
+
+    predictor = app.extensions["predictors"]["balanced"]
+    with app.app_context():
+        forecast_date = datetime.utcnow().date() + timedelta(days=1)  # as the map layer does
+        seconds = []
+        for _ in range(3):
+            start = time.perf_counter()
+            snapshots, _ = forecast_all_counties(predictor, "balanced", forecast_date)
+            seconds.append(time.perf_counter() - start)
+    metrics["forecast_all_counties_s"] = statistics.median(seconds)
+    metrics["forecast_all_counties_per_s"] = len(snapshots) / metrics["forecast_all_counties_s"]
+
+    model = predictor.model
+    n_features = model.n_features_in_ if hasattr(model, "n_features_in_") else model.num_feature()
+    X = np.random.default_rng(args.seed).normal(size=(args.batch_rows, n_features))
+    predictor.predict_values(X[:10])
+    start = time.perf_counter()
+    predictor.predict_values(X)
+    metrics["model_rows_per_s"] = args.batch_rows / (time.perf_counter() - start)
+    return metrics
+
+
+def measure_backtest(app, args):
+    """Backtest of the served balanced model: 14-day forecasts from each of the last 30 origins"""
+    from backtest import CountySeries, default_origins, run_backtest
+    import numpy as np
+
+    series = CountySeries(app.extensions["data_source"])
+    origins = default_origins(series, start=series.last_day - np.timedelta64(30, "D"))
+    start = time.perf_counter()
+    scored = run_backtest(app.extensions["predictors"]["balanced"].model, app.extensions["scalers"]["balanced"],
+                          "balanced", series, origins=origins, workers=args.backtest_workers)
+    elapsed = time.perf_counter() - start
+    return {"backtest_s": elapsed, "backtest_origins": len(origins), "backtest_forecasts_per_s": len(scored) / elapsed}
+
+
+def measure_training(data_dir, scratch, env):
+    """Full retrain of the balanced model on the dataset, in a scratch copy of the layout it expects"""
+    train_dir = os.path.join(scratch, "train")
+    os.makedirs(os.path.join(train_dir, "models"), exist_ok=True)
+    data_link = os.path.join(train_dir, "data")
+    if os.path.islink(data_link):
+        os.unlink(data_link)
+    os.symlink(data_dir, data_link)
+    result = run_measured([sys.executable, os.path.join(ROOT, "train_balanced_model.py"), "full", "--no-cache"],
+                          train_dir, env, stderr_path=os.path.join(scratch, "train.stderr.log"))
+    if result["exit_code"] != 0:
+        raise RuntimeError(f"Training exited with code {result['exit_code']}; "
+                           f"see {os.path.join(scratch, 'train.stderr.log')}")
+    return {"training_s": result["seconds"], "training_peak_rss_mb": result["peak_rss_mb"]}
+
+
+def environment():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {"git_revision": revision, "python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "packages": versions}
+
+
+def compare(baseline, metrics):
+    print(f"\n{'metric':<32}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, value in metrics.items():
+        old = baseline.get(name)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+            continue
+        change = f"{(value - old) / old * 100:+.1f}%" if old else ""
+        print(f"{name:<32}{old:>12.3f}{value:>12.3f}{change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counties", type=int, default=500, help="synthetic counties")
+    parser.add_argument("--years", type=int, default=1, help=f"synthetic years ending in {LAST_YEAR}")
+    parser.add_argument("--seed", type=int, default=0, help="data and request sampling seed")
+    parser.add_argument("--data-dir", help="use existing CSVs (e.g. data/) instead of synthetic data")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="threads for concurrent predictions (default: ADMISSION_THREAD_BUDGET)")
+    parser.add_argument("--batch-rows", type=int, default=50_000, help="rows for the raw model throughput")
+    parser.add_argument("--backtest-workers", type=int, default=None,
+                        help="backtest worker processes (default: CPU count)")
+    parser.add_argument("--cold-runs", type=int, default=3, help="cold starts (median reported)")
+    parser.add_argument("--skip-training", action="store_true", help="leave out the training run")
+    parser.add_argument("--baseline", help="earlier suite results to compare against")
+    args = parser.parse_args()
+    if args.counties < 1 or args.years < 1:
+        parser.error("--counties and --years must be at least 1")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["metrics"]
+
+    data_dir, generate_s = ensure_dataset(args)
+    scratch = os.path.join(RESULTS_DIR, "scratch")
+    os.makedirs(scratch, exist_ok=True)
+    # The app under test reads the dataset and logs to the scratch directory
+    env = {**os.environ, "DATA_PATH": data_dir, "LOG_FILE": os.path.join(scratch, "app.log")}
+    os.environ.update(DATA_PATH=env["DATA_PATH"], LOG_FILE=env["LOG_FILE"])
+
+    metrics = {}
+    cold, models_loaded = measure_cold_start(env, args.cold_runs)
+    metrics.update(cold)
+    print(f"Cold start {cold['cold_start_total_s']:.2f}s (import {cold['cold_start_import_s']:.2f}s, "
+          f"bound after {cold['cold_start_import_s'] + cold['cold_start_create_app_s']:.2f}s, "
+          f"ready after {cold['cold_start_ready_s']:.2f}s)")
+    if "balanced" not in models_loaded:
+        raise SystemExit("The balanced model is not available; train it before running the suite")
+
+    # In-process measurements, with the app's relative paths resolved as in production
+    os.chdir(BACKEND)
+    sys.path.insert(0, BACKEND)
+    metrics.update(measure_csv_load(data_dir, 3))
+    print(f"CSV load {metrics['csv_load_s']:.2f}s for {metrics['csv_rows']:,} rows")
+
+    import structured_logging
+    from app import create_app
+    app = create_app()
+    app.extensions["warmup"].wait()
+    # Keep the per-request console lines out of the report
+    for handler in structured_logging._active_handler.listener.handlers:
+        if type(handler).__name__ == "StreamHandler":
+            handler.setStream(open(os.devnull, "w"))
+    metrics.update(measure_serving(app, args))
+    metrics["serving_rss_mb"] = (memory_mb(os.getpid()) or {}).get("rss")
+    metrics["suite_peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    for name in ("historical", "predict_1d", "predict_7d", "distribution_export_14d"):
+        print(f"{name:<12} p50 {metrics[name + '_p50_ms']:7.2f} ms  p99 {metrics[name + '_p99_ms']:7.2f} ms")
+    print(f"Concurrent predict {metrics['predict_concurrent_rps']:.0f} req/s, "
+          f"all-county forecast {metrics['forecast_all_counties_per_s']:.0f} counties/s, "
+          f"model {metrics['model_rows_per_s']:,.0f} rows/s")
+
+    metrics.update(measure_backtest(app, args))
+    print(f"Backtest {metrics['backtest_s']:.2f}s for {metrics['backtest_origins']} origins "
+          f"({metrics['backtest_forecasts_per_s']:,.0f} scored forecasts/s)")
+
+    if not args.skip_training:
+        metrics.update(measure_training(data_dir, scratch, env))
+        print(f"Training {metrics['training_s']:.1f}s, peak RSS {metrics['training_peak_rss_mb']:.0f} MB")
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "dataset": {"data_dir": data_dir, "synthetic": not args.data_dir, "counties": args.counties,
+                    "years": args.years, "seed": args.seed, "generate_s": generate_s},
+        "settings": {key: value for key, value in vars(args).items() if key not in ("baseline", "data_dir")},
+        "metrics": metrics,
+    }
+    path = write_results("suite", results)
+    print(f"Results written to {path}")
+    if baseline is not None:
+        compare(baseline, metrics)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
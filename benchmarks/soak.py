@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Load and soak test against a locally started server, with performance budgets
+Replays the dashboard request mix (counties, historical, predict, refresh)
+open-loop at a fixed `--rps` for `--duration`. It reports latency, errors and
+server memory per window and fails (exit code 1) when:
+- the p99 of any request type exceeds Config.MAX_DASHBOARD_RENDER_TIME
+- the success ratio, overall or in any window, falls below
+  Config.RELIABILITY_THRESHOLD (5xx and connection failures count as errors)
+- server memory (PSS summed over the process tree) keeps growing after
+  warm-up by more than --max-growth-mb over the run
+
+    python benchmarks/soak.py --rps 20 --duration 2h --server gunicorn --workers 2
+    python benchmarks/soak.py --rps 50 --duration 5m --data-dir benchmarks/results/synthetic/1000x2-seed0
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import (BACKEND, RESULTS_DIR, start_server, stop_server, wait_ready, get_json, dashboard_mix,
+                     run_open_loop, percentile, process_tree, memory_mb, write_results)
+
+sys.path.insert(0, BACKEND)
+from config import Config
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    """'90', '90s', '30m' or '2h' -> seconds"""
+    unit = value[-1].lower()
+    if unit in DURATION_UNITS:
+        return float(value[:-1]) * DURATION_UNITS[unit]
+    return float(value)
+
+
+def is_error(status):
+    return status == 0 or status >= 500
+
+
+def summarize(samples):
+    """Per request type and overall: count, errors, success ratio, p50/p99 ms"""
+    groups = {"all": samples}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    summary = {}
+    for name, group in groups.items():
+        latencies = [s[2] for s in group]
+        errors = sum(1 for s in group if is_error(s[1]))
+        summary[name] = {
+            "requests": len(group),
+            "errors": errors,
+            "success_ratio": (len(group) - errors) / len(group) if group else None,
+            "p50_ms": (percentile(latencies, 50) or 0) * 1000,
+            "p99_ms": (percentile(latencies, 99) or 0) * 1000,
+        }
+    return summary
+
+
+def server_memory_mb(pid):
+    """PSS and RSS summed over the server and its workers; PSS counts shared pages once"""
+    total = {"pss": 0.0, "rss": 0.0}
+    for child in process_tree(pid):
+        mem = memory_mb(child)
+        if mem:
+            total["pss"] += mem["pss"]
+            total["rss"] += mem["rss"]
+    return total
+
+
+def memory_growth(memory, warmup_s):
+    """Least-squares PSS slope after warm-up; returns (MB per hour, MB over the fitted span)"""
+    points = [(m["t"], m["pss"]) for m in memory if m["t"] >= warmup_s]
+    if len(points) < 3:
+        return None, None
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_v = sum(v for _, v in points) / n
+    var_t = sum((t - mean_t) ** 2 for t, _ in points)
+    if var_t == 0:
+        return None, None
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in points) / var_t  # MB per second
+    return slope * 3600, slope * (points[-1][0] - points[0][0])
+
+
+def check_budgets(summary, windows, growth_mb, args):
+    violations = []
+    for name, stats in summary.items():
+        if stats["p99_ms"] > args.p99_budget * 1000:
+            violations.append(f"{name} p99 {stats['p99_ms']:.0f} ms > {args.p99_budget * 1000:.0f} ms")
+    overall = summary["all"]["success_ratio"]
+    if overall is not None and overall < args.min_success:
+        violations.append(f"success ratio {overall:.4f} < {args.min_success}")
+    for window in windows:
+        ratio = window["summary"]["all"]["success_ratio"]
+        if ratio is not None and ratio < args.min_success:
+            violations.append(f"window at {window['end_s']:.0f}s: success ratio {ratio:.4f} < {args.min_success}")
+    if growth_mb is not None and growth_mb > args.max_growth_mb:
+        violations.append(f"memory grew {growth_mb:.1f} MB after warm-up > {args.max_growth_mb} MB")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=20, help="target requests per second")
+    parser.add_argument("--duration", default="10m", help="run length, e.g. 600, 30m, 4h")
+    parser.add_argument("--server", choices=["dev", "gunicorn"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--concurrency", type=int, default=64, help="max requests in flight from the client")
+    parser.add_argument("--data-dir", help="CSV directory for the server (default: data/)")
+    parser.add_argument("--counties", type=int, default=200, help="counties sampled by the request mix")
+    parser.add_argument("--window", default="1m", help="reporting window")
+    parser.add_argument("--memory-every", default="5s", help="memory sampling interval")
+    parser.add_argument("--memory-warmup", default=None,
+                        help="ignore memory before this point (default: 10%% of the run, at least 30s)")
+    parser.add_argument("--max-growth-mb", type=float, default=50, help="allowed PSS growth after warm-up")
+    parser.add_argument("--p99-budget", type=float, default=Config.MAX_DASHBOARD_RENDER_TIME,
+                        help="p99 seconds per request type (default: MAX_DASHBOARD_RENDER_TIME)")
+    parser.add_argument("--min-success", type=float, default=Config.RELIABILITY_THRESHOLD,
+                        help="minimum success ratio (default: RELIABILITY_THRESHOLD)")
+    parser.add_argument("--port", type=int, default=5093)
+    args = parser.parse_args()
+
+    duration = parse_duration(args.duration)
+    window_s = parse_duration(args.window)
+    memory_every = parse_duration(args.memory_every)
+    warmup_s = parse_duration(args.memory_warmup) if args.memory_warmup else max(30.0, duration * 0.1)
+
+    scratch = os.path.join(RESULTS_DIR, "scratch")
+    os.makedirs(scratch, exist_ok=True)
+    # Keep hours of request logs out of backend/logs
+    env = {"LOG_FILE": os.path.join(scratch, "soak-app.log")}
+    if args.data_dir:
+        env["DATA_PATH"] = os.path.abspath(args.data_dir)
+
+    proc = start_server(args.server, args.port, workers=args.workers, threads=args.threads, env=env)
+    try:
+        ready_s = wait_ready(args.port, proc=proc)
+        counties = get_json(args.port, "/api/counties")["counties"][:args.counties]
+        mix = dashboard_mix(counties)
+        print(f"{args.server} ready in {ready_s:.1f}s; {args.rps:g} req/s for {duration:.0f}s")
+
+        samples, memory, windows = [], [], []
+        load = threading.Thread(target=run_open_loop, daemon=True,
+                                args=(args.port, mix, args.rps, duration, args.concurrency, samples))
+        start = time.perf_counter()
+        load.start()
+
+        next_memory, next_window, reported = 0.0, window_s, 0
+        while load.is_alive():
+            load.join(timeout=min(next_memory, next_window) - (time.perf_counter() - start))
+            now = time.perf_counter() - start
+            if proc.poll() is not None:
+                raise RuntimeError(f"Server exited with code {proc.returncode} during the run")
+            if now >= next_memory or not load.is_alive():
+                memory.append({"t": now, **server_memory_mb(proc.pid)})
+                next_memory += memory_every
+            if now >= next_window or not load.is_alive():
+                count = len(samples)
+                summary = summarize(samples[reported:count])
+                reported = count
+                windows.append({"end_s": now, "summary": summary, "pss_mb": memory[-1]["pss"]})
+                stats = summary["all"]
+                print(f"[{now:7.0f}s] {stats['requests']:6d} req  {stats['errors']:4d} err  "
+                      f"p50 {stats['p50_ms']:7.1f} ms  p99 {stats['p99_ms']:7.1f} ms  PSS {memory[-1]['pss']:7.1f} MB")
+                next_window += window_s
+        elapsed = time.perf_counter() - start
+
+        server_metrics = get_json(args.port, "/api/metrics?format=json")
+    finally:
+        stop_server(proc)
+
+    summary = summarize(samples)
+    growth_per_hour, growth_mb = memory_growth(memory, warmup_s)
+    violations = check_budgets(summary, windows, growth_mb, args)
+
+    print(f"\n{'request':<12}{'count':>8}{'errors':>8}{'success':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, stats in sorted(summary.items()):
+        print(f"{name:<12}{stats['requests']:>8}{stats['errors']:>8}{stats['success_ratio'] or 0:>10.4f}"
+              f"{stats['p50_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+    print(f"Achieved {len(samples) / elapsed:.1f} req/s of {args.rps:g} target")
+    if growth_mb is not None:
+        print(f"Memory after warm-up: {growth_per_hour:+.1f} MB/h, {growth_mb:+.1f} MB over the run")
+    else:
+        print("Too few memory samples after warm-up to check growth")
+
+    path = write_results("soak", {
+        "settings": {**vars(args), "duration_s": duration},
+        "budgets": {"p99_s": args.p99_budget, "min_success": args.min_success, "max_growth_mb": args.max_growth_mb},
+        "achieved_rps": len(samples) / elapsed,
+        "summary": summary,
+        "windows": windows,
+        "memory": memory,
+        "memory_growth_mb_per_hour": growth_per_hour,
+        "memory_growth_mb": growth_mb,
+        "server_metrics": server_metrics,
+        "violations": violations,
+    })
+    print(f"Results written to {path}")
+
+    if violations:
+        print("\nFAILED budgets:")
+        for violation in violations:
+            print(f"  - {violation}")
+        return 1
+    print("All budgets met")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
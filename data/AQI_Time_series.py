@@ -1,43 +1,189 @@
-#!/usr/bin env python3
+#!/usr/bin/env python3
 """
 Data Pipeline for CSV Ingestion,
+Encodes the raw EPA daily AQI CSV for the prototype model: one-hot encodes
+the defining parameter and adds AQI lag features computed within each county.
+
+The CSV is read in chunks (per-county history is carried across chunk
+boundaries) and written as typed .npy columns that train_prototype_model.py
+memory-maps. Run with --compare to time the legacy in-memory script against
+the chunked encoder on the same input.
 """
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
 
 import numpy as np
 import pandas as pd
 
-# Read raw CSV for data ingestion
-df = pd.read_csv('daily_aqi_by_county_2024.csv', parse_dates=['Date'], index_col='Date')
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DATA_DIR, '..', 'backend'))
+from columnar import write_columns, concat_columns, read_manifest
+from data_pipeline import stream_county_chunks, DEFAULT_CHUNK_ROWS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INPUT = os.path.join(DATA_DIR, 'daily_aqi_by_county_2024.csv')
+DEFAULT_OUTPUT = os.path.join(DATA_DIR, 'encoded_dataset')
+
+# One-hot categories are fixed up front so every chunk produces the same columns
+DEFINING_PARAMETERS = ['CO', 'NO2', 'Ozone', 'PM10', 'PM2.5']
+LAGS = [1, 3, 7]
+
+INPUT_COLUMNS = ['State Code', 'County Code', 'Date', 'AQI', 'Defining Parameter']
+DUMMY_COLUMNS = [f"Defining Parameter_{param}" for param in DEFINING_PARAMETERS]
+LAG_COLUMNS = [f"AQI_lag{lag}" for lag in LAGS]
+
+
+def encode_chunk(frame):
+    """
+    Encode a frame sorted by county and date
+
+    Lags are shifted within each county so values never bleed between counties.
+    """
+    grouped = frame.groupby(['State Code', 'County Code'], sort=False)['AQI']
+    for lag, col in zip(LAGS, LAG_COLUMNS):
+        frame[col] = grouped.shift(lag)
+
+    for param, col in zip(DEFINING_PARAMETERS, DUMMY_COLUMNS):
+        frame[col] = (frame['Defining Parameter'] == param).astype(np.uint8)
+    return frame
+
+
+def _typed_columns(encoded):
+    columns = {
+        'Date': encoded['Date'].values.astype('datetime64[D]'),
+        'State Code': encoded['State Code'].values.astype(np.int16),
+        'County Code': encoded['County Code'].values.astype(np.int16),
+        'AQI': encoded['AQI'].values.astype(np.int16),
+    }
+    for col in DUMMY_COLUMNS:
+        columns[col] = encoded[col].values
+    for col in LAG_COLUMNS:
+        # AQI is integral, so float32 holds the lags exactly (NaN where history is short)
+        columns[col] = encoded[col].values.astype(np.float32)
+    return columns
+
+
+def encode_dataset(input_path=DEFAULT_INPUT, output_path=DEFAULT_OUTPUT, chunksize=DEFAULT_CHUNK_ROWS):
+    """
+    Encode a raw EPA daily AQI CSV into a typed columnar dataset
+
+    Args:
+        input_path: Raw daily_aqi_by_county CSV
+        output_path: Output directory (memory-mappable .npy columns)
+        chunksize: Rows read per chunk
+
+    Returns:
+        Number of rows written
+    """
+    parts_dir = tempfile.mkdtemp(prefix='encoded-parts-', dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        parts = []
+        chunks = stream_county_chunks([input_path], encode_chunk, history_rows=max(LAGS),
+                                      chunksize=chunksize, usecols=INPUT_COLUMNS)
+        for i, encoded in enumerate(chunks):
+            unknown = ~encoded['Defining Parameter'].isin(DEFINING_PARAMETERS)
+            if unknown.any():
+                logger.warning(f"{int(unknown.sum())} rows with unknown defining parameter "
+                               f"{sorted(encoded.loc[unknown, 'Defining Parameter'].unique())}")
+            part = os.path.join(parts_dir, f"part-{i:05d}")
+            write_columns(part, _typed_columns(encoded))
+            parts.append(part)
+
+        return concat_columns(parts, output_path, meta={'source': os.path.basename(input_path)})
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def encode_dataset_legacy(input_path=DEFAULT_INPUT, output_csv=None):
+    """Original in-memory encoding (national shift(7), CSV output), kept for comparison"""
+    # Read raw CSV for data ingestion
+    df = pd.read_csv(input_path, parse_dates=['Date'], index_col='Date')
+
+    # Sort rows by descending date
+    df = df.sort_index(ascending=False)
+
+    # Remove unused columns to simplify dataset
+    df = df.drop(columns=['Defining Site', 'Number of Sites Reporting'])
+
+    # One-hot encoding for Defining_Parameter categories
+    df_encoded = pd.get_dummies(df, columns=["Defining Parameter"], drop_first=False)
+    # Prefix-match
+    dummy_cols = [col for col in df_encoded.columns if col.startswith("Defining Parameter_")]
+
+    df_encoded[dummy_cols] = df_encoded[dummy_cols].astype(int)
+
+    # Generate lag features
+    df_encoded["AQI_lag7"] = df_encoded["AQI"].shift(7)
+
+    # Drop location data
+    df_encoded = df_encoded.drop(columns=['State Name', 'county Name', 'Category'])
+
+    # Save feature-engineered dataset to CSV for model training
+    df_encoded.to_csv(output_csv or os.path.join(DATA_DIR, 'encoded_dataset.csv'), index=True)
+    return df_encoded
+
+
+def _dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(path) for name in files)
+
 
-# DataFrame (df) to define location features
-df['Defining Parameter'].unique()
-df['State Name'].unique()
-df['county Name'].unique()
-df.info()
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
 
-# Sort rows by descending date
-df = df.sort_index(ascending=False)
 
-# Remove unused columns to simplify dataset
-df = df.drop(columns=['Defining Site', 'Number of Sites Reporting'])
-df['Defining Parameter'].unique()
+def compare(input_path=DEFAULT_INPUT, chunksize=DEFAULT_CHUNK_ROWS):
+    """Measure runtime and output size of the legacy script against the chunked encoder"""
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_csv = os.path.join(tmp, 'encoded_dataset.csv')
+        start = time.perf_counter()
+        legacy = encode_dataset_legacy(input_path, legacy_csv)
+        legacy_s = time.perf_counter() - start
 
-# One-hot encoding for Defining_Parameter categories
-df_encoded = pd.get_dummies(df, columns=["Defining Parameter"], drop_first=False)
-# Prefix-match
-dummy_cols = [col for col in df_encoded.columns if col.startswith("Defining Parameter_")]
+        columnar_dir = os.path.join(tmp, 'encoded_dataset')
+        start = time.perf_counter()
+        rows = encode_dataset(input_path, columnar_dir, chunksize=chunksize)
+        chunked_s = time.perf_counter() - start
 
-df_encoded[dummy_cols] = df_encoded[dummy_cols].astype(int)
+        # How many legacy lag7 values came from a different county
+        key = legacy['State Code'].astype(np.int64) * 1000 + legacy['County Code']
+        bled = int((key.shift(7) != key)[legacy['AQI_lag7'].notna()].sum())
 
-# Select target variable (AQI) to generate lag features from 
-cols_to_lag = ["AQI"]
+        print(f"Input: {input_path} ({_dir_size(input_path) / 1e6:.1f} MB, {rows} rows)")
+        print(f"  legacy   {legacy_s:7.2f} s  {_dir_size(legacy_csv) / 1e6:8.1f} MB  (CSV)")
+        print(f"  chunked  {chunked_s:7.2f} s  {_dir_size(columnar_dir) / 1e6:8.1f} MB  "
+              f"({len(read_manifest(columnar_dir)['columns'])} typed columns)")
+        print(f"  legacy AQI_lag7 values taken from another county: {bled}")
+        peak = _peak_rss_mb()
+        if peak is not None:
+            print(f"  peak RSS of this process: {peak:.0f} MB (includes the legacy run)")
 
-# Generate lag features
-for col in cols_to_lag:
-    df_encoded[f"{col}_lag7"] = df_encoded[col].shift(7)
 
-# Drop location data 
-df_encoded = df_encoded.drop(columns=['State Name', 'county Name', 'Category'])
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Encode the daily AQI CSV for prototype training')
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='raw daily_aqi_by_county CSV')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='output columnar directory')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_ROWS, help='rows read per chunk')
+    parser.add_argument('--compare', action='store_true',
+                        help='measure the legacy script against the chunked encoder instead of encoding')
+    args = parser.parse_args()
 
-# Save feature-engineered dataset to CSV for model training
-df_encoded.to_csv("encoded_dataset.csv", index=True)
\ No newline at end of file
+    if args.compare:
+        compare(args.input, args.chunksize)
+    else:
+        n = encode_dataset(args.input, args.output, args.chunksize)
+        print(f"Encoded {n} rows to {args.output}")
@@ -1,4 +1,4 @@
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import Select from "./components/Select";
 import Spinner from "./components/Spinner";
 import ErrorAlert from "./components/ErrorAlert";
@@ -12,6 +12,7 @@ import {
   getCounties,
   getHistorical,
   postPredict,
+  streamPredict,
   getModelMetrics,
 } from "./lib/api";
 import clapLogo from "./assets/clap_logo.png";
@@ -28,6 +29,7 @@ export default function App() {
 
   const [history, setHistory] = useState([]);
   const [prediction, setPrediction] = useState(null);
+  const streamRef = useRef(null);
   const [metrics, setMetrics] = useState(null);
   const [activeSelection, setActiveSelection] = useState(null);
 
@@ -99,24 +101,47 @@ export default function App() {
       catch { setErr("Invalid county selection"); return;}
     }
     if (!sel) return setErr("Please select a county first");
+    // A new refresh replaces any forecast still streaming
+    streamRef.current?.cancel();
+    streamRef.current = null;
     try {
       setErr("");
       setLoading(true);
       const { county, state } = sel;
-      const [hist, pred] = await Promise.all([
-        getHistorical({ county, state, days: 30 }),
-        postPredict({ county, state, model: modelKey, days: forecastDays }),
-      ]);
-      setHistory(hist);
-      setPrediction(pred);
-      setActiveSelection({ county, state});
+      if (forecastDays === 1) {
+        const [hist, pred] = await Promise.all([
+          getHistorical({ county, state, days: 30 }),
+          postPredict({ county, state, model: modelKey, days: forecastDays }),
+        ]);
+        setHistory(hist);
+        setPrediction(pred);
+        setActiveSelection({ county, state});
+      } else {
+        // Multi-day: draw each day as soon as the server computes it
+        const stream = streamPredict({
+          county, state, model: modelKey, days: forecastDays,
+          onPrediction: (_, predictions) => {
+            setPrediction({ forecast_days: forecastDays, predictions });
+            setActiveSelection({ county, state });
+          },
+        });
+        streamRef.current = stream;
+        const [hist] = await Promise.all([
+          getHistorical({ county, state, days: 30 }),
+          stream.done,
+        ]);
+        setHistory(hist);
+      }
     } catch (e) {
+      // Superseded by a newer refresh, which now owns the spinner
+      if (e.name === "AbortError") return;
       setErr(e.message);
-    } finally {
-      setLoading(false);
     }
+    setLoading(false);
   }
 
+  useEffect(() => () => streamRef.current?.cancel(), []);
+
   const singlePrediction = useMemo(() => {
     if (!prediction) return null;
     if (days === 1) return prediction.prediction || prediction;
@@ -206,6 +231,9 @@ export default function App() {
               onChange={(v) => setDays(Number(v))}
             >
               <option value="1">Next Day</option>
+              <option value="3">3 Days</option>
+              <option value="7">7 Days</option>
+              <option value="14">14 Days</option>
             </Select>
 
             <div className="col-span-4 flex justify-center mt-6">
@@ -261,7 +289,10 @@ export default function App() {
                   probabilities={singlePrediction?.probabilities}
                 />
               ) : (
-                <MultiDayChart predictions={prediction.predictions || []} />
+                <MultiDayChart
+                  predictions={prediction.predictions || []}
+                  totalDays={prediction.forecast_days}
+                />
               )}
             </div>
           </section>
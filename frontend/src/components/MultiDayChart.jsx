@@ -4,20 +4,24 @@ import { getCategoryColor, getCategoryForAQI, getCategoryClass } from "../utils/
 
 ChartJS.register(LineElement, LinearScale, CategoryScale, PointElement, Tooltip, Legend, Filler);
 
-export default function MultiDayChart({ predictions = [] }) {
+// totalDays lays out the full axis up front, so a streamed forecast fills in
+// day by day instead of rescaling on every update
+export default function MultiDayChart({ predictions = [], totalDays = predictions.length }) {
   if (!predictions.length) return null;
 
-  const labels = predictions.map((_, i) => {
+  const dayCount = Math.max(totalDays, predictions.length);
+  const labels = Array.from({ length: dayCount }, (_, i) => {
     const d = new Date(); d.setDate(d.getDate() + i + 1);
     return d.toLocaleDateString();
   });
   const values = predictions.map(p => p.predicted_aqi);
+  const pending = dayCount - values.length;
 
   const data = {
     labels,
     datasets: [{
       label: "Predicted AQI",
-      data: values,
+      data: [...values, ...Array(pending).fill(null)],
       borderColor: "#4F46E5",
       backgroundColor: "rgba(79,70,229,0.12)",
       pointBackgroundColor: values.map(v => getCategoryColor(getCategoryForAQI(v))),
@@ -27,6 +31,7 @@ export default function MultiDayChart({ predictions = [] }) {
   };
   const options = {
     responsive: true, maintainAspectRatio: false,
+    animation: pending ? false : undefined,
     plugins: { legend: { display: false } },
     scales: {
       y: { beginAtZero: true, title: { display: true, text: "AQI" } },
@@ -50,6 +55,11 @@ export default function MultiDayChart({ predictions = [] }) {
         <Summary label="Range" value={`${Math.round(min)} - ${Math.round(max)}`} />
         <Summary label="Most Common" value={<span className={`badge ${getCategoryClass(common)}`}>{common}</span>} />
       </div>
+      {pending > 0 && (
+        <div className="text-sm text-slate-500 mt-3">
+          Computed {values.length} of {dayCount} days...
+        </div>
+      )}
     </>
   );
 }
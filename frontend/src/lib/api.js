@@ -1,9 +1,20 @@
 const API_BASE = "/api";
 const join = (b, p) => `${b.replace(/\/+$/,'')}/${String(p).replace(/^\/+/, '')}`;
 
+// The page's first call: while the server is still warming up (503 with a
+// "warmup" body) wait Retry-After and try again, for up to a minute.
+async function fetchWhenReady(url) {
+  for (let attempt = 0; ; attempt++) {
+    const r = await fetch(url);
+    const j = await r.json();
+    if (r.status !== 503 || !j.warmup || attempt >= 60) return [r, j];
+    const wait = Number(r.headers.get("Retry-After")) || 1;
+    await new Promise((resolve) => setTimeout(resolve, wait * 1000));
+  }
+}
+
 export async function getCounties() {
-  const r = await fetch(join(API_BASE, "counties"));
-  const j = await r.json();
+  const [r, j] = await fetchWhenReady(join(API_BASE, "counties"));
   if (!r.ok || !j.success) throw new Error(j.error || "Failed to load counties");
   return j.counties;
 }
@@ -34,3 +45,71 @@ export async function postPredict({ county, state, model = "balanced", days = 1
   if (!r.ok || !j.success) throw new Error(j.error || "Failed to generate prediction");
   return j;
 }
+
+// Multi-day forecast over Server-Sent Events: onPrediction(pred, soFar) runs as each
+// day is computed. Returns { done, cancel }; cancel() closes the stream, which
+// stops the remaining steps on the server.
+export function streamPredict({ county, state, model = "balanced", days = 7, onPrediction }) {
+  const source = new EventSource(
+    join(API_BASE, `aqi/predict/stream?county=${encodeURIComponent(county)}&state=${encodeURIComponent(state)}` +
+      `&model=${encodeURIComponent(model)}&days=${days}`)
+  );
+  const predictions = [];
+  let cancel;
+  const done = new Promise((resolve, reject) => {
+    source.addEventListener("prediction", (e) => {
+      const p = JSON.parse(e.data);
+      predictions.push(p);
+      onPrediction?.(p, predictions.slice());
+    });
+    source.addEventListener("done", () => {
+      source.close();
+      resolve(predictions);
+    });
+    source.addEventListener("forecast_error", (e) => {
+      source.close();
+      reject(new Error(JSON.parse(e.data).error || "Failed to generate prediction"));
+    });
+    // Validation errors (non-200 responses) and dropped connections; closing
+    // here stops EventSource from reconnecting and restarting the forecast
+    source.onerror = () => {
+      source.close();
+      reject(new Error("Failed to generate prediction"));
+    };
+    cancel = () => {
+      source.close();
+      reject(new DOMException("Forecast stream cancelled", "AbortError"));
+    };
+  });
+  return { done, cancel };
+}
+
+// Next-day forecast for every county as typed arrays (layout: backend/map_layer.py).
+// Arrays are views over the response buffer; typed arrays assume a little-endian host.
+export async function getMapLayer({ model = "balanced", probabilities = false } = {}) {
+  const r = await fetch(
+    join(API_BASE, `aqi/map?model=${encodeURIComponent(model)}&probabilities=${probabilities ? 1 : 0}`)
+  );
+  if (!r.ok) {
+    const j = await r.json().catch(() => ({}));
+    throw new Error(j.error || "Failed to load map layer");
+  }
+  const buf = await r.arrayBuffer();
+  const view = new DataView(buf);
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4));
+  if (magic !== "AQML" || view.getUint16(4, true) !== 1) throw new Error("Unsupported map layer format");
+
+  const flags = view.getUint16(6, true);
+  const n = view.getUint32(8, true);
+  const days = view.getInt32(12, true);
+  const k = view.getUint8(16);
+  const probOffset = (20 + 7 * n + 3) & ~3;
+  return {
+    forecastDate: new Date(days * 86400000),
+    fips: new Uint32Array(buf, 20, n),
+    aqi: new Int16Array(buf, 20 + 4 * n, n),
+    category: new Uint8Array(buf, 20 + 6 * n, n), // 255 = unknown
+    probabilities: flags & 1 ? new Uint8Array(buf, probOffset, n * k) : null, // row-major, /255
+    categoryCount: k,
+  };
+}
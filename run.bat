@@ -59,6 +59,9 @@ call npm install
 call npm run build
 cd ..
 
+REM Write .gz/.br copies of the built assets (served when the browser accepts them)
+python backend\compression.py frontend\dist
+
 echo ==========================================
 echo Starting CLAP System...
 echo ==========================================
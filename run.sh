@@ -84,6 +84,9 @@ if [ -n "$FRONTEND" ]; then
       echo "✓ Frontend already built"
     fi
     cd "$ROOT"
+    
+    # Write .gz/.br copies of the built assets (served when the browser accepts them)
+    python3 "$BACKEND/compression.py" "$FRONTEND/dist"
   else
     echo "WARNING: Node.js/npm not found. Frontend will not be available."
     echo "Install Node.js v22.21.0+ to enable the web dashboard."
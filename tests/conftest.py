@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND)
+sys.path.insert(1, os.path.dirname(BACKEND))  # training scripts
+
+
+@pytest.fixture(scope="session")
+def app():
+    # Model and data paths are relative to backend/, as when run.sh starts the app
+    cwd = os.getcwd()
+    os.chdir(BACKEND)
+    try:
+        from app import create_app
+        application = create_app(warmup_mode="sync")
+        application.config["TESTING"] = True
+        yield application
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,70 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from admission import AdmissionController, Overloaded, ThreadBudget, check_admission_limits
+from config import Config
+
+
+def _controller(name, budget, max_in_flight=1, max_queue=1, deadline=0.05):
+    return AdmissionController(name, max_in_flight, max_queue, deadline, retry_after=1, stale_entries=4,
+                               budget=budget)
+
+
+def test_default_limits_fit_the_request_threads():
+    assert Config.ADMISSION_THREAD_BUDGET == Config.WEB_THREADS - 1
+    assert check_admission_limits(Config) == []
+
+
+def test_limits_above_the_thread_budget_warn():
+    config = SimpleNamespace(WEB_THREADS=4, ADMISSION_THREAD_BUDGET=3, PREDICT_MAX_IN_FLIGHT=8,
+                             REFRESH_MAX_IN_FLIGHT=2, STREAM_MAX_IN_FLIGHT=2, EXPORT_MAX_IN_FLIGHT=1,
+                             ADMISSION_MAX_QUEUE=16)
+    warnings = check_admission_limits(config)
+    assert len(warnings) == 4
+    assert warnings[0].startswith("PREDICT_MAX_IN_FLIGHT")
+
+
+def test_queue_fills_and_sheds_within_the_thread_budget():
+    budget = ThreadBudget(Config.ADMISSION_THREAD_BUDGET)
+    controller = _controller("predict", budget, Config.PREDICT_MAX_IN_FLIGHT, Config.ADMISSION_MAX_QUEUE)
+    release = threading.Event()
+
+    def hold():
+        with controller.admit():
+            release.wait()
+
+    threads = [threading.Thread(target=hold) for _ in range(Config.PREDICT_MAX_IN_FLIGHT)]
+    for thread in threads:
+        thread.start()
+    try:
+        while controller.stats()["in_flight"] < Config.PREDICT_MAX_IN_FLIGHT:
+            time.sleep(0.001)
+        # With the queue full too, the next request is shed
+        waiting = [threading.Thread(target=hold) for _ in range(Config.ADMISSION_MAX_QUEUE)]
+        for thread in waiting:
+            thread.start()
+        while controller.stats()["queue_depth"] < Config.ADMISSION_MAX_QUEUE:
+            time.sleep(0.001)
+        with pytest.raises(Overloaded):
+            with controller.admit():
+                pass
+    finally:
+        release.set()
+    for thread in threads + waiting:
+        thread.join()
+    assert budget.stats()["held"] == 0
+
+
+def test_endpoints_share_one_thread_budget():
+    budget = ThreadBudget(2)
+    predict, refresh = _controller("predict", budget), _controller("refresh", budget)
+    with predict.admit(), refresh.admit():
+        with pytest.raises(Overloaded) as shed:
+            with predict.admit():
+                pass
+        assert shed.value.reason == "thread_budget"
+    assert predict.counters["rejected_thread_budget"] == 1
+    assert budget.stats() == {"limit": 2, "held": 0}
@@ -0,0 +1,147 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+import backtest
+from backtest import CountySeries, _init_worker, _run_origin
+from feature_store import MIN_ROWS
+from ml_model import AQIPredictor
+from routes.aqi_utils import build_features_from_recent, iter_forecast, raw_vector_for_model
+
+FIRST_DAY = np.datetime64("2024-01-01")
+
+
+class IdentityScaler:
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64)
+
+
+class LagModel:
+    """Depends on the lag and rolling inputs only, so forecast dates don't matter"""
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return 0.5 * X[:, 2] + 0.2 * X[:, 3] + 0.1 * X[:, 4] + 0.2 * X[:, 6] + 1.0
+
+
+def _source():
+    """Two counties over 40 days; the second skips every fifth day and starts later"""
+    rng = np.random.default_rng(0)
+    frames = []
+    for (county, state, code, skip, start) in (("A", "S1", 1, None, 0), ("B", "S2", 2, 5, 10)):
+        days = [d for d in range(start, 40) if skip is None or d % skip]
+        frames.append(pd.DataFrame({
+            "Date": pd.to_datetime(FIRST_DAY + np.array(days, dtype="timedelta64[D]")),
+            "AQI": rng.integers(10, 150, len(days)).astype(float),
+            "State Code": code, "County Code": code * 10,
+            "county_name": county, "state_name": state,
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    rows = {key: np.flatnonzero((df["county_name"] == key[0]) & (df["state_name"] == key[1]))
+            for key in (("A", "S1"), ("B", "S2"))}
+    return SimpleNamespace(df=df, _county_rows=rows)
+
+
+@pytest.fixture(scope="module")
+def source():
+    return _source()
+
+
+@pytest.fixture(scope="module")
+def series(source):
+    return CountySeries(source)
+
+
+def test_windows_are_the_rows_up_to_the_origin(source, series):
+    origin = FIRST_DAY + np.timedelta64(24, "D")  # day 24 is missing for B
+    window, counts = series.windows(origin)
+    for i, key in enumerate(series.keys):
+        rows = source.df.iloc[source._county_rows[key]]
+        expected = rows.loc[rows["Date"] <= pd.Timestamp(origin), "AQI"].to_numpy()[-30:]
+        assert counts[i] == len(expected)
+        np.testing.assert_array_equal(window[i, 30 - counts[i]:], expected)
+        assert np.isnan(window[i, :30 - counts[i]]).all()
+
+
+def test_observed_are_the_actuals_of_the_days_after_the_origin(source, series):
+    origin = FIRST_DAY + np.timedelta64(33, "D")
+    observed = series.observed(np.arange(len(series.keys)), origin, 10)
+    for i, key in enumerate(series.keys):
+        rows = source.df.iloc[source._county_rows[key]].set_index("Date")["AQI"]
+        for step in range(10):
+            day = pd.Timestamp(origin + np.timedelta64(step + 1, "D"))
+            if day in rows.index:
+                assert observed[i, step] == rows[day]
+            else:
+                assert np.isnan(observed[i, step])  # a skipped day, or past the data
+    assert np.isnan(observed[:, 6:]).all()
+
+
+def test_run_origin_matches_iter_forecast(source, series):
+    origin = FIRST_DAY + np.timedelta64(30, "D")
+    model, scaler = LagModel(), IdentityScaler()
+    _init_worker(model, scaler, "balanced", series)
+    rows, predictions, _ = _run_origin(origin, 14)
+    assert len(rows) == 2
+
+    app = Flask(__name__)
+    app.extensions["scalers"] = {"balanced": scaler}
+    predictor = AQIPredictor()
+    predictor.model = model
+    with app.app_context():
+        for i, row in enumerate(rows):
+            key = series.keys[row]
+            county_df = source.df.iloc[source._county_rows[key]]
+            recent = county_df[county_df["Date"] <= pd.Timestamp(origin)].tail(30)
+            features, recent = build_features_from_recent(recent)
+            steps = iter_forecast(predictor, "balanced", recent.iloc[0], features, 14, *key)
+            expected = [step["predicted_aqi"] for step in steps]
+            np.testing.assert_allclose(predictions[i], expected, rtol=1e-12)
+
+
+def test_run_origin_skips_counties_without_enough_history(series):
+    _init_worker(LagModel(), IdentityScaler(), "balanced", series)
+    rows, predictions, actuals = _run_origin(FIRST_DAY + np.timedelta64(MIN_ROWS + 2, "D"), 3)
+    assert [series.keys[row] for row in rows] == [("A", "S1")]
+    assert predictions.shape == actuals.shape == (1, 3)
+
+
+def _legacy_raw_vector(model_type, features, county_row, when):
+    # raw_vector_for_model before it delegated to feature_store.model_inputs
+    state_code = county_row.get("State Code", 1)
+    county_code = county_row.get("County Code", 1)
+    if model_type == "prototype":
+        return np.array([[state_code, county_code, 0, 0, 0, 0, 0,
+                          features["aqi_lag_1"], features["aqi_lag_3"], features["aqi_lag_7"]]])
+    return np.array([[
+        state_code, county_code,
+        features["aqi_lag_1"], features["aqi_lag_3"], features["aqi_lag_7"],
+        features.get("aqi_lag_14", features["aqi_lag_7"]), features["aqi_rolling_7"],
+        when.weekday(), when.month,
+        features.get("aqi_rolling_3", features["aqi_lag_1"]), features.get("aqi_std_7", 0),
+    ]])
+
+
+@pytest.mark.parametrize("model_type", ["balanced", "prototype"])
+@pytest.mark.parametrize("county_row", [{"State Code": 6, "County Code": 37}, {}])
+def test_raw_vector_for_model_is_unchanged(model_type, county_row):
+    features = {"aqi_lag_1": 42.0, "aqi_lag_2": 40.0, "aqi_lag_3": 38.5, "aqi_lag_7": 51.0,
+                "aqi_rolling_7": 44.2, "aqi_rolling_14": 45.0, "aqi_rolling_30": 47.3}
+    when = datetime(2024, 11, 3)
+    actual = raw_vector_for_model(model_type, features, county_row, when)
+    expected = _legacy_raw_vector(model_type, features, county_row, when)
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_run_backtest_scores_in_process(series):
+    origins = [FIRST_DAY + np.timedelta64(d, "D") for d in (20, 30)]
+    scored = backtest.run_backtest(LagModel(), IdentityScaler(), "balanced", series, origins=origins,
+                                   horizon=3, workers=1)
+    assert set(scored["horizon"]) == {1, 2, 3}
+    assert (scored["target_date"] - scored["origin"]).dt.days.equals(scored["horizon"])
+    np.testing.assert_allclose(scored["error"], scored["predicted"] - scored["actual"])
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from columnar import read_columns
+from data_pipeline import FEATURE_COLS, TARGET_COL, DataPipeline
+
+
+def _write_year(directory, year, counties=3):
+    rng = np.random.default_rng(year)
+    dates = pd.date_range(f"{year}-01-01", f"{year}-03-15")
+    frames = [pd.DataFrame({"State Code": 1, "County Code": county, "Date": dates.strftime("%Y-%m-%d"),
+                            "AQI": rng.integers(5, 200, len(dates))})
+              for county in range(1, counties + 1)]
+    pd.concat(frames).to_csv(directory / f"daily_aqi_by_county_{year}.csv", index=False)
+
+
+def test_load_training_set_is_every_partition_row_in_date_order(tmp_path):
+    for year in (2022, 2023):
+        _write_year(tmp_path, year)
+    pipeline = DataPipeline(data_path=str(tmp_path), output_path=str(tmp_path / "training_set"),
+                            model_path=str(tmp_path / "models"), chunksize=100)
+    rows = pipeline.run_full_pipeline()
+    frame = pipeline.load_training_set(scaled=False, with_dates=True)
+
+    # Reference: all partitions concatenated, then one stable sort by date
+    parts = [read_columns(path) for path in pipeline.partitions()]
+    dates = np.concatenate([part["Date"] for part in parts])
+    order = np.argsort(dates, kind="stable")
+    assert len(frame) == rows == len(dates)
+    np.testing.assert_array_equal(frame["Date"].values.astype("datetime64[D]"), dates[order])
+    for col in FEATURE_COLS + [TARGET_COL]:
+        expected = np.concatenate([part[col] for part in parts])[order]
+        np.testing.assert_array_equal(frame[col].to_numpy(), expected)
+        assert frame[col].dtype == expected.dtype
+
+    scaled = pipeline.load_training_set(scaled=True)
+    np.testing.assert_allclose(scaled[FEATURE_COLS].to_numpy(),
+                               pipeline.scaler.transform(frame[FEATURE_COLS].to_numpy()), rtol=1e-6)
+
+
+def _training_set(tmp_path, name, chunksize):
+    pipeline = DataPipeline(data_path=str(tmp_path), output_path=str(tmp_path / name),
+                            model_path=str(tmp_path / "models"), chunksize=chunksize)
+    pipeline.run_full_pipeline()
+    frame = pipeline.load_training_set(scaled=False, with_dates=True)
+    return frame.sort_values(["Date", "State Code", "County Code"]).reset_index(drop=True)
+
+
+def test_small_chunks_match_a_single_chunk(tmp_path):
+    # Chunks of 5 rows are shorter than the 14-row history carried per county,
+    # and the second file starts a new chunk mid-series
+    for year in (2022, 2023):
+        _write_year(tmp_path, year)
+    whole = _training_set(tmp_path, "whole", chunksize=1_000_000)
+    chunked = _training_set(tmp_path, "chunked", chunksize=5)
+    assert len(whole) == 3 * (2 * 74 - 14)
+    pd.testing.assert_frame_equal(chunked, whole)
@@ -0,0 +1,41 @@
+import threading
+import time
+
+import pytest
+
+from config import Config
+from executors import PoolSaturated, StagePool, check_thread_budget
+
+
+def test_submit_fails_fast_without_free_worker(app):
+    pool = StagePool("test", max_workers=1, max_queue=0, queue_timeout=0)
+    release = threading.Event()
+    try:
+        running = pool.submit(app, release.wait)
+        t0 = time.monotonic()
+        with pytest.raises(PoolSaturated):
+            pool.submit(app, lambda: None)
+        assert time.monotonic() - t0 < 0.5
+    finally:
+        release.set()
+    assert running.result(timeout=5)
+
+
+def test_default_pools_leave_request_threads_free():
+    assert check_thread_budget(Config) == []
+
+
+def test_health_answers_while_forecast_pool_is_saturated(app, client):
+    pool = app.extensions["stage_pools"]["forecast"]
+    release = threading.Event()
+    blockers = [pool.submit(app, release.wait) for _ in range(pool.max_workers + pool.max_queue)]
+    try:
+        t0 = time.monotonic()
+        assert client.get("/api/health").status_code == 200
+        response = client.post("/api/aqi/predict", json={"county": "County1", "state": "State1", "days": 1})
+        assert response.status_code == 503
+        assert time.monotonic() - t0 < 2
+    finally:
+        release.set()
+    for blocker in blockers:
+        blocker.result(timeout=5)
@@ -0,0 +1,80 @@
+import json
+import threading
+
+import pytest
+
+
+def _ndjson(client, query):
+    with client.get("/api/export?" + query) as response:
+        assert response.status_code == 200
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_forecast_export_matches_the_predict_endpoint(client):
+    rows = _ndjson(client, "kind=forecast&days=3&county=County1&state=State1")
+    predicted = client.post("/api/aqi/predict", json={"county": "County1", "state": "State1", "days": 3})
+    expected = predicted.get_json()["predictions"]
+    assert [row["day"] for row in rows] == [1, 2, 3]
+    for row, prediction in zip(rows, expected):
+        assert row["predicted_aqi"] == pytest.approx(prediction["predicted_aqi"], abs=0.01)
+        assert row["predicted_category"] == prediction["predicted_category"]
+
+
+def test_forecast_export_covers_every_county(client):
+    rows = _ndjson(client, "kind=forecast&days=1")
+    counties = client.get("/api/counties").get_json()["counties"]
+    assert len(rows) == len({(row["county"], row["state"]) for row in rows})
+    assert 0 < len(rows) <= len(counties)
+
+
+@pytest.mark.parametrize("days", ["2", "15", "x"])
+def test_forecast_export_days_match_the_predict_endpoint(client, days):
+    assert client.get(f"/api/export?kind=forecast&days={days}").status_code == 400
+
+
+def test_forecast_export_is_shed_while_the_forecast_pool_is_saturated(app, client):
+    pool = app.extensions["stage_pools"]["forecast"]
+    release = threading.Event()
+    blockers = [pool.submit(app, release.wait) for _ in range(pool.max_workers + pool.max_queue)]
+    try:
+        assert client.get("/api/export?kind=forecast&days=1").status_code == 503
+    finally:
+        release.set()
+    for blocker in blockers:
+        blocker.result(timeout=5)
+
+
+def test_distribution_export_runs_on_the_forecast_pool(app, client):
+    rows = _ndjson(client, "kind=forecast&days=3&paths=50&county=County1&state=State1")
+    assert [row["day"] for row in rows] == [1, 2, 3]
+    assert all(row["p05"] <= row["p50"] <= row["p95"] for row in rows)
+    assert app.extensions["stage_pools"]["forecast"].stats()["in_flight"] == 0
+
+
+@pytest.mark.parametrize("paths", ["0", "x", "100000"])
+def test_distribution_export_paths_match_the_predict_endpoint(client, paths):
+    assert client.get(f"/api/export?kind=forecast&days=1&paths={paths}").status_code == 400
+
+
+def test_export_ends_with_an_error_record_when_the_pool_stays_saturated(app, client, monkeypatch):
+    from routes import export
+    monkeypatch.setattr(export, "FORECAST_CHUNK", 1)  # one county per stage, so there are later chunks
+    monkeypatch.setattr(export, "POOL_WAIT_LIMIT", 0.2)
+    response = client.get("/api/export?kind=forecast&days=1", buffered=False)
+    assert response.status_code == 200
+    body = response.response
+    first = json.loads(next(body))
+    assert "predicted_aqi" in first
+
+    pool = app.extensions["stage_pools"]["forecast"]
+    release = threading.Event()
+    blockers = [pool.submit(app, release.wait) for _ in range(pool.max_workers + pool.max_queue)]
+    try:
+        rest = b"".join(body).decode().splitlines()
+    finally:
+        release.set()
+        response.close()
+    for blocker in blockers:
+        blocker.result(timeout=5)
+    assert rest == [json.dumps({"error": "Forecast pool saturated for 0.2s, export incomplete"})]
+    assert app.extensions["admission"]["export"].stats()["in_flight"] == 0
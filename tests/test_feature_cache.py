@@ -0,0 +1,65 @@
+import os
+import pickle
+import shutil
+
+import numpy as np
+
+from config import Config
+from feature_cache import FeatureCache, code_digest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SPEC = {"features": ["a", "b"], "version": 1}
+SPLIT = {"method": "time", "train_fraction": 0.8}
+
+
+def _csv(tmp_path, text="Date,AQI\n2024-01-01,10\n"):
+    path = tmp_path / "daily_aqi_by_county_2024.csv"
+    path.write_text(text)
+    return str(path)
+
+
+def test_hit_after_save_and_miss_before(tmp_path):
+    cache = FeatureCache(str(tmp_path / "cache"))
+    key = cache.key_for([_csv(tmp_path)], SPEC, SPLIT)
+    assert cache.load_frame(key) is None and cache.load_object(key, "scaler") is None
+
+    cache.save_frame(key, {"a": np.arange(3.0), "b": np.ones(3)})
+    cache.save_object(key, "scaler", {"mean": 1.5})
+    columns, _ = cache.load_frame(key)
+    assert columns["a"].tolist() == [0.0, 1.0, 2.0]
+    assert cache.load_object(key, "scaler") == {"mean": 1.5}
+
+
+def test_key_changes_with_data_spec_split_and_code(tmp_path):
+    cache = FeatureCache(str(tmp_path / "cache"))
+    key = cache.key_for([_csv(tmp_path)], SPEC, SPLIT)
+    assert cache.key_for([_csv(tmp_path)], SPEC, SPLIT) == key
+    assert cache.key_for([_csv(tmp_path, "Date,AQI\n2024-01-01,11\n")], SPEC, SPLIT) != key
+    assert cache.key_for([_csv(tmp_path)], {**SPEC, "version": 2}, SPLIT) != key
+    assert cache.key_for([_csv(tmp_path)], SPEC, {**SPLIT, "train_fraction": 0.7}) != key
+
+    def featurize(frame):
+        return frame
+
+    def featurize_edited(frame):
+        return frame.dropna()
+
+    assert code_digest(featurize) == code_digest(featurize)
+    assert cache.key_for([_csv(tmp_path)], {**SPEC, "code": code_digest(featurize)}, SPLIT) != \
+        cache.key_for([_csv(tmp_path)], {**SPEC, "code": code_digest(featurize_edited)}, SPLIT)
+
+
+def test_cache_hit_still_saves_the_scaler_for_a_new_model_path(tmp_path, monkeypatch):
+    from ml_model import train_model_pipeline
+    monkeypatch.setattr(Config, "FEATURE_CACHE_PATH", str(tmp_path / "cache"))
+    monkeypatch.setattr(Config, "TRAINING_SET_PATH", str(tmp_path / "training_set"))
+
+    train_model_pipeline(data_path=DATA_DIR, model_path=str(tmp_path / "first"))
+    shutil.rmtree(tmp_path / "training_set")
+    train_model_pipeline(data_path=DATA_DIR, model_path=str(tmp_path / "second"))
+    assert not (tmp_path / "training_set").exists()  # served from the cache
+    with open(tmp_path / "first" / "pipeline.pkl", "rb") as f:
+        first = pickle.load(f)["scaler"]
+    with open(tmp_path / "second" / "pipeline.pkl", "rb") as f:
+        second = pickle.load(f)["scaler"]
+    assert np.array_equal(first.mean_, second.mean_) and np.array_equal(first.scale_, second.scale_)
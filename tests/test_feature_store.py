@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_store import FEATURE_NAMES, WINDOW, FeatureStore, compute_features
+from routes.aqi_utils import build_features_from_recent
+
+
+def _recent(values):
+    return pd.DataFrame({"Date": pd.date_range("2024-01-01", periods=len(values)), "AQI": values})
+
+
+def _expected(values):
+    features, _ = build_features_from_recent(_recent(values))
+    return np.array([features[name] for name in FEATURE_NAMES], dtype=np.float64)
+
+
+def _window(values):
+    window = np.full(WINDOW, np.nan)
+    window[WINDOW - len(values):] = values
+    return window
+
+
+@pytest.mark.parametrize("length", [1, 2, 3, 6, 7, 8, 13, 14, 15, 29, 30])
+def test_compute_features_matches_build_features_from_recent(length):
+    values = np.random.default_rng(length).integers(0, 300, length).astype(float)
+    actual = compute_features(_window(values), length)[0]
+    np.testing.assert_allclose(actual, _expected(values), rtol=1e-12)
+
+
+def test_compute_features_skips_missing_aqi_like_pandas():
+    values = np.random.default_rng(1).integers(0, 300, 20).astype(float)
+    values[[-5, -12, 3]] = np.nan
+    actual = compute_features(_window(values), len(values))[0]
+    np.testing.assert_allclose(actual, _expected(values), rtol=1e-12)
+
+
+def test_compute_features_of_many_windows_at_once():
+    rng = np.random.default_rng(2)
+    lengths = rng.integers(1, WINDOW + 1, 50)
+    series = [rng.integers(0, 300, n).astype(float) for n in lengths]
+    actual = compute_features(np.vstack([_window(v) for v in series]), lengths)
+    np.testing.assert_allclose(actual, np.vstack([_expected(v) for v in series]), rtol=1e-12)
+
+
+def test_append_day_keeps_features_in_step():
+    values = np.random.default_rng(3).integers(0, 300, WINDOW + 10).astype(float)
+    store = FeatureStore([("A", "S")], _window(values[:10])[None, :], np.array([10]), np.ones((1, 2)),
+                         np.array(["2024-01-10"], dtype="datetime64[D]"), "v1")
+    for day, value in enumerate(values[10:], start=11):
+        store.append_day(np.datetime64("2024-01-01") + np.timedelta64(day - 1, "D"), {("A", "S"): value})
+        features, _ = store.get("A", "S")
+        np.testing.assert_allclose([features[name] for name in FEATURE_NAMES], _expected(values[:day][-WINDOW:]),
+                                   rtol=1e-12)
+
+
+def test_county_first_seen_in_append_day_keeps_its_codes():
+    store = FeatureStore([("A", "S")], _window([50.0] * 10)[None, :], np.array([10]), np.ones((1, 2)),
+                         np.array(["2024-01-10"], dtype="datetime64[D]"), "v1")
+    for day in range(1, 8):
+        store.append_day(np.datetime64("2024-01-10") + np.timedelta64(day, "D"),
+                         {("A", "S"): 60.0, ("B", "T"): 70.0}, {("B", "T"): (6.0, 37.0)})
+    _, county_row = store.get("B", "T")
+    assert county_row == {"State Code": 6.0, "County Code": 37.0}
+    assert store.get("A", "S")[1] == {"State Code": 1.0, "County Code": 1.0}
+
+
+def test_data_source_append_swaps_in_a_new_snapshot(tmp_path):
+    from data_source import CSVDataSource
+
+    days = pd.date_range("2024-01-01", periods=10)
+    pd.DataFrame({"State Name": "State1", "county Name": "County1", "State Code": 1, "County Code": 1,
+                  "Date": days, "AQI": np.arange(10) + 40}).to_csv(tmp_path / "daily_aqi_by_county_2024.csv",
+                                                                    index=False)
+    source = CSVDataSource(str(tmp_path))
+    source.feature_store = FeatureStore.from_source(source)
+    df, county_rows, store = source.df, source._county_rows, source.feature_store
+    before = store.features.copy()
+
+    appended = pd.DataFrame({"State Name": ["State1", "State2"], "county Name": ["County1", "County2"],
+                             "State Code": [1, 6], "County Code": [1, 37], "Date": ["2024-01-11"] * 2,
+                             "AQI": [80, 90]})
+    assert source.append_day(appended) == 2
+
+    # What a reader already holds is left as it was
+    assert len(df) == 10 and set(county_rows) == {("County1", "State1")}
+    assert store.keys == [("County1", "State1")] and np.array_equal(store.features, before)
+    # The swapped-in snapshot has the new day, with codes taken as a rebuild takes them
+    assert source.feature_store is not store and source.feature_store.version == source.version
+    rebuilt = FeatureStore.from_source(source)
+    assert source.feature_store.keys == rebuilt.keys
+    np.testing.assert_array_equal(source.feature_store.codes, rebuilt.codes)
+    np.testing.assert_allclose(source.feature_store.features, rebuilt.features)
+    assert source.get_county_snapshot("County2", "State2").frame["AQI"].tolist() == [90]
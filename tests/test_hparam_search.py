@@ -0,0 +1,48 @@
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import hparam_search
+
+
+def _search(monkeypatch, **kwargs):
+    # Same initializer protocol, in this process
+    monkeypatch.setattr(hparam_search, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(hparam_search, "LATENCY_REPEATS", 2)
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 3))
+    y = X[:, 0] * 20 + rng.normal(0, 1, 400)
+    return hparam_search.run_search(X, y, {"n_estimators": 20}, workers=1, **kwargs)
+
+
+def test_trials_are_halved_per_rung_and_ranked(monkeypatch, tmp_path):
+    rows = _search(monkeypatch, n_trials=10, n_splits=3, min_survivors=2)
+    by_status = {}
+    for row in rows:
+        by_status.setdefault(row["status"], []).append(row)
+    # 10 -> 5 after fold 0, 5 -> 3 after fold 1 (ceil), all 3 finish
+    assert {status: len(group) for status, group in by_status.items()} == \
+        {"complete": 3, "pruned@fold1": 2, "pruned@fold0": 5}
+    for status, folds in (("complete", 3), ("pruned@fold1", 2), ("pruned@fold0", 1)):
+        assert all(row["folds_evaluated"] == folds for row in by_status[status])
+
+    # Completed first, then by folds reached, then by CV RMSE
+    assert [row["rank"] for row in rows] == list(range(1, 11))
+    assert [row["status"] for row in rows] == ["complete"] * 3 + ["pruned@fold1"] * 2 + ["pruned@fold0"] * 5
+    for group in by_status.values():
+        assert [row["cv_rmse"] for row in group] == sorted(row["cv_rmse"] for row in group)
+    assert all("n_jobs" not in row["params"] for row in rows)
+
+    path = hparam_search.save_leaderboard(rows, str(tmp_path / "leaderboard.csv"))
+    with open(path, newline="") as f:
+        saved = list(csv.DictReader(f))
+    assert [int(row["trial"]) for row in saved] == [row["trial"] for row in rows]
+    assert json.loads(saved[0]["params"]) == rows[0]["params"]
+    assert json.loads((tmp_path / "leaderboard.json").read_text())[0]["rank"] == 1
+
+
+def test_min_survivors_stops_pruning(monkeypatch):
+    rows = _search(monkeypatch, n_trials=4, n_splits=3, min_survivors=3)
+    assert sorted(row["status"] for row in rows) == ["complete"] * 3 + ["pruned@fold0"]
@@ -0,0 +1,22 @@
+from http_cache import versioned_json
+
+
+def _revalidate(app, if_none_match):
+    with app.test_request_context(headers={"If-None-Match": if_none_match}):
+        return versioned_json("abc", lambda: b"{}")
+
+
+def test_not_modified_repeats_the_variant_the_client_holds(app):
+    for held in ('"abc"', '"abc-gzip"', '"abc-br"', '"xyz", "abc-gzip"'):
+        response = _revalidate(app, held)
+        assert response.status_code == 304
+        assert response.headers["ETag"] == held.split(", ")[-1]
+    assert _revalidate(app, '"abc-deflate"').status_code == 200
+
+
+def test_compressed_body_revalidates_with_its_own_etag(client):
+    response = client.get("/api/counties", headers={"Accept-Encoding": "gzip"})
+    etag = response.headers["ETag"]
+    assert response.headers["Content-Encoding"] == "gzip" and etag.endswith('-gzip"')
+    cached = client.get("/api/counties", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["ETag"] == etag
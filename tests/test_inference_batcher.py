@@ -0,0 +1,47 @@
+import time
+from contextlib import ExitStack
+
+import numpy as np
+import pytest
+
+from inference_batcher import InferenceBatcher
+
+
+def _sessions(batcher, n):
+    stack = ExitStack()
+    for _ in range(n):
+        stack.enter_context(batcher.session())
+    return stack
+
+
+def test_callers_get_their_own_rows_from_one_batch():
+    batcher = InferenceBatcher(lambda X: X[:, 0] * 2, max_wait_ms=1000)
+    inputs = [np.array([[1.0]]), np.array([[2.0], [3.0], [4.0]]), np.array([[5.0], [6.0]])]
+    with _sessions(batcher, len(inputs)):
+        futures = [batcher.submit(X) for X in inputs]
+        results = [future.result(timeout=5) for future in futures]
+    for X, result in zip(inputs, results):
+        assert result.tolist() == (X[:, 0] * 2).tolist()
+    stats = batcher.stats()
+    assert stats["batches"] == 1 and stats["rows"] == 6
+
+
+def test_predict_errors_reach_every_caller():
+    def fail(X):
+        raise ValueError("model broke")
+
+    batcher = InferenceBatcher(fail, max_wait_ms=1000)
+    with _sessions(batcher, 2):
+        futures = [batcher.submit(np.ones((1, 3))) for _ in range(2)]
+        for future in futures:
+            with pytest.raises(ValueError, match="model broke"):
+                future.result(timeout=5)
+
+
+def test_lone_session_is_dispatched_without_waiting():
+    batcher = InferenceBatcher(lambda X: X.sum(axis=1), max_wait_ms=5000)
+    batcher.predict(np.ones((1, 2)))  # starts the dispatcher thread
+    with batcher.session():
+        start = time.perf_counter()
+        assert batcher.predict(np.ones((1, 2))).tolist() == [2.0]
+    assert time.perf_counter() - start < 1
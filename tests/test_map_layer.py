@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+
+from config import Config
+from map_layer import HEADER, UNKNOWN_CATEGORY, pack_layer, unpack_layer
+
+
+def test_pack_unpack_layout():
+    probabilities = np.array([[0.5, 0.5, 0, 0, 0, 0], [0, 0, 0, 0, 0, 1], [1, 0, 0, 0, 0, 0]])
+    payload = pack_layer([6037, 17031, 1001], [42.4, 301.6, -3], [0, 5, -1], "2024-06-02", probabilities)
+    n = 3
+    probabilities_at = (HEADER.size + 7 * n + 3) & ~3
+    assert HEADER.size == 20
+    assert len(payload) == probabilities_at + n * 6 and probabilities_at % 4 == 0
+
+    layer = unpack_layer(payload)
+    assert str(layer["forecast_date"]) == "2024-06-02"
+    assert layer["fips"].tolist() == [6037, 17031, 1001]
+    assert layer["aqi"].tolist() == [42, 302, -3]
+    assert layer["category"].tolist() == [0, 5, UNKNOWN_CATEGORY]
+    assert layer["probabilities"].tolist() == [[128, 128, 0, 0, 0, 0], [0, 0, 0, 0, 0, 255], [255, 0, 0, 0, 0, 0]]
+    assert unpack_layer(pack_layer([6037], [42], [0], "2024-06-02"))["probabilities"] is None
+
+
+def test_layer_revalidates_with_its_etag(client):
+    response = client.get("/api/aqi/map")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    cached = client.get("/api/aqi/map", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["ETag"] == etag and not cached.data
+    assert client.get("/api/aqi/map?probabilities=1", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_layer_matches_predict(app, client):
+    fips = app.extensions["data_source"].get_county_snapshot("County1", "State1").fips
+    plain = unpack_layer(client.get("/api/aqi/map").data)
+    detailed = unpack_layer(client.get("/api/aqi/map?probabilities=1").data)
+    # Both variants come from one forecast
+    for field in ("fips", "aqi", "category"):
+        assert np.array_equal(plain[field], detailed[field])
+
+    prediction = client.post("/api/aqi/predict", json={"county": "County1", "state": "State1", "days": 1}
+                             ).get_json()["prediction"]
+    row = plain["fips"].tolist().index(fips)
+    assert plain["aqi"][row] == round(prediction["predicted_aqi"])
+    # The layer orders categories as Config.AQI_CATEGORIES; JSON sorts them
+    expected = np.array([prediction["probabilities"][name] for name in Config.AQI_CATEGORIES])
+    assert detailed["category"][row] == list(Config.AQI_CATEGORIES).index(prediction["predicted_category"])
+    assert np.allclose(detailed["probabilities"][row] / 255, expected, atol=1 / 255)
+
+
+def test_missing_layer_is_rebuilt_off_the_request(app, client):
+    layers = app.extensions["map_layers"]
+    layers.clear()
+    response = client.get("/api/aqi/map")
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    for _ in range(100):
+        if layers.get("balanced") is not None:
+            break
+        time.sleep(0.05)
+    assert client.get("/api/aqi/map").status_code == 200
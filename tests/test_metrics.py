@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+from metrics import MetricsRegistry
+
+CONFIG = SimpleNamespace(RELIABILITY_THRESHOLD=0.9, AVAILABILITY_TARGET=0.99,
+                         MAX_INGESTION_TIME=300, MAX_DASHBOARD_RENDER_TIME=5)
+
+
+def test_availability_counts_503s_and_reliability_the_other_5xx():
+    registry = MetricsRegistry()
+    for status in [200] * 7 + [500] + [503] * 2:
+        registry.observe_request("predict.predict_aqi", status, 0.01, {})
+    report = registry.slo_report(CONFIG)
+    assert report["availability"]["value"] == 0.8
+    assert report["reliability"]["value"] == 7 / 8
+    assert report["availability"]["ok"] is False and report["reliability"]["ok"] is False
+
+
+def test_streamed_spans_are_recorded_when_the_response_closes(app, client):
+    registry = app.extensions["metrics"]
+    stages = registry.stages
+    key = ("predict.predict_aqi_stream", "predict")
+    before = stages[key].count if key in stages else 0
+    with client.get("/api/aqi/predict/stream?county=County1&state=State1&days=3") as response:
+        assert response.status_code == 200
+        assert b"event: done" in response.get_data()
+        assert "Server-Timing" not in response.headers
+    assert stages[key].count == before + 1
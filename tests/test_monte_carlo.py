@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from feature_store import FEATURE_NAMES
+from monte_carlo import CATEGORY_NAMES, FALLBACK_STD, QUANTILES, simulate_paths, summarize_paths
+
+DATES = [datetime(2024, 6, 1) + timedelta(days=day) for day in range(14)]
+CODES = np.array([1.0, 2.0])
+
+
+class _Identity:
+    def transform(self, X):
+        return X
+
+
+def _features(aqi=100.0):
+    return {name: np.full(2, aqi) for name in FEATURE_NAMES}
+
+
+def _simulate(predict, n_paths=2000, residuals=None, seed=0, features=None):
+    return simulate_paths(predict, _Identity(), "balanced", features or _features(), CODES, CODES, DATES,
+                          n_paths, residuals=residuals, rng=np.random.default_rng(seed))
+
+
+def persistence(X):
+    return X[:, 2]  # the balanced layout's AQI_lag1: tomorrow is today's (perturbed) value
+
+
+def constant(X):
+    return np.full(len(X), 50.0)
+
+
+def test_spread_widens_with_the_horizon_when_errors_feed_back():
+    paths = _simulate(persistence)
+    assert paths.shape == (2, 2000, len(DATES))
+    spread = paths.std(axis=1).mean(axis=0)
+    assert np.isclose(spread[0], FALLBACK_STD, rtol=0.1)
+    assert spread[0] < spread[3] < spread[7] < spread[13]
+    # A random walk: the spread grows like the square root of the horizon
+    assert np.isclose(spread[13] / spread[0], np.sqrt(14), rtol=0.15)
+
+    # Without feedback every day has the one-step spread only
+    flat = _simulate(constant).std(axis=1).mean(axis=0)
+    assert np.allclose(flat, FALLBACK_STD, rtol=0.1)
+
+
+def test_residuals_are_resampled_and_normal_errors_are_the_fallback():
+    paths = _simulate(constant, residuals=np.array([-5.0, 5.0]))
+    assert set(np.unique(paths)) == {45.0, 55.0}
+    assert 0.45 < (paths == 55.0).mean() < 0.55
+
+    for residuals in (None, np.array([])):
+        normal = _simulate(constant, residuals=residuals)
+        assert len(np.unique(normal)) > 1000
+        assert np.isclose(normal.mean(), 50.0, atol=0.5) and np.isclose(normal.std(), FALLBACK_STD, rtol=0.05)
+
+
+def test_seeded_runs_repeat():
+    np.testing.assert_array_equal(_simulate(persistence, n_paths=50, seed=7),
+                                  _simulate(persistence, n_paths=50, seed=7))
+
+
+def test_summary_quantiles_are_ordered_and_probabilities_sum_to_one():
+    # Spread over several categories: low start, wide random walk
+    paths = _simulate(persistence, n_paths=500, features=_features(60.0))
+    quantiles, probabilities = summarize_paths(paths)
+    assert quantiles.shape == (2, len(DATES), len(QUANTILES))
+    assert probabilities.shape == (2, len(DATES), len(CATEGORY_NAMES))
+    assert np.all(np.diff(quantiles, axis=-1) >= 0)
+    np.testing.assert_allclose(probabilities.sum(axis=-1), 1.0)
+    assert (probabilities[:, -1] > 0).sum(axis=-1).min() >= 2
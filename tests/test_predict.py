@@ -0,0 +1,65 @@
+from admission import forecast_query_key
+
+QUERY = {"county": "County1", "state": "State1", "model": "balanced", "days": 3}
+
+
+def test_probabilistic_must_be_a_boolean(client):
+    response = client.post("/api/aqi/predict", json={**QUERY, "probabilistic": "false"})
+    assert response.status_code == 400
+    assert "probabilistic" in response.get_json()["error"]
+
+
+def test_probabilistic_forecast(client):
+    response = client.post("/api/aqi/predict", json={**QUERY, "probabilistic": True, "paths": 50})
+    assert response.status_code == 200
+    predictions = response.get_json()["predictions"]
+    assert len(predictions) == 3
+    assert all(p["paths"] == 50 for p in predictions)
+
+
+def test_stale_key_separates_point_and_probabilistic_forecasts(app):
+    def key(payload):
+        with app.test_request_context("/api/aqi/predict", method="POST", json=payload):
+            return forecast_query_key()
+
+    point = key(QUERY)
+    assert key({**QUERY, "probabilistic": False}) == point
+    assert key({**QUERY, "probabilistic": True}) != point
+    assert key({**QUERY, "probabilistic": True, "paths": 100}) != key({**QUERY, "probabilistic": True})
+
+
+def _stats(app):
+    batcher = app.extensions.get("batchers", {}).get("balanced")
+    active = batcher.stats()["active_sessions"] if batcher else 0
+    return app.extensions["admission"]["stream"].stats()["in_flight"], active
+
+
+def test_stream_holds_its_admission_slot_but_no_batcher_session_between_days(app, client):
+    response = client.get("/api/aqi/predict/stream?county=County1&state=State1&days=3", buffered=False)
+    assert response.status_code == 200
+    body = response.response
+    first = next(body)
+    assert b"event: prediction" in first
+    # The client is paused between days: the slot stays taken, the batcher is free
+    assert _stats(app) == (1, 0)
+    rest = b"".join(body)
+    response.close()
+    assert rest.count(b"event: prediction") == 2 and b"event: done" in rest
+    assert _stats(app) == (0, 0)
+
+
+def test_shed_stream_replays_the_last_complete_stream(app, client):
+    url = "/api/aqi/predict/stream?county=County1&state=State1&days=3"
+    with client.get(url) as response:
+        complete = response.get_data()
+    controller = app.extensions["admission"]["stream"]
+    held = [controller.acquire() for _ in range(controller.max_in_flight)]
+    try:
+        shed = client.get(url)
+    finally:
+        for _ in held:
+            controller.release()
+    assert shed.status_code == 200
+    assert shed.headers["Warning"].startswith("110")
+    assert shed.mimetype == "text/event-stream"
+    assert shed.get_data() == complete
@@ -0,0 +1,18 @@
+import time
+
+QUERY = {"county": "County1", "state": "State1", "model": "balanced", "days": 3}
+
+
+def test_cached_refresh_gets_a_fresh_timestamp(app, client):
+    cache = app.extensions["refresh_cache"]
+    first = client.post("/api/aqi/refresh", json=QUERY)
+    assert first.status_code == 200
+    hits = cache.stats()["hits"]
+    time.sleep(0.01)
+    second = client.post("/api/aqi/refresh", json=QUERY)
+    assert cache.stats()["hits"] == hits + 1
+
+    first, second = first.get_json(), second.get_json()
+    assert second["timestamp"] > first["timestamp"]
+    assert {**second, "timestamp": None} == {**first, "timestamp": None}
+    assert len(second["prediction"]["predictions"]) == 3
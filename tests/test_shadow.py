@@ -0,0 +1,132 @@
+import queue
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from process_worker import ProcessWorker
+from shadow import ShadowEvaluator
+
+BASE = {"aqi_lag_1": 40.0, "aqi_lag_2": 38.0, "aqi_lag_3": 36.0, "aqi_lag_7": 30.0,
+        "aqi_rolling_7": 35.0, "aqi_rolling_14": 34.0, "aqi_rolling_30": 33.0}
+START = datetime(2024, 6, 1)
+
+
+class IdentityScaler:
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64)
+
+
+class HalfLagModel:
+    """Half of the previous day, plus 10"""
+
+    def predict(self, X):
+        return 0.5 * np.asarray(X)[:, 2] + 10
+
+
+class Snapshot:
+    def __init__(self, actuals):
+        self.frame = pd.DataFrame({"Date": pd.to_datetime(list(actuals)), "AQI": list(actuals.values())})
+
+    def between(self, start, end):
+        dates = self.frame["Date"].values.astype("datetime64[D]")
+        return self.frame[(dates >= start) & (dates <= end)]
+
+
+def _wait_for(evaluator, scored):
+    deadline = time.monotonic() + 5
+    while evaluator.stats()["scored"] < scored:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def evaluator():
+    source = SimpleNamespace(version=None, snapshot=None)
+    source.get_county_snapshot = lambda county, state: source.snapshot
+    shadow = ShadowEvaluator({"half": ("balanced", HalfLagModel(), IdentityScaler())}, lambda: source)
+    shadow.source = source
+    return shadow
+
+
+def test_candidates_replay_their_own_recursion(evaluator):
+    # The served model's predictions must not leak into the candidate's later days
+    served = [(START + timedelta(days=d), value) for d, value in enumerate((100.0, 200.0, 300.0))]
+    evaluator.submit("balanced", "A", "S", {"State Code": 1, "County Code": 2}, BASE, served)
+    _wait_for(evaluator, 3)
+
+    expected, lag_1 = [], BASE["aqi_lag_1"]
+    for _ in range(3):
+        lag_1 = 0.5 * lag_1 + 10
+        expected.append(lag_1)
+    pending = sorted(evaluator._pending.items(), key=lambda item: item[0][4])
+    assert [key[4] for key, _ in pending] == [1, 2, 3]
+    assert [pair["served"] for _, pair in pending] == [100.0, 200.0, 300.0]
+    np.testing.assert_allclose([pair["candidates"]["half"] for _, pair in pending], expected)
+
+
+def test_resolved_pairs_are_scored_per_horizon(evaluator):
+    served = [(START, 50.0), (START + timedelta(days=1), 60.0)]
+    evaluator.submit("balanced", "A", "S", {}, BASE, served)
+    _wait_for(evaluator, 2)
+
+    evaluator.source.snapshot = Snapshot({"2024-06-01": 40.0, "2024-06-02": 45.0})
+    evaluator.source.version = "v2"
+    evaluator._resolve()
+    comparisons = {c["horizon"]: c for c in evaluator.report()["comparisons"]}
+    assert comparisons[1]["served_mae"] == pytest.approx(10.0)
+    assert comparisons[1]["candidate_mae"] == pytest.approx(abs(30.0 - 40.0))
+    assert comparisons[2]["served_mae"] == pytest.approx(15.0)
+    assert comparisons[2]["candidate_mae"] == pytest.approx(abs(25.0 - 45.0))
+    assert evaluator.stats()["pending"] == 0
+
+
+def test_full_queue_drops_instead_of_blocking():
+    shadow = ShadowEvaluator({}, lambda: None, max_queue=1)
+    shadow._worker = ProcessWorker(lambda items: None, "idle", lambda: queue.Queue(maxsize=1))
+    for _ in range(3):
+        shadow.submit("balanced", "A", "S", {}, BASE, [(START, 1.0)])
+    assert (shadow.submitted, shadow.dropped) == (1, 2)
+
+
+def test_process_worker_starts_one_thread_per_process():
+    seen = []
+    worker = ProcessWorker(lambda items: seen.append(items.get()), "test-worker")
+    assert worker.qsize() == 0
+    items = worker.queue()
+    assert worker.queue() is items
+    items.put("item")
+    deadline = time.monotonic() + 5
+    while not seen:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert seen == ["item"]
+
+
+class BrokenModel:
+    def predict(self, X):
+        raise RuntimeError("candidate broke")
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.messages = []
+
+    def exception(self, message, **kwargs):
+        self.messages.append(message)
+
+
+def test_worker_errors_are_counted_and_logged_once_per_interval():
+    logger = RecordingLogger()
+    shadow = ShadowEvaluator({"broken": ("balanced", BrokenModel(), IdentityScaler())}, lambda: None,
+                             logger=logger)
+    for errors in (1, 2):
+        shadow.submit("balanced", "A", "S", {}, BASE, [(START, 1.0)])
+        deadline = time.monotonic() + 5
+        while shadow.stats()["errors"] < errors:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    assert logger.messages == ["Shadow evaluation failed (failures since the last report: 1)"]
@@ -0,0 +1,88 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMRegressor
+from sklearn.preprocessing import StandardScaler
+
+import train_balanced_model as tbm
+from data_pipeline import FEATURE_COLS, TARGET_COL
+
+
+def _rows(days=60, counties=3, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = np.repeat(pd.date_range("2024-01-01", periods=days), counties)
+    frame = pd.DataFrame({col: rng.normal(50, 10, len(dates)) for col in FEATURE_COLS})
+    frame.insert(0, "Date", dates)
+    frame[TARGET_COL] = frame["AQI_lag1"] * 0.8 + rng.normal(0, 2, len(dates))
+    return frame
+
+
+def _bundle(train_df):
+    scaler = StandardScaler().fit(train_df[FEATURE_COLS])
+    model = LGBMRegressor(**{**tbm.MODEL_PARAMS, "n_estimators": 20, "verbose": -1})
+    model.fit(scaler.transform(train_df[FEATURE_COLS]), train_df[TARGET_COL])
+    return {"model": model, "scaler": scaler, "metrics": {"r2": 0.5}, "version": "base",
+            "trained_through": str(train_df["Date"].max().date()), "incremental_history": []}
+
+
+def test_split_by_date_keeps_each_day_on_one_side():
+    frame = _rows(days=10)
+    train, test = tbm.split_by_date(frame, 0.75)  # row 22 of 30 is in the middle of day 8
+    assert train["Date"].max() < test["Date"].min()
+    assert len(train) + len(test) == len(frame) and len(train) == 21
+
+
+def test_update_boosts_only_rows_after_trained_through(tmp_path, monkeypatch):
+    frame = _rows()
+    train_df, test_df = frame.iloc[:120], frame.iloc[120:]
+    bundle = _bundle(frame.iloc[:90])  # trained through day 30
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tbm, "MODEL_FILE", str(tmp_path / "model.pkl"))
+    monkeypatch.setattr(tbm, "SCALER_FILE", str(tmp_path / "scaler.pkl"))
+    monkeypatch.setattr(tbm, "load_balanced_dataset", lambda use_cache=True: (train_df, test_df))
+    tbm._save_bundle(bundle)
+
+    result = tbm.update_balanced_model(rounds=5, backtest=False)
+    window = frame.iloc[90:]
+    assert result["window_rows"] == len(window)
+    with open(tmp_path / "model.pkl", "rb") as f:
+        saved = pickle.load(f)
+    assert saved["trained_through"] == str(frame["Date"].max().date())
+    assert saved["model"].booster_.num_trees() == bundle["model"].booster_.num_trees() + 5
+    (entry,) = saved["incremental_history"]
+    # Scored before training on the window (prequential)
+    expected = np.mean((window[TARGET_COL] - bundle["model"].predict(
+        bundle["scaler"].transform(window[FEATURE_COLS]))) ** 2)
+    assert entry["rows"] == len(window) and np.isclose(entry["mse"], expected)
+
+    # Nothing newer than trained_through: the model is left as it is
+    assert tbm.update_balanced_model(rounds=5, backtest=False)["window_rows"] == 0
+
+
+class _Identity:
+    def transform(self, X):
+        return np.asarray(X)
+
+
+class _Constant:
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return np.full(len(X), self.value)
+
+
+def test_drift_report_compares_on_window_rows_in_the_test_split():
+    test_df = _rows(days=10, counties=2)
+    test_df[TARGET_COL] = 10.0
+    previous = {"incremental_history": [
+        {"window_start": "2024-01-03", "window_end": "2024-01-04", "mse": 4.0},  # 4 rows
+        {"window_start": "2023-12-01", "window_end": "2023-12-31", "mse": 100.0},  # not in the test split
+    ]}
+    report = tbm._drift_report(previous, _Constant(13.0), _Identity(), test_df)
+    assert report["rows"] == 4 and report["incremental_updates"] == 2
+    assert np.isclose(report["rmse_incremental"], 2.0) and np.isclose(report["rmse_full"], 3.0)
+    assert np.isclose(report["rmse_drift"], -1.0)
+    assert tbm._drift_report({"incremental_history": previous["incremental_history"][1:]},
+                             _Constant(13.0), _Identity(), test_df) == {"rows": 0}
@@ -4,9 +4,10 @@ Script to train a BALANCED model - not too simple, not too complex
 """
 import sys
 import os
+import argparse
 import pandas as pd
 import numpy as np
-from datetime import timedelta
+from datetime import datetime, timedelta
 from lightgbm import LGBMRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_squared_error, r2_score
@@ -18,86 +19,113 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def train_balanced_model():
+# Shared training helpers live in backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from feature_cache import FeatureCache
+from data_pipeline import DataPipeline, FEATURE_COLS, FEATURE_SPEC as PIPELINE_FEATURE_SPEC
+
+DATA_PATH = 'data/'
+MODEL_FILE = 'models/balanced_lightgbm_model.pkl'
+SCALER_FILE = 'models/balanced_pipeline.pkl'
+TARGET_COL = 'AQI'
+
+# BALANCED LightGBM with proper regularization
+MODEL_PARAMS = dict(
+    objective='regression',
+    random_state=42,
+    n_estimators=200,  # More trees but with regularization
+    learning_rate=0.05,  # Lower learning rate
+    max_depth=4,  # Shallower trees (less overfitting)
+    num_leaves=15,  # Fewer leaves (less complexity)
+    subsample=0.8,  # Subsampling
+    colsample_bytree=0.8,  # Feature subsampling
+    reg_alpha=0.1,  # L1 regularization
+    reg_lambda=0.1,  # L2 regularization
+    min_child_samples=20,  # Minimum samples per leaf
+    min_split_gain=0.01,  # Minimum gain to split
+)
+
+# Incremental retraining: boosting rounds added per update, and how often the
+# scheduled mode falls back to a full retrain from scratch
+INCREMENTAL_ROUNDS = 50
+FULL_RETRAIN_INTERVAL_DAYS = 7
+
+# Rolling-origin backtest run after every training: recursive forecasts from
+# each day after the model's training data, reports written here
+BACKTEST_DIR = 'models/backtest/'
+# One-step backtest errors kept in the model file for Monte Carlo forecasts
+RESIDUAL_SAMPLE = 5000
+
+# Feature engineering lives in the streaming DataPipeline, which reads the raw
+# CSVs in bounded-memory chunks and writes a columnar training set to disk
+FEATURE_SPEC = {'model': 'balanced', 'pipeline': PIPELINE_FEATURE_SPEC}
+SPLIT_SPEC = {'method': 'time', 'sort': 'Date', 'train_fraction': 0.8, 'boundary': 'date'}
+
+
+def build_balanced_dataset():
+    """Stream the raw CSVs through the DataPipeline and split by time"""
+    
+    logger.info("Adding balanced features...")
+    pipeline = DataPipeline(data_path=DATA_PATH, model_path='models/')
+    pipeline.run_full_pipeline()
+    df_sorted = pipeline.load_training_set(scaled=False, with_dates=True)
+    logger.info(f"After feature engineering: {len(df_sorted)} records")
+    
+    columns = ['Date'] + FEATURE_COLS + [TARGET_COL]
+    return split_by_date(df_sorted[columns], SPLIT_SPEC['train_fraction'])
+
+
+def split_by_date(df_sorted, train_fraction):
+    """
+    Time-based split (like prototype) of date-sorted rows, at about
+    train_fraction of them. The split falls on a date boundary, so no day has
+    rows on both sides: every row after the training data's last day (the
+    model's trained_through) is one the model has not seen.
+    """
+    boundary = df_sorted['Date'].iloc[int(len(df_sorted) * train_fraction)]
+    in_train = df_sorted['Date'] < boundary
+    return df_sorted[in_train], df_sorted[~in_train]
+
+
+def load_balanced_dataset(use_cache=True):
+    """
+    Return (train_df, test_df), reusing the feature cache when the raw data,
+    feature spec and split are unchanged
+    """
+    if not use_cache:
+        return build_balanced_dataset()
+    
+    cache = FeatureCache()
+    key = cache.key_for(DataPipeline(data_path=DATA_PATH).source_files(), FEATURE_SPEC, SPLIT_SPEC)
+    cached_train = cache.load_frame(key, 'train')
+    cached_test = cache.load_frame(key, 'test')
+    if cached_train is not None and cached_test is not None:
+        return pd.DataFrame(cached_train[0]), pd.DataFrame(cached_test[0])
+    
+    train_df, test_df = build_balanced_dataset()
+    cache.save_frame(key, {col: train_df[col].values for col in train_df.columns}, 'train')
+    cache.save_frame(key, {col: test_df[col].values for col in test_df.columns}, 'test')
+    return train_df, test_df
+
+
+def train_balanced_model(use_cache=True, backtest=True):
     """Train a balanced model with ~15-20 features"""
     
     logger.info("="*60)
     logger.info("Training BALANCED Model (Sweet Spot)")
     logger.info("="*60)
     
-    # Load data
-    logger.info("Loading daily_aqi_by_county_2024.csv...")
-    df = pd.read_csv('data/daily_aqi_by_county_2024.csv', parse_dates=['Date'])
-    logger.info(f"Loaded {len(df)} records")
-    
-    # Basic cleaning
-    df = df.drop_duplicates(subset=['Date', 'State Code', 'County Code']).copy()
-    df = df.sort_values(['State Code', 'County Code', 'Date']).reset_index(drop=True)
-    logger.info(f"After cleaning: {len(df)} records")
-    
-    # Add BALANCED feature set (not too many, not too few)
-    def add_balanced_features(group):
-        group = group.sort_values('Date')
-        
-        # Core lag features (from prototype - proven to work)
-        group['AQI_lag1'] = group['AQI'].shift(1)
-        group['AQI_lag3'] = group['AQI'].shift(3)
-        group['AQI_lag7'] = group['AQI'].shift(7)
-        
-        # ONE rolling average (7-day - most important)
-        group['AQI_rolling_7'] = group['AQI'].rolling(window=7, min_periods=1).mean()
-        
-        # Basic temporal features (only the most important)
-        group['day_of_week'] = group['Date'].dt.dayofweek
-        group['month'] = group['Date'].dt.month
-        
-        # ONE additional lag (14-day for longer trend)
-        group['AQI_lag14'] = group['AQI'].shift(14)
-        
-        return group
-    
-    logger.info("Adding balanced features...")
-    df = df.groupby(['State Code', 'County Code'], group_keys=False).apply(add_balanced_features)
-    
-    # Drop rows with NaN (from lag features)
-    df = df.dropna(subset=['AQI_lag1', 'AQI_lag3', 'AQI_lag7', 'AQI_lag14']).reset_index(drop=True)
-    logger.info(f"After feature engineering: {len(df)} records")
-    
-    # Define BALANCED feature set (~15 features)
-    feature_cols = [
-        'State Code', 'County Code',  # Location identifiers
-        'AQI_lag1', 'AQI_lag3', 'AQI_lag7', 'AQI_lag14',  # Lag features
-        'AQI_rolling_7',  # ONE rolling average
-        'day_of_week', 'month',  # Basic temporal
-        # Add a few more meaningful features
-        'AQI_rolling_3',  # Short-term trend
-        'AQI_std_7',  # Volatility measure
-    ]
-    
-    # Add the additional features
-    def add_final_features(group):
-        group = group.sort_values('Date')
-        group['AQI_rolling_3'] = group['AQI'].rolling(window=3, min_periods=1).mean()
-        group['AQI_std_7'] = group['AQI'].rolling(window=7, min_periods=1).std().fillna(0)
-        return group
-    
-    df = df.groupby(['State Code', 'County Code'], group_keys=False).apply(add_final_features)
-    
-    target_col = 'AQI'
-    X = df[feature_cols]
-    y = df[target_col]
+    train_df, test_df = load_balanced_dataset(use_cache=use_cache)
+    feature_cols = FEATURE_COLS
+    target_col = TARGET_COL
     
     logger.info(f"Final feature set: {len(feature_cols)} features")
     logger.info(f"Features: {feature_cols}")
     
-    # Time-based split (like prototype)
-    df_sorted = df.sort_values('Date').reset_index(drop=True)
-    split_idx = int(len(df_sorted) * 0.8)
-    
-    X_train = df_sorted[feature_cols].iloc[:split_idx]
-    y_train = df_sorted[target_col].iloc[:split_idx]
-    X_test = df_sorted[feature_cols].iloc[split_idx:]
-    y_test = df_sorted[target_col].iloc[split_idx:]
+    X_train = train_df[feature_cols]
+    y_train = train_df[target_col]
+    X_test = test_df[feature_cols]
+    y_test = test_df[target_col]
     
     logger.info(f"Training set: {len(X_train)} samples")
     logger.info(f"Test set: {len(X_test)} samples")
@@ -109,20 +137,7 @@ def train_balanced_model():
     
     # Train BALANCED LightGBM with proper regularization
     logger.info("Training balanced LightGBM model...")
-    model = LGBMRegressor(
-        objective='regression',
-        random_state=42,
-        n_estimators=200,  # More trees but with regularization
-        learning_rate=0.05,  # Lower learning rate
-        max_depth=4,  # Shallower trees (less overfitting)
-        num_leaves=15,  # Fewer leaves (less complexity)
-        subsample=0.8,  # Subsampling
-        colsample_bytree=0.8,  # Feature subsampling
-        reg_alpha=0.1,  # L1 regularization
-        reg_lambda=0.1,  # L2 regularization
-        min_child_samples=20,  # Minimum samples per leaf
-        min_split_gain=0.01,  # Minimum gain to split
-    )
+    model = LGBMRegressor(**MODEL_PARAMS)
     
     model.fit(X_train_scaled, y_train)
     
@@ -130,10 +145,7 @@ def train_balanced_model():
     y_pred = model.predict(X_test_scaled)
     
     # Calculate metrics
-    mse = mean_squared_error(y_test, y_pred)
-    rmse = np.sqrt(mse)
-    r2 = r2_score(y_test, y_pred)
-    mae = np.mean(np.abs(y_test - y_pred))
+    mse, rmse, mae, r2 = _score(y_test, y_pred)
     
     logger.info("="*60)
     logger.info("BALANCED Model Performance:")
@@ -152,20 +164,7 @@ def train_balanced_model():
         X_cv_train, X_cv_val = X_train_scaled[train_idx], X_train_scaled[val_idx]
         y_cv_train, y_cv_val = y_train.iloc[train_idx], y_train.iloc[val_idx]
         
-        cv_model = LGBMRegressor(
-            objective='regression',
-            random_state=42,
-            n_estimators=200,
-            learning_rate=0.05,
-            max_depth=4,
-            num_leaves=15,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            reg_alpha=0.1,
-            reg_lambda=0.1,
-            min_child_samples=20,
-            min_split_gain=0.01,
-        )
+        cv_model = LGBMRegressor(**MODEL_PARAMS)
         
         cv_model.fit(X_cv_train, y_cv_train)
         y_cv_pred = cv_model.predict(X_cv_val)
@@ -186,36 +185,40 @@ def train_balanced_model():
     else:
         logger.info("Model appears well-regularized")
     
-    # Save model and scaler
-    os.makedirs('models', exist_ok=True)
+    metrics = {
+        'mse': mse,
+        'rmse': rmse,
+        'mae': mae,
+        'r2': r2,
+        'cv_r2_mean': cv_mean,
+        'cv_r2_std': cv_std,
+        'overfitting_gap': overfitting_gap
+    }
     
-    # Save model
-    model_path = 'models/balanced_lightgbm_model.pkl'
-    with open(model_path, 'wb') as f:
-        pickle.dump({
-            'model': model,
-            'scaler': scaler,
-            'feature_names': feature_cols,
-            'metrics': {
-                'mse': mse,
-                'rmse': rmse,
-                'mae': mae,
-                'r2': r2,
-                'cv_r2_mean': cv_mean,
-                'cv_r2_std': cv_std,
-                'overfitting_gap': overfitting_gap
-            },
-            'model_type': 'balanced',
-            'version': '20251008_balanced'
-        }, f)
+    # Compare against the incremental model being replaced, if there is one
+    previous = _load_bundle()
+    if previous and previous.get('incremental_history'):
+        metrics['drift'] = _drift_report(previous, model, scaler, test_df)
     
-    # Save scaler separately
-    scaler_path = 'models/balanced_pipeline.pkl'
-    with open(scaler_path, 'wb') as f:
-        pickle.dump(scaler, f)
+    trained_through = str(train_df['Date'].max().date())
+    residuals = None
+    if backtest:
+        metrics['backtest'], residuals = _backtest(model, scaler, trained_through,
+                                                   os.path.join(BACKTEST_DIR, 'full'))
     
-    logger.info(f"Balanced model saved to: {model_path}")
-    logger.info(f"Balanced scaler saved to: {scaler_path}")
+    today = datetime.now().strftime('%Y-%m-%d')
+    _save_bundle({
+        'model': model,
+        'scaler': scaler,
+        'feature_names': feature_cols,
+        'metrics': metrics,
+        'model_type': 'balanced',
+        'version': f"{datetime.now():%Y%m%d_%H%M%S}_balanced",
+        'trained_through': trained_through,
+        'last_full_retrain': today,
+        'incremental_history': [],
+        'residuals': residuals,
+    })
     
     return {
         'model': model,
@@ -225,12 +228,248 @@ def train_balanced_model():
         'cv_scores': cv_scores
     }
 
+
+def update_balanced_model(use_cache=True, rounds=INCREMENTAL_ROUNDS, backtest=True):
+    """
+    Incrementally retrain: continue boosting the saved model on the rows
+    appended since it was last trained, reusing its scaler
+    """
+    logger.info("="*60)
+    logger.info("Incremental update of BALANCED Model")
+    logger.info("="*60)
+    
+    bundle = _load_bundle()
+    if bundle is None or 'trained_through' not in bundle:
+        logger.warning("No incrementally trainable model found, running full retrain")
+        return train_balanced_model(use_cache=use_cache, backtest=backtest)
+    
+    train_df, test_df = load_balanced_dataset(use_cache=use_cache)
+    all_df = pd.concat([train_df, test_df], ignore_index=True)
+    window = all_df[all_df['Date'] > pd.Timestamp(bundle['trained_through'])]
+    if window.empty:
+        logger.info(f"No new data after {bundle['trained_through']}, model unchanged")
+        return {'model': bundle['model'], 'metrics': bundle['metrics'], 'window_rows': 0}
+    
+    scaler = bundle['scaler']
+    X_new = scaler.transform(window[FEATURE_COLS])
+    y_new = window[TARGET_COL]
+    
+    # Score the new window before training on it (prequential evaluation), so the
+    # drift report can later compare out-of-sample errors of both training modes
+    mse, rmse, mae, r2 = _score(y_new, bundle['model'].predict(X_new))
+    window_start = str(window['Date'].min().date())
+    window_end = str(window['Date'].max().date())
+    logger.info(f"New window {window_start}..{window_end}: {len(window)} rows, "
+                f"pre-update RMSE {rmse:.2f}")
+    
+    # Multi-day forecasts are scored the same way, with the model as it was before the window
+    window_backtest = (_backtest(bundle['model'], scaler, bundle['trained_through'],
+                                 os.path.join(BACKTEST_DIR, 'incremental'))[0]
+                       if backtest else None)
+    
+    base_model = bundle['model']
+    model = LGBMRegressor(**{**MODEL_PARAMS, 'n_estimators': rounds})
+    model.fit(X_new, y_new, init_model=getattr(base_model, 'booster_', base_model))
+    logger.info(f"Boosted {rounds} rounds on top of {bundle['version']}")
+    
+    history = list(bundle.get('incremental_history', []))
+    history.append({
+        'window_start': window_start,
+        'window_end': window_end,
+        'rows': int(len(window)),
+        'mse': float(mse),
+        'rmse': float(rmse),
+        'mae': float(mae),
+    })
+    if window_backtest is not None:
+        history[-1]['backtest'] = window_backtest
+    
+    metrics = dict(bundle['metrics'])
+    metrics['last_window'] = history[-1]
+    bundle.update({
+        'model': model,
+        'metrics': metrics,
+        'version': f"{datetime.now():%Y%m%d_%H%M%S}_balanced_inc{len(history)}",
+        'trained_through': window_end,
+        'incremental_history': history,
+    })
+    _save_bundle(bundle)
+    
+    return {'model': model, 'metrics': metrics, 'window_rows': int(len(window))}
+
+
+def scheduled_retrain(use_cache=True, interval_days=FULL_RETRAIN_INTERVAL_DAYS, backtest=True):
+    """Run a full retrain when the last one is older than interval_days, else update incrementally"""
+    bundle = _load_bundle()
+    last_full = bundle.get('last_full_retrain') if bundle else None
+    if last_full is None or datetime.now() - datetime.strptime(last_full, '%Y-%m-%d') >= timedelta(days=interval_days):
+        logger.info(f"Scheduled full retrain (last full retrain: {last_full or 'never'})")
+        return train_balanced_model(use_cache=use_cache, backtest=backtest)
+    return update_balanced_model(use_cache=use_cache, backtest=backtest)
+
+
+def search_balanced_model(use_cache=True, n_trials=24, workers=None, seed=42,
+                          output='models/search_leaderboard.csv'):
+    """Search LGBMRegressor settings over the same time-series CV folds used for validation"""
+    from hparam_search import run_search, save_leaderboard
+    
+    logger.info("="*60)
+    logger.info("Hyperparameter search for BALANCED Model")
+    logger.info("="*60)
+    
+    train_df, _ = load_balanced_dataset(use_cache=use_cache)
+    X_train_scaled = StandardScaler().fit_transform(train_df[FEATURE_COLS])
+    
+    rows = run_search(X_train_scaled, train_df[TARGET_COL].values, MODEL_PARAMS,
+                      n_trials=n_trials, workers=workers, seed=seed)
+    save_leaderboard(rows, output)
+    
+    for row in rows[:5]:
+        logger.info(f"#{row['rank']} trial {row['trial']} ({row['status']}): "
+                    f"CV RMSE {row['cv_rmse']:.3f}, R² {row['cv_r2']:.4f}, "
+                    f"fit {row['fit_s']:.2f}s, predict {row['predict_row_ms']:.3f} ms/row")
+    return {'leaderboard': rows, 'metrics': {'r2': rows[0]['cv_r2']}}
+
+
+def _score(y_true, y_pred):
+    mse = mean_squared_error(y_true, y_pred)
+    rmse = np.sqrt(mse)
+    mae = np.mean(np.abs(np.asarray(y_true) - y_pred))
+    r2 = r2_score(y_true, y_pred)
+    return mse, rmse, mae, r2
+
+
+def _backtest(model, scaler, start, output):
+    """
+    Rolling-origin backtest of 1-14 day recursive forecasts from every day
+    after `start`, so only days the model was not trained on are scored.
+    The full tables go to `output`.
+    
+    Returns:
+        (by-horizon errors, sample of one-step residuals (actual - predicted) or None)
+    """
+    from backtest import CountySeries, default_origins, horizon_metrics, run_backtest, save_report, summarize
+    from data_source import CSVDataSource
+    
+    series = CountySeries(CSVDataSource(DATA_PATH))
+    if np.datetime64(start, 'D') >= series.last_day:
+        logger.info(f"Backtest skipped: no data after {start}")
+        return {}, None
+    scored = run_backtest(model, scaler, 'balanced', series, origins=default_origins(series, start))
+    tables = summarize(scored)
+    save_report(tables, output)
+    report = horizon_metrics(tables)
+    for horizon, errors in report.items():
+        logger.info(f"Backtest {horizon:>2}-day: RMSE {errors['rmse']:.2f}, MAE {errors['mae']:.2f}, "
+                    f"bias {errors['bias']:+.2f} ({errors['n']} forecasts)")
+    
+    residuals = -scored.loc[scored['horizon'] == 1, 'error'].to_numpy()
+    if len(residuals) > RESIDUAL_SAMPLE:
+        residuals = np.random.default_rng(42).choice(residuals, RESIDUAL_SAMPLE, replace=False)
+    return report, (residuals if len(residuals) else None)
+
+
+def _drift_report(previous, full_model, scaler, test_df):
+    """
+    Compare the replaced incremental model with the new full model on the
+    windows the incremental model was scored on before it trained on them.
+    Only window rows inside the full model's test split are used, so both
+    errors are out-of-sample.
+    """
+    rows, sq_err_inc, sq_err_full = 0, 0.0, 0.0
+    for window in previous['incremental_history']:
+        mask = (test_df['Date'] >= pd.Timestamp(window['window_start'])) & \
+               (test_df['Date'] <= pd.Timestamp(window['window_end']))
+        window_df = test_df[mask]
+        if window_df.empty:
+            continue
+        y_full = full_model.predict(scaler.transform(window_df[FEATURE_COLS]))
+        sq_err_full += float(np.sum((window_df[TARGET_COL].values - y_full) ** 2))
+        # Prequential MSE was recorded over the whole window; weight it by the overlapping rows
+        sq_err_inc += window['mse'] * len(window_df)
+        rows += len(window_df)
+    
+    if rows == 0:
+        logger.info("Drift report: no incremental windows overlap the full model's test split")
+        return {'rows': 0}
+    
+    rmse_inc = float(np.sqrt(sq_err_inc / rows))
+    rmse_full = float(np.sqrt(sq_err_full / rows))
+    report = {
+        'rows': rows,
+        'incremental_updates': len(previous['incremental_history']),
+        'rmse_incremental': rmse_inc,
+        'rmse_full': rmse_full,
+        'rmse_drift': rmse_inc - rmse_full,
+    }
+    logger.info(f"Drift report: incremental RMSE {rmse_inc:.2f} vs full RMSE {rmse_full:.2f} "
+                f"over {rows} rows ({report['incremental_updates']} updates)")
+    return report
+
+
+def _load_bundle():
+    if not os.path.exists(MODEL_FILE):
+        return None
+    with open(MODEL_FILE, 'rb') as f:
+        return pickle.load(f)
+
+
+def _save_bundle(bundle):
+    # Save model and scaler
+    os.makedirs('models', exist_ok=True)
+    
+    # Save model
+    with open(MODEL_FILE, 'wb') as f:
+        pickle.dump(bundle, f)
+    
+    # Save scaler separately
+    with open(SCALER_FILE, 'wb') as f:
+        pickle.dump(bundle['scaler'], f)
+    
+    logger.info(f"Balanced model saved to: {MODEL_FILE} (version {bundle['version']})")
+    logger.info(f"Balanced scaler saved to: {SCALER_FILE}")
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the BALANCED AQI model')
+    parser.add_argument('mode', nargs='?', default='full', choices=['full', 'incremental', 'scheduled', 'search'],
+                        help='full retrain, incremental warm-start update, scheduled '
+                             '(full every --full-every days, incremental otherwise), '
+                             'or search (parallel hyperparameter search, no model saved)')
+    parser.add_argument('--rounds', type=int, default=INCREMENTAL_ROUNDS,
+                        help='boosting rounds added per incremental update')
+    parser.add_argument('--full-every', type=int, default=FULL_RETRAIN_INTERVAL_DAYS,
+                        help='days between full retrains in scheduled mode')
+    parser.add_argument('--trials', type=int, default=24, help='configurations sampled by search')
+    parser.add_argument('--workers', type=int, default=None, help='search worker processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=42, help='search sampling seed')
+    parser.add_argument('--leaderboard', default='models/search_leaderboard.csv',
+                        help='where search writes its leaderboard (CSV, plus a .json copy)')
+    parser.add_argument('--no-cache', action='store_true', help='rebuild features instead of using the cache')
+    parser.add_argument('--no-backtest', action='store_true',
+                        help='skip the rolling-origin backtest of multi-day forecasts after training')
+    args = parser.parse_args()
+    
     try:
-        result = train_balanced_model()
+        if args.mode == 'incremental':
+            result = update_balanced_model(use_cache=not args.no_cache, rounds=args.rounds,
+                                           backtest=not args.no_backtest)
+        elif args.mode == 'search':
+            result = search_balanced_model(use_cache=not args.no_cache, n_trials=args.trials,
+                                           workers=args.workers, seed=args.seed, output=args.leaderboard)
+            print(f"\nSearch complete, leaderboard written to {args.leaderboard}")
+            sys.exit(0)
+        elif args.mode == 'scheduled':
+            result = scheduled_retrain(use_cache=not args.no_cache, interval_days=args.full_every,
+                                       backtest=not args.no_backtest)
+        else:
+            result = train_balanced_model(use_cache=not args.no_cache, backtest=not args.no_backtest)
         print("\nBalanced model training completed!")
         print(f"R² Score: {result['metrics']['r2']:.4f}")
-        print(f"Cross-validation R²: {result['cv_scores']}")
+        if 'cv_scores' in result:
+            print(f"Cross-validation R²: {result['cv_scores']}")
+        if 'drift' in result['metrics']:
+            print(f"Incremental vs full drift: {result['metrics']['drift']}")
         print("You can now compare all three models in the web interface.")
         
     except Exception as e:
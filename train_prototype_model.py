@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """
 Script to train the PROTOTYPE model (exact replica of lightgbm1.ipynb)
-This creates a baseline model for comparison
+This creates a baseline model for comparison. It is always trained from
+scratch: incremental updates (train_balanced_model.py incremental/scheduled)
+only exist for the balanced model, so the baseline stays a plain replica.
 """
 import sys
 import os
@@ -18,16 +20,29 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def train_prototype_model():
-    """Train the exact prototype model from lightgbm1.ipynb"""
-    
-    logger.info("="*60)
-    logger.info("Training PROTOTYPE Model (Exact Replica)")
-    logger.info("="*60)
+# Shared training helpers live in backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from columnar import read_columns, has_columns
+
+ENCODED_DIR = 'data/encoded_dataset'
+ENCODED_CSV = 'data/encoded_dataset.csv'
+
+# Define features (exact prototype)
+FEATURE_COLS = [
+    'State Code', 'County Code',
+    'Defining Parameter_CO', 'Defining Parameter_NO2',
+    'Defining Parameter_Ozone', 'Defining Parameter_PM10',
+    'Defining Parameter_PM2.5',
+    'AQI_lag1', 'AQI_lag3', 'AQI_lag7'
+]
+
+
+def load_encoded_csv():
+    """Legacy path: read encoded_dataset.csv and compute lags in memory"""
     
     # Load data (same as prototype)
     logger.info("Loading encoded_dataset.csv...")
-    df = pd.read_csv('data/encoded_dataset.csv', parse_dates=['Date'])
+    df = pd.read_csv(ENCODED_CSV, parse_dates=['Date'])
     logger.info(f"Loaded {len(df)} records")
     
     # Convert Date to datetime
@@ -49,25 +64,33 @@ def train_prototype_model():
         return group
     
     logger.info("Adding lag features...")
-    df = df.groupby(['State Code', 'County Code'], group_keys=False).apply(add_lags)
+    return df.groupby(['State Code', 'County Code'], group_keys=False).apply(add_lags)
+
+
+def train_prototype_model():
+    """Train the exact prototype model from lightgbm1.ipynb"""
+    
+    logger.info("="*60)
+    logger.info("Training PROTOTYPE Model (Exact Replica)")
+    logger.info("="*60)
+    
+    if has_columns(ENCODED_DIR):
+        # Typed columnar output of data/AQI_Time_series.py: memory-mapped, with
+        # per-county lags already computed by the chunked encoder
+        logger.info(f"Memory-mapping {ENCODED_DIR}...")
+        columns = read_columns(ENCODED_DIR, names=['Date', 'AQI'] + FEATURE_COLS, mmap=True)
+        df = pd.DataFrame(columns, copy=False)
+        logger.info(f"Loaded {len(df)} records")
+    else:
+        df = load_encoded_csv()
     
     # Drop rows where lag values are NaN
     df = df.dropna(subset=['AQI_lag1', 'AQI_lag3', 'AQI_lag7']).reset_index(drop=True)
     logger.info(f"After lag features: {len(df)} records")
     
-    # Define features (exact prototype)
-    feature_cols = [
-        'State Code', 'County Code',
-        'Defining Parameter_CO', 'Defining Parameter_NO2',
-        'Defining Parameter_Ozone', 'Defining Parameter_PM10',
-        'Defining Parameter_PM2.5',
-        'AQI_lag1', 'AQI_lag3', 'AQI_lag7'
-    ]
+    feature_cols = FEATURE_COLS
     target_col = 'AQI'
     
-    X = df[feature_cols]
-    y = df[target_col]
-    
     # Time-based split (exact prototype method)
     df_sorted = df.sort_values('Date').reset_index(drop=True)
     split_idx = int(len(df_sorted) * 0.8)